@@ -2,9 +2,11 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime, date
 from backend.models.models import JimengAccount
-from backend.utils.jimeng_account_login import login_and_get_cookie
 from backend.utils.jimeng_login_window import login_and_wait
+from backend.utils.cookie_util import session_expiry
 from backend.core.global_task_manager import global_task_manager
+from backend.core.cookie_refresh_jobs import cookie_refresh_jobs, refresh_account_cookie
+from backend.core.cookie_writeback import cookie_write_buffer
 import asyncio
 
 # 创建蓝图
@@ -48,6 +50,8 @@ def get_accounts():
                 'account': account.account,
                 'password': account.password,
                 'has_cookies': bool(account.cookies),  # 添加布尔值表示是否有Cookie
+                'cookies_expire_at': account.cookies_expire_at.strftime('%Y-%m-%d %H:%M:%S') if account.cookies_expire_at else None,
+                'session_ready': account.session_ready,
                 'created_at': account.created_at.strftime('%Y-%m-%d %H:%M:%S'),
                 'updated_at': account.updated_at.strftime('%Y-%m-%d %H:%M:%S'),
                 'today_usage': {
@@ -379,6 +383,13 @@ def get_account_cookie(account_id):
             'message': f'获取Cookie失败: {str(e)}'
         }), 500
 
+def _start_cookie_job(name, accounts):
+    """创建Cookie刷新作业，请求体可指定并发数 concurrency"""
+    data = request.get_json(silent=True) or {}
+    job = cookie_refresh_jobs.start_job(name, accounts, data.get('concurrency'))
+    print(f"{name}作业已创建，作业ID: {job.id}，账号数量: {len(accounts)}，并发数: {job.concurrency}")
+    return job
+
 @jimeng_accounts_bp.route('/batch-get-cookie', methods=['POST'])
 def batch_get_account_cookie():
     """批量获取账号Cookie"""
@@ -401,22 +412,11 @@ def batch_get_account_cookie():
                 'message': '未找到指定的账号'
             }), 404
         
-        # 提交任务到全局线程池
-        for account in accounts:
-            global_task_manager.submit_task(
-                platform_name="即梦账号",
-                task_callable=_process_cookie_task,
-                task_id=account.id,  # 传递task_id参数
-                account_id=account.id,  # 传递account_id参数
-                account_email=account.account,  # 传递account_email参数
-                task_type="获取Cookie",
-                prompt=f"获取账号 {account.account} 的Cookie"
-            )
-        
-        print(f"批量获取Cookie任务已提交，账号数量: {len(accounts)}")
+        job = _start_cookie_job('批量获取Cookie', accounts)
         return jsonify({
             'success': True,
-            'message': f'正在获取 {len(accounts)} 个账号的Cookie，请稍候...'
+            'message': f'正在获取 {len(accounts)} 个账号的Cookie，同时登录 {job.concurrency} 个账号',
+            'data': job.to_dict()
         })
         
     except Exception as e:
@@ -439,50 +439,11 @@ def update_all_cookies():
                 'message': '没有找到任何账号'
             }), 404
         
-        # 启动批量更新Cookie的后台任务
-        import threading
-        
-        def batch_update_cookies():
-            """批量更新Cookie的后台任务"""
-            import time
-            
-            for account in accounts:
-                # 检查线程池是否有空位
-                while True:
-                    active_threads = len(global_task_manager.active_tasks)
-                    max_threads = global_task_manager.max_threads
-                    
-                    if active_threads < max_threads:
-                        # 有空位，提交任务
-                        global_task_manager.submit_task(
-                            platform_name="即梦账号",
-                            task_callable=_process_cookie_task,
-                            task_id=account.id,
-                            account_id=account.id,
-                            account_email=account.account,
-                            task_type="获取Cookie",
-                            prompt=f"获取账号 {account.account} 的Cookie"
-                        )
-                        print(f"已提交账号 {account.account} 的Cookie获取任务")
-                        break
-                    else:
-                        # 线程池满了，等待一会再检查
-                        print(f"线程池已满，等待空位提交账号 {account.account} 的任务...")
-                        time.sleep(2)
-                
-                # 稍微延迟一下，避免过快提交
-                time.sleep(0.5)
-            
-            print(f"所有账号Cookie更新任务已成功提交完成，共 {len(accounts)} 个账号")
-        
-        # 启动后台线程
-        update_thread = threading.Thread(target=batch_update_cookies, daemon=True)
-        update_thread.start()
-        
-        print(f"开始批量更新所有账号Cookie，账号数量: {len(accounts)}")
+        job = _start_cookie_job('更新所有账号Cookie', accounts)
         return jsonify({
             'success': True,
-            'message': f'正在批量更新 {len(accounts)} 个账号的Cookie，任务将智能调度到线程池中...'
+            'message': f'正在批量更新 {len(accounts)} 个账号的Cookie，同时登录 {job.concurrency} 个账号',
+            'data': job.to_dict()
         })
         
     except Exception as e:
@@ -507,50 +468,11 @@ def get_uncookied_accounts_cookie():
                 'message': '没有找到未设置Cookie的账号'
             }), 404
         
-        # 启动批量获取Cookie的后台任务
-        import threading
-        
-        def batch_get_uncookied_accounts():
-            """批量获取未设置Cookie账号的后台任务"""
-            import time
-            
-            for account in uncookied_accounts:
-                # 检查线程池是否有空位
-                while True:
-                    active_threads = len(global_task_manager.active_tasks)
-                    max_threads = global_task_manager.max_threads
-                    
-                    if active_threads < max_threads:
-                        # 有空位，提交任务
-                        global_task_manager.submit_task(
-                            platform_name="即梦账号",
-                            task_callable=_process_cookie_task,
-                            task_id=account.id,
-                            account_id=account.id,
-                            account_email=account.account,
-                            task_type="获取Cookie",
-                            prompt=f"获取账号 {account.account} 的Cookie"
-                        )
-                        print(f"已提交未设置Cookie账号 {account.account} 的获取任务")
-                        break
-                    else:
-                        # 线程池满了，等待一会再检查
-                        print(f"线程池已满，等待空位提交账号 {account.account} 的任务...")
-                        time.sleep(2)
-                
-                # 稍微延迟一下，避免过快提交
-                time.sleep(0.5)
-            
-            print(f"所有未设置Cookie账号的获取任务已成功提交完成，共 {len(uncookied_accounts)} 个账号")
-        
-        # 启动后台线程
-        update_thread = threading.Thread(target=batch_get_uncookied_accounts, daemon=True)
-        update_thread.start()
-        
-        print(f"开始批量获取未设置Cookie账号的Cookie，账号数量: {len(uncookied_accounts)}")
+        job = _start_cookie_job('获取未设置Cookie账号的Cookie', uncookied_accounts)
         return jsonify({
             'success': True,
-            'message': f'正在获取 {len(uncookied_accounts)} 个未设置Cookie账号的Cookie，任务将智能调度到线程池中...'
+            'message': f'正在获取 {len(uncookied_accounts)} 个未设置Cookie账号的Cookie，同时登录 {job.concurrency} 个账号',
+            'data': job.to_dict()
         })
         
     except Exception as e:
@@ -560,6 +482,51 @@ def get_uncookied_accounts_cookie():
             'message': f'获取未设置Cookie账号失败: {str(e)}'
         }), 500
 
+@jimeng_accounts_bp.route('/cookie-jobs', methods=['GET'])
+def list_cookie_jobs():
+    """获取Cookie刷新作业列表"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': [job.to_dict() for job in cookie_refresh_jobs.list_jobs()]
+        })
+    except Exception as e:
+        print(f"获取Cookie刷新作业列表异常: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'获取作业列表失败: {str(e)}'
+        }), 500
+
+@jimeng_accounts_bp.route('/cookie-jobs/<job_id>', methods=['GET'])
+def get_cookie_job(job_id):
+    """获取Cookie刷新作业的进度和每个账号的结果"""
+    job = cookie_refresh_jobs.get_job(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': '作业不存在'
+        }), 404
+    return jsonify({
+        'success': True,
+        'data': job.to_dict(include_results=True)
+    })
+
+@jimeng_accounts_bp.route('/cookie-jobs/<job_id>/cancel', methods=['POST'])
+def cancel_cookie_job(job_id):
+    """取消Cookie刷新作业，正在登录的账号会执行完"""
+    job = cookie_refresh_jobs.cancel_job(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'message': '作业不存在'
+        }), 404
+    print(f"Cookie刷新作业已取消，作业ID: {job_id}")
+    return jsonify({
+        'success': True,
+        'message': '作业已取消，正在登录的账号完成后结束',
+        'data': job.to_dict()
+    })
+
 def _process_login_task(account_id, account_email, account_password):
     """处理登录任务（使用jimeng_login_window）"""
     try:
@@ -573,7 +540,11 @@ def _process_login_task(account_id, account_email, account_password):
         
         if result["code"] == 200 and result["data"]:
             # 更新账号的Cookie
+            cookie_write_buffer.discard(account.id)
             account.cookies = result["data"]
+            account.cookies_expire_at = session_expiry(result["data"])
+            account.session_ready = True
+            account.session_checked_at = datetime.now()
             account.updated_at = datetime.now()
             account.save()
             print(f"账号 {account.account} 登录成功，Cookie已更新")
@@ -589,23 +560,12 @@ def _process_cookie_task(account_id, account_email):
     """处理获取Cookie的任务"""
     try:
         print(f"开始获取账号Cookie: {account_email}")
-        
-        # 获取账号信息
-        account = JimengAccount.get_by_id(account_id)
-        
-        # 调用登录模块获取Cookie (使用asyncio.run执行异步函数)
-        result = asyncio.run(login_and_get_cookie(account.account, account.password, headless=True))
-        
-        if result["code"] == 200 and result["data"]:
-            # 更新账号的Cookie
-            account.cookies = result["data"]
-            account.updated_at = datetime.now()
-            account.save()
-            print(f"账号 {account.account} 的Cookie获取成功并已更新")
-            return True
+        ok, message = refresh_account_cookie(account_id)
+        if ok:
+            print(f"账号 {account_email} 的Cookie获取成功并已更新")
         else:
-            print(f"账号 {account.account} 的Cookie获取失败: {result['message']}")
-            return False
+            print(f"账号 {account_email} 的Cookie获取失败: {message}")
+        return ok
     except Exception as e:
         print(f"处理Cookie任务异常，账号: {account_email}, 错误: {str(e)}")
-        return False
\ No newline at end of file
+        return False
@@ -1,7 +1,10 @@
 # -*- coding: utf-8 -*-
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, jsonify
 from datetime import datetime
 
+from backend.core.startup import get_startup_report
+from backend.core.metrics import render_metrics
+
 # 创建蓝图
 common_bp = Blueprint('common', __name__, url_prefix='/api')
 
@@ -13,4 +16,17 @@ def health_check():
         'success': True,
         'message': '服务正常运行',
         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    })
\ No newline at end of file
+    })
+
+@common_bp.route('/startup', methods=['GET'])
+def startup_report():
+    """启动耗时统计"""
+    return jsonify({
+        'success': True,
+        'data': get_startup_report()
+    })
+
+@common_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus 格式的运行指标"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4; charset=utf-8')
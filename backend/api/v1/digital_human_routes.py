@@ -13,59 +13,78 @@ from flask import Blueprint, request, jsonify
 from werkzeug.utils import secure_filename
 
 from backend.models.models import JimengDigitalHumanTask, JimengAccount
+from backend.core.middleware import etag_by_table_versions
+from backend.utils.task_batch_util import batch_retry_tasks as batch_retry_tasks_util, batch_delete_tasks as batch_delete_tasks_util
+from backend.utils.task_query_util import query_task_page, count_tasks, parse_bool_arg
+from backend.utils.task_priority_util import priority_fields
 
 # 创建蓝图
 jimeng_digital_human_bp = Blueprint('jimeng_digital_human', __name__, url_prefix='/api/jimeng/digital-human')
 
 @jimeng_digital_human_bp.route('/tasks', methods=['GET'])
+@etag_by_table_versions(JimengDigitalHumanTask, JimengAccount)
 def get_tasks():
     """获取数字人任务列表"""
     try:
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 20))
         status_filter = request.args.get('status', 'all')
+        cursor = request.args.get('cursor') or None
+        with_total = parse_bool_arg(request.args.get('with_total'))
         
         # 构建查询
-        query = JimengDigitalHumanTask.select()
+        conditions = []
         
         if status_filter != 'all':
             try:
                 status_value = int(status_filter)
-                query = query.where(JimengDigitalHumanTask.status == status_value)
+                conditions.append(JimengDigitalHumanTask.status == status_value)
             except ValueError:
-                pass
+                status_filter = 'all'
+        
+        # 分页查询：只查询列表需要的列，传入游标时按 (create_at, id) 定位
+        rows, next_cursor = query_task_page(
+            JimengDigitalHumanTask,
+            [JimengDigitalHumanTask.id, JimengDigitalHumanTask.image_path, JimengDigitalHumanTask.audio_path,
+             JimengDigitalHumanTask.status, JimengDigitalHumanTask.account_id, JimengDigitalHumanTask.create_at,
+             JimengDigitalHumanTask.start_time, JimengDigitalHumanTask.video_url,
+             JimengDigitalHumanTask.failure_reason, JimengDigitalHumanTask.error_message],
+            conditions, page, per_page, cursor
+        )
         
         # 获取总数
-        total = query.count()
-        
-        # 分页查询
-        tasks = (query.order_by(JimengDigitalHumanTask.create_at.desc())
-                .paginate(page, per_page))
+        total = count_tasks(JimengDigitalHumanTask, conditions, cache_key=f'status={status_filter}') if with_total else None
+        
+        # 一次查询当前页用到的账号信息
+        account_ids = {row['account_id'] for row in rows if row['account_id']}
+        accounts = {}
+        if account_ids:
+            accounts = dict(
+                JimengAccount.select(JimengAccount.id, JimengAccount.account)
+                .where(JimengAccount.id.in_(list(account_ids)))
+                .tuples()
+            )
         
         # 转换为字典列表
         task_list = []
-        for task in tasks:
+        for row in rows:
             # 获取账号信息
             account_info = None
-            if task.account_id:
-                try:
-                    account = JimengAccount.get_by_id(task.account_id)
-                    account_info = account.account
-                except:
-                    account_info = f"账号ID:{task.account_id}"
+            if row['account_id']:
+                account_info = accounts.get(row['account_id'], f"账号ID:{row['account_id']}")
             
             task_dict = {
-                'id': task.id,
-                'image_path': task.image_path,
-                'audio_path': task.audio_path,
-                'status': task.status,
-                'account_id': task.account_id,
+                'id': row['id'],
+                'image_path': row['image_path'],
+                'audio_path': row['audio_path'],
+                'status': row['status'],
+                'account_id': row['account_id'],
                 'account_info': account_info,
-                'create_at': task.create_at.isoformat() if task.create_at else None,
-                'start_time': task.start_time.isoformat() if task.start_time else None,
-                'video_url': task.video_url,
-                'failure_reason': task.failure_reason,  # 失败原因类型
-                'error_message': task.error_message,  # 详细错误信息
+                'create_at': row['create_at'].isoformat() if row['create_at'] else None,
+                'start_time': row['start_time'].isoformat() if row['start_time'] else None,
+                'video_url': row['video_url'],
+                'failure_reason': row['failure_reason'],  # 失败原因类型
+                'error_message': row['error_message'],  # 详细错误信息
             }
             task_list.append(task_dict)
         
@@ -75,10 +94,17 @@ def get_tasks():
                 'tasks': task_list,
                 'total': total,
                 'page': page,
-                'per_page': per_page
+                'per_page': per_page,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
             }
         })
         
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         print(f"获取数字人任务列表失败: {str(e)}")
         return jsonify({
@@ -106,6 +132,11 @@ def create_task():
                 'message': '请选择有效的图片和音频文件'
             }), 400
         
+        try:
+            scheduling = priority_fields(request.form)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        
         # 创建tmp目录（在后端根目录下）
         import os
         from pathlib import Path
@@ -138,7 +169,8 @@ def create_task():
             image_path=str(image_path),
             audio_path=str(audio_path),
             status=0,  # 排队中
-            create_at=datetime.now()
+            create_at=datetime.now(),
+            **scheduling
         )
         
         return jsonify({
@@ -228,21 +260,13 @@ def batch_retry_tasks():
         data = request.get_json()
         task_ids = data.get('task_ids', [])
         
-        if not task_ids:
-            # 重试所有失败的任务
-            failed_tasks = JimengDigitalHumanTask.select().where(JimengDigitalHumanTask.status == 3)
-        else:
-            # 重试指定的任务
-            failed_tasks = JimengDigitalHumanTask.select().where(JimengDigitalHumanTask.id.in_(task_ids))
-        
-        retry_count = 0
-        for task in failed_tasks:
-            task.status = 0  # 排队中
-            task.account_id = None
-            task.start_time = None
-            task.video_url = None
-            task.save()
-            retry_count += 1
+        # 未指定任务时重试所有失败的任务，指定时重试选中的任务
+        retry_count = batch_retry_tasks_util(
+            JimengDigitalHumanTask,
+            task_ids,
+            only_failed=False,
+            extra_fields={'account_id': None, 'start_time': None, 'video_url': None}
+        )
         
         return jsonify({
             'success': True,
@@ -269,23 +293,10 @@ def batch_delete_tasks():
                 'message': '请选择要删除的任务'
             }), 400
         
-        # 获取要删除的任务
-        tasks = JimengDigitalHumanTask.select().where(JimengDigitalHumanTask.id.in_(task_ids))
-        
-        delete_count = 0
-        for task in tasks:
-            # 删除文件
-            try:
-                if task.image_path and os.path.exists(task.image_path):
-                    os.remove(task.image_path)
-                if task.audio_path and os.path.exists(task.audio_path):
-                    os.remove(task.audio_path)
-            except Exception as e:
-                print(f"删除文件失败: {str(e)}")
-            
-            # 删除任务记录
-            task.delete_instance()
-            delete_count += 1
+        # 删除任务记录及关联的图片、音频文件
+        delete_count, _ = batch_delete_tasks_util(
+            JimengDigitalHumanTask, task_ids, file_fields=('image_path', 'audio_path')
+        )
         
         return jsonify({
             'success': True,
@@ -488,6 +499,7 @@ def delete_tasks_before_today():
         }), 500
 
 @jimeng_digital_human_bp.route('/stats', methods=['GET'])
+@etag_by_table_versions(JimengDigitalHumanTask)
 def get_stats():
     """获取数字人任务统计"""
     try:
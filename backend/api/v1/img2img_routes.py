@@ -7,10 +7,13 @@ import os
 import json
 import requests
 import asyncio
-import pandas as pd
 from datetime import datetime
 from flask import Blueprint, request, jsonify
 from backend.models.models import JimengImg2ImgTask
+from backend.core.middleware import etag_by_table_versions
+from backend.utils.task_batch_util import batch_delete_tasks
+from backend.utils.task_priority_util import priority_fields
+from backend.utils.task_query_util import query_task_page, count_tasks, collect_paths, get_status_text, format_datetime, parse_bool_arg
 import subprocess
 import platform
 import threading
@@ -27,47 +30,59 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 @jimeng_img2img_bp.route('/tasks', methods=['GET'])
+@etag_by_table_versions(JimengImg2ImgTask)
 def get_img2img_tasks():
     """获取图生图任务列表"""
     try:
         page = int(request.args.get('page', 1))
         page_size = int(request.args.get('page_size', 10))
         status = request.args.get('status', None)
+        cursor = request.args.get('cursor') or None
+        with_total = parse_bool_arg(request.args.get('with_total'))
         
         print("获取图生图任务列表，页码: {}, 每页数量: {}, 状态: {}".format(page, page_size, status))
         
         # 构建查询 - 过滤掉空任务
-        query = JimengImg2ImgTask.select()
+        conditions = []
         if status is not None:
-            query = query.where(JimengImg2ImgTask.status == status)
-        
-        # 分页
-        total = query.count()
-        tasks = query.order_by(JimengImg2ImgTask.create_at.desc()).paginate(page, page_size)
+            conditions.append(JimengImg2ImgTask.status == status)
+        
+        # 分页：只查询列表需要的列，传入游标时按 (create_at, id) 定位
+        input_image_fields = ('input_image1', 'input_image2', 'input_image3')
+        output_image_fields = ('image1', 'image2', 'image3', 'image4')
+        rows, next_cursor = query_task_page(
+            JimengImg2ImgTask,
+            [JimengImg2ImgTask.id, JimengImg2ImgTask.prompt, JimengImg2ImgTask.model,
+             JimengImg2ImgTask.ratio, JimengImg2ImgTask.status,
+             JimengImg2ImgTask.account_id, JimengImg2ImgTask.input_image1, JimengImg2ImgTask.input_image2,
+             JimengImg2ImgTask.input_image3, JimengImg2ImgTask.image1, JimengImg2ImgTask.image2,
+             JimengImg2ImgTask.image3, JimengImg2ImgTask.image4, JimengImg2ImgTask.task_id,
+             JimengImg2ImgTask.retry_count, JimengImg2ImgTask.max_retry, JimengImg2ImgTask.failure_reason,
+             JimengImg2ImgTask.error_message, JimengImg2ImgTask.create_at, JimengImg2ImgTask.update_at],
+            conditions, page, page_size, cursor
+        )
+        total = count_tasks(JimengImg2ImgTask, conditions, cache_key=f'status={status}') if with_total else None
         
         data = []
-        for task in tasks:
-            input_images = task.get_input_images()
-            output_images = task.get_images()
-            
+        for row in rows:
             data.append({
-                'id': task.id,
-                'prompt': task.prompt,
-                'model': task.model,
-                'ratio': task.ratio,
-                'quality': task.quality,
-                'status': task.status,
-                'status_text': task.get_status_text(),
-                'account_id': task.account_id,
-                'input_images': input_images,
-                'output_images': output_images,
-                'task_id': task.task_id,
-                'retry_count': task.retry_count,
-                'max_retry': task.max_retry,
-                'failure_reason': task.failure_reason,
-                'error_message': task.error_message,
-                'create_at': task.create_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'update_at': task.update_at.strftime('%Y-%m-%d %H:%M:%S')
+                'id': row['id'],
+                'prompt': row['prompt'],
+                'model': row['model'],
+                'ratio': row['ratio'],
+                'quality': None,  # 图生图任务没有清晰度字段
+                'status': row['status'],
+                'status_text': get_status_text(row['status']),
+                'account_id': row['account_id'],
+                'input_images': collect_paths(row, input_image_fields),
+                'output_images': collect_paths(row, output_image_fields),
+                'task_id': row['task_id'],
+                'retry_count': row['retry_count'],
+                'max_retry': row['max_retry'],
+                'failure_reason': row['failure_reason'],
+                'error_message': row['error_message'],
+                'create_at': format_datetime(row['create_at']),
+                'update_at': format_datetime(row['update_at'])
             })
         
         return jsonify({
@@ -76,10 +91,17 @@ def get_img2img_tasks():
                 'tasks': data,
                 'total': total,
                 'page': page,
-                'page_size': page_size
+                'page_size': page_size,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
             }
         })
         
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         print("获取任务列表失败: {}".format(str(e)))
         return jsonify({
@@ -88,6 +110,7 @@ def get_img2img_tasks():
         }), 500
 
 @jimeng_img2img_bp.route('/stats', methods=['GET'])
+@etag_by_table_versions(JimengImg2ImgTask)
 def get_img2img_stats():
     """获取图生图任务统计"""
     try:
@@ -168,6 +191,11 @@ def create_img2img_task():
                 'message': '请输入提示词'
             }), 400
         
+        try:
+            scheduling = priority_fields(request.form)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        
         # 保存上传的图片
         saved_images = []
         tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'tmp')
@@ -188,6 +216,7 @@ def create_img2img_task():
             model=model,
             ratio=aspect_ratio,
             status=0,  # 默认状态：0-排队中
+            **scheduling,
             # 输出图片路径字段保持为空，由任务处理器填入
             image1=None,
             image2=None,
@@ -205,6 +234,7 @@ def create_img2img_task():
                 'id': task.id,
                 'status': task.status,
                 'status_text': task.get_status_text(),
+                'priority': task.priority,
                 'create_at': task.create_at.strftime('%Y-%m-%d %H:%M:%S')
             },
             'message': '任务创建成功'
@@ -305,37 +335,13 @@ def batch_delete_img2img_tasks():
                 'message': '请选择要删除的任务'
             }), 400
         
-        deleted_count = 0
-        for task_id in task_ids:
-            try:
-                task = JimengImg2ImgTask.get_by_id(task_id)
-                
-                # 删除输入图片文件
-                input_images = task.get_input_images()
-                for image_path in input_images:
-                    if image_path and os.path.exists(image_path):
-                        try:
-                            os.remove(image_path)
-                        except Exception as e:
-                            print(f"删除输入图片文件失败: {image_path}, 错误: {e}")
-                
-                # 删除输出图片文件
-                output_images = task.get_images()
-                for image_path in output_images:
-                    if image_path and os.path.exists(image_path):
-                        try:
-                            os.remove(image_path)
-                        except Exception as e:
-                            print(f"删除输出图片文件失败: {image_path}, 错误: {e}")
-                
-                task.delete_instance()
-                deleted_count += 1
-                
-            except JimengImg2ImgTask.DoesNotExist:
-                continue
-            except Exception as e:
-                print(f"删除任务 {task_id} 失败: {e}")
-                continue
+        # 删除任务记录及输入、输出图片文件
+        deleted_count, _ = batch_delete_tasks(
+            JimengImg2ImgTask,
+            task_ids,
+            file_fields=('input_image1', 'input_image2', 'input_image3',
+                         'image1', 'image2', 'image3', 'image4')
+        )
         
         return jsonify({
             'success': True,
@@ -7,10 +7,14 @@ import os
 import json
 import requests
 import asyncio
-import pandas as pd
 from datetime import datetime
 from flask import Blueprint, request, jsonify
 from backend.models.models import JimengImg2VideoTask
+from backend.core.middleware import etag_by_table_versions
+from backend.utils.task_batch_util import batch_retry_tasks, batch_delete_tasks
+from backend.utils.task_priority_util import priority_fields
+from backend.utils.task_query_util import query_task_page, count_tasks, get_status_text, format_datetime, parse_bool_arg
+from backend.utils.task_import_util import create_import_job, get_import_job, scan_image_files, parallel_map, bulk_insert_tasks
 import subprocess
 import platform
 import threading
@@ -20,40 +24,50 @@ from urllib.parse import urlparse
 jimeng_img2video_bp = Blueprint('jimeng_img2video', __name__, url_prefix='/api/jimeng/img2video')
 
 @jimeng_img2video_bp.route('/tasks', methods=['GET'])
+@etag_by_table_versions(JimengImg2VideoTask)
 def get_img2video_tasks():
     """获取图生视频任务列表"""
     try:
         page = int(request.args.get('page', 1))
         page_size = int(request.args.get('page_size', 10))
         status = request.args.get('status', None)
+        cursor = request.args.get('cursor') or None
+        with_total = parse_bool_arg(request.args.get('with_total'))
         
         print("获取图生视频任务列表，页码: {}, 每页数量: {}, 状态: {}".format(page, page_size, status))
         
         # 构建查询 - 过滤掉空任务
-        query = JimengImg2VideoTask.select()
+        conditions = []
         if status is not None:
-            query = query.where(JimengImg2VideoTask.status == status)
-        
-        # 分页
-        total = query.count()
-        tasks = query.order_by(JimengImg2VideoTask.create_at.desc()).paginate(page, page_size)
+            conditions.append(JimengImg2VideoTask.status == status)
+        
+        # 分页：只查询列表需要的列，传入游标时按 (create_at, id) 定位
+        rows, next_cursor = query_task_page(
+            JimengImg2VideoTask,
+            [JimengImg2VideoTask.id, JimengImg2VideoTask.prompt, JimengImg2VideoTask.model,
+             JimengImg2VideoTask.second, JimengImg2VideoTask.status, JimengImg2VideoTask.account_id,
+             JimengImg2VideoTask.image_path, JimengImg2VideoTask.video_url, JimengImg2VideoTask.failure_reason,
+             JimengImg2VideoTask.error_message, JimengImg2VideoTask.create_at, JimengImg2VideoTask.update_at],
+            conditions, page, page_size, cursor
+        )
+        total = count_tasks(JimengImg2VideoTask, conditions, cache_key=f'status={status}') if with_total else None
         
         data = []
-        for task in tasks:
+        for row in rows:
             data.append({
-                'id': task.id,
-                'prompt': task.prompt,
-                'model': task.model,
-                'second': task.second,
-                'status': task.status,
-                'status_text': task.get_status_text(),
-                'account_id': task.account_id,
-                'image_path': task.image_path,
-                'video_url': task.video_url,
-                'failure_reason': task.failure_reason,  # 失败原因类型
-                'error_message': task.error_message,  # 详细错误信息
-                'create_at': task.create_at.strftime('%Y-%m-%d %H:%M:%S') if task.create_at else None,
-                'update_at': task.update_at.strftime('%Y-%m-%d %H:%M:%S') if task.update_at else None
+                'id': row['id'],
+                'prompt': row['prompt'],
+                'model': row['model'],
+                'second': row['second'],
+                'status': row['status'],
+                'status_text': get_status_text(row['status']),
+                'account_id': row['account_id'],
+                'image_path': row['image_path'],
+                'video_url': row['video_url'],
+                'failure_reason': row['failure_reason'],  # 失败原因类型
+                'error_message': row['error_message'],  # 详细错误信息
+                'create_at': format_datetime(row['create_at']),
+                'update_at': format_datetime(row['update_at'])
             })
         
         return jsonify({
@@ -63,10 +77,14 @@ def get_img2video_tasks():
                 'page': page,
                 'page_size': page_size,
                 'total': total,
-                'pages': (total + page_size - 1) // page_size
+                'pages': (total + page_size - 1) // page_size if total is not None else None,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
             }
         })
         
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         print(f"获取图生视频任务列表失败: {str(e)}")
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -84,7 +102,8 @@ def create_img2video_task():
                 model=data.get('model', 'Video 3.0'),
                 second=data.get('second', 5),
                 image_path=data['image_path'],
-                status=0
+                status=0,
+                **priority_fields(data)
             )
             
             print(f"创建图生视频任务: {task.id}")
@@ -101,7 +120,9 @@ def create_img2video_task():
                     model=task_data.get('model', 'Video 3.0'),
                     second=task_data.get('second', 5),
                     image_path=task_data['image_path'],
-                    status=0
+                    status=0,
+                    # 每个任务可单独指定优先级，未指定时使用请求中的值
+                    **priority_fields(task_data, batch=True, fallback=data)
                 )
                 created_tasks.append(task.id)
             
@@ -111,6 +132,8 @@ def create_img2video_task():
         else:
             return jsonify({'success': False, 'message': '缺少必要参数'}), 400
             
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         print(f"创建图生视频任务失败: {str(e)}")
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -154,25 +177,8 @@ def batch_retry_img2video_tasks():
         data = request.get_json()
         task_ids = data.get('task_ids', [])
         
-        if task_ids:
-            # 如果提供了特定的任务ID列表，只重试这些任务
-            tasks = JimengImg2VideoTask.select().where(
-                JimengImg2VideoTask.id.in_(task_ids),
-                JimengImg2VideoTask.status == 3  # 只重试失败的任务
-            )
-            retry_count = 0
-            for task in tasks:
-                task.update_status(0)  # 重置为排队状态
-                retry_count += 1
-        else:
-            # 如果没有提供任务ID，重试所有失败的任务
-            tasks = JimengImg2VideoTask.select().where(
-                JimengImg2VideoTask.status == 3  # 只重试失败的任务
-            )
-            retry_count = 0
-            for task in tasks:
-                task.update_status(0)  # 重置为排队状态
-                retry_count += 1
+        # 提供任务ID时只重试这些任务中失败的，否则重试所有失败的任务
+        retry_count = batch_retry_tasks(JimengImg2VideoTask, task_ids, only_failed=True)
         
         print(f"批量重试图生视频任务: {retry_count}个")
         return jsonify({
@@ -198,7 +204,7 @@ def batch_delete_img2video_tasks():
             return jsonify({'success': False, 'message': '未提供任务ID'}), 400
         
         # 删除任务
-        deleted_count = JimengImg2VideoTask.delete().where(JimengImg2VideoTask.id.in_(task_ids)).execute()
+        deleted_count, _ = batch_delete_tasks(JimengImg2VideoTask, task_ids)
         
         print(f"批量删除图生视频任务: {deleted_count}个")
         return jsonify({'success': True, 'message': f'成功删除 {deleted_count} 个任务'})
@@ -217,9 +223,15 @@ def import_folder_tasks():
         second = data.get('second', 5)  # 默认为5秒
         use_prompt = data.get('usePrompt', False)  # 是否使用提示词
         prompt = data.get('prompt', '')  # 提示词内容
+        try:
+            scheduling = priority_fields(data, batch=True)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         
         print(f"导入文件夹任务，模型: {model}, 时长: {second}秒, 使用提示词: {use_prompt}, 提示词: {prompt}")
         
+        import_job = create_import_job('import-folder')
+        
         def select_folder_and_import():
             try:
                 # 调用原生文件夹选择对话框
@@ -257,42 +269,50 @@ def import_folder_tasks():
                 
                 if not folder_path:
                     print("用户取消了文件夹选择")
+                    import_job.finish('cancelled', '用户取消了文件夹选择')
                     return
                 
                 print(f"选择的文件夹: {folder_path}")
                 
                 # 扫描文件夹中的图片文件
-                image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp'}
-                image_files = []
-                
-                for filename in os.listdir(folder_path):
-                    file_ext = os.path.splitext(filename)[1].lower()
-                    if file_ext in image_extensions:
-                        image_files.append(os.path.join(folder_path, filename))
+                import_job.update(status='scanning')
+                image_files = scan_image_files(folder_path)
+                import_job.update(status='validating', total=len(image_files))
                 
                 print(f"找到 {len(image_files)} 张图片")
                 
-                # 创建任务
-                created_count = 0
-                for image_path in image_files:
-                    try:
-                        # 根据usePrompt参数决定是否使用提示词
-                        task_prompt = prompt if use_prompt else ''
-                        
-                        task = JimengImg2VideoTask.create(
-                            prompt=task_prompt,  # 根据usePrompt参数决定提示词
-                            model=model,  # 使用传入的模型参数
-                            second=second,  # 使用传入的时长参数
-                            image_path=image_path,
-                            status=0
-                        )
-                        created_count += 1
-                    except Exception as e:
-                        print(f"创建任务失败 {image_path}: {str(e)}")
+                # 并行校验图片文件是否可读
+                def validate_image(image_path):
+                    if os.path.getsize(image_path) <= 0:
+                        raise ValueError('图片文件为空')
+                    return image_path
+                
+                # 根据usePrompt参数决定是否使用提示词
+                task_prompt = prompt if use_prompt else ''
+                
+                rows = []
+                for image_path, result in zip(image_files, parallel_map(validate_image, image_files, import_job)):
+                    if isinstance(result, Exception):
+                        import_job.add_error(f"{image_path}: {str(result)}")
+                        continue
+                    rows.append({
+                        'prompt': task_prompt,  # 根据usePrompt参数决定提示词
+                        'model': model,  # 使用传入的模型参数
+                        'second': second,  # 使用传入的时长参数
+                        'image_path': image_path,
+                        'status': 0,
+                        **scheduling
+                    })
+                
+                # 分块批量创建任务
+                import_job.update(status='inserting')
+                created_task_ids = bulk_insert_tasks(JimengImg2VideoTask, rows, import_job)
+                import_job.finish('completed', f'成功创建 {len(created_task_ids)} 个任务')
                 
-                print(f"成功创建 {created_count} 个图生视频任务，模型: {model}, 时长: {second}秒, 提示词: {task_prompt}")
+                print(f"成功创建 {len(created_task_ids)} 个图生视频任务，模型: {model}, 时长: {second}秒, 提示词: {task_prompt}")
                 
             except Exception as e:
+                import_job.finish('failed', str(e))
                 print(f"文件夹导入失败: {str(e)}")
         
         # 在后台线程中执行文件夹选择和导入
@@ -300,12 +320,27 @@ def import_folder_tasks():
         import_thread.daemon = True
         import_thread.start()
         
-        return jsonify({'success': True, 'message': '正在打开文件夹选择对话框，请选择包含图片的文件夹'})
+        return jsonify({
+            'success': True,
+            'message': '正在打开文件夹选择对话框，请选择包含图片的文件夹',
+            'data': {
+                'job_id': import_job.job_id
+            }
+        })
         
     except Exception as e:
         print(f"导入文件夹失败: {str(e)}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@jimeng_img2video_bp.route('/tasks/import-jobs/<job_id>', methods=['GET'])
+def get_import_job_progress(job_id):
+    """获取批量导入进度"""
+    import_job = get_import_job(job_id)
+    if not import_job:
+        return jsonify({'success': False, 'message': '导入任务不存在'}), 404
+    
+    return jsonify({'success': True, 'data': import_job.to_dict()})
+
 @jimeng_img2video_bp.route('/tasks/batch-add', methods=['POST'])
 def batch_add_tasks():
     """批量添加图生视频任务"""
@@ -327,6 +362,10 @@ def batch_add_tasks():
         # 获取配置参数
         model = request.form.get('model', 'Video 3.0')
         second = int(request.form.get('second', 5))
+        try:
+            scheduling = priority_fields(request.form, batch=True)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
 
         # 支持的图片格式
         ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
@@ -341,7 +380,10 @@ def batch_add_tasks():
         tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'tmp', 'batch_upload')
         os.makedirs(tmp_dir, exist_ok=True)
 
-        created_tasks = []
+        import_job = create_import_job('batch-add')
+        import_job.update(status='validating', total=len(files))
+
+        rows = []
         failed_files = []
 
         for i, file in enumerate(files):
@@ -351,6 +393,7 @@ def batch_add_tasks():
 
                 if not allowed_file(file.filename):
                     failed_files.append(f"{file.filename}: 不支持的文件格式")
+                    import_job.add_error(failed_files[-1])
                     continue
 
                 # 保存上传的图片
@@ -359,25 +402,35 @@ def batch_add_tasks():
                 unique_filename = f"{uuid.uuid4().hex}.{file_ext}"
                 file_path = os.path.join(tmp_dir, unique_filename)
                 file.save(file_path)
+                import_job.add_validated()
 
                 # 获取对应的提示词
                 prompt = request.form.get(f'prompts[{i}]', '')
 
-                # 创建任务
-                task = JimengImg2VideoTask.create(
-                    prompt=prompt,
-                    model=model,
-                    second=second,
-                    image_path=file_path,
-                    status=0
-                )
-                created_tasks.append(task.id)
-                print(f"创建图生视频任务: {task.id}, 图片: {filename}, 提示词: {prompt}")
+                rows.append({
+                    'prompt': prompt,
+                    'model': model,
+                    'second': second,
+                    'image_path': file_path,
+                    'status': 0,
+                    **scheduling
+                })
 
             except Exception as e:
                 failed_files.append(f"{file.filename}: {str(e)}")
+                import_job.add_error(failed_files[-1])
                 print(f"处理文件 {file.filename} 失败: {str(e)}")
 
+        # 分块批量创建任务
+        import_job.update(status='inserting')
+        try:
+            created_tasks = bulk_insert_tasks(JimengImg2VideoTask, rows, import_job)
+        except Exception as e:
+            import_job.finish('failed', str(e))
+            raise
+        import_job.finish('completed', f'成功创建 {len(created_tasks)} 个任务')
+        print(f"批量创建图生视频任务: {len(created_tasks)}个")
+
         # 构建响应消息
         message_parts = []
         if created_tasks:
@@ -392,7 +445,8 @@ def batch_add_tasks():
                 'created_count': len(created_tasks),
                 'failed_count': len(failed_files),
                 'created_task_ids': created_tasks,
-                'failed_files': failed_files
+                'failed_files': failed_files,
+                'job_id': import_job.job_id
             }
         })
 
@@ -605,6 +659,7 @@ def batch_download_videos():
         }), 500
 
 @jimeng_img2video_bp.route('/stats', methods=['GET'])
+@etag_by_table_versions(JimengImg2VideoTask)
 def get_img2video_stats():
     """获取图生视频统计信息"""
     try:
@@ -694,40 +749,49 @@ def batch_create_tasks_from_table():
                 'message': '任务数据格式错误'
             }), 400
 
-        created_tasks = []
-        failed_tasks = []
+        import_job = create_import_job('batch-create-from-table')
+        import_job.update(status='validating', total=len(tasks_data))
 
-        for i, task_data in enumerate(tasks_data):
-            try:
-                # 验证必需字段
-                if 'image_path' not in task_data or not task_data['image_path']:
-                    failed_tasks.append(f"第 {i+1} 行: 缺少图片路径")
-                    continue
+        def validate_row(task_data):
+            # 验证必需字段
+            if 'image_path' not in task_data or not task_data['image_path']:
+                raise ValueError('缺少图片路径')
 
-                image_path = task_data['image_path'].strip()
-                prompt = task_data.get('prompt', '').strip()
-                model = task_data.get('model', 'Video 3.0')
-                second = int(task_data.get('second', 5))
+            image_path = task_data['image_path'].strip()
 
-                # 验证图片路径是否存在
-                if not os.path.exists(image_path):
-                    failed_tasks.append(f"第 {i+1} 行: 图片文件不存在 - {image_path}")
-                    continue
+            # 验证图片路径是否存在
+            if not os.path.exists(image_path):
+                raise ValueError(f'图片文件不存在 - {image_path}')
 
-                # 创建任务
-                task = JimengImg2VideoTask.create(
-                    prompt=prompt,
-                    model=model,
-                    second=second,
-                    image_path=image_path,
-                    status=0
-                )
-                created_tasks.append(task.id)
-                print(f"从表格创建图生视频任务: {task.id}, 图片: {image_path}, 提示词: {prompt}, 模型: {model}, 时长: {second}s")
+            return {
+                'prompt': task_data.get('prompt', '').strip(),
+                'model': task_data.get('model', 'Video 3.0'),
+                'second': int(task_data.get('second', 5)),
+                'image_path': image_path,
+                'status': 0,
+                # 每行可单独指定优先级和截止时间，未指定时使用请求中的值
+                **priority_fields(task_data, batch=True, fallback=data)
+            }
 
-            except Exception as e:
-                failed_tasks.append(f"第 {i+1} 行: {str(e)}")
-                print(f"处理第 {i+1} 行任务失败: {str(e)}")
+        # 并行校验每一行，结果顺序与表格一致
+        rows = []
+        failed_tasks = []
+        for i, result in enumerate(parallel_map(validate_row, tasks_data, import_job)):
+            if isinstance(result, Exception):
+                failed_tasks.append(f"第 {i+1} 行: {str(result)}")
+                import_job.add_error(failed_tasks[-1])
+                continue
+            rows.append(result)
+
+        # 分块批量创建任务
+        import_job.update(status='inserting')
+        try:
+            created_tasks = bulk_insert_tasks(JimengImg2VideoTask, rows, import_job)
+        except Exception as e:
+            import_job.finish('failed', str(e))
+            raise
+        import_job.finish('completed', f'成功创建 {len(created_tasks)} 个任务')
+        print(f"从表格批量创建图生视频任务: {len(created_tasks)}个")
 
         # 返回结果
         result_message = f"成功创建 {len(created_tasks)} 个任务"
@@ -741,7 +805,8 @@ def batch_create_tasks_from_table():
                 'created_count': len(created_tasks),
                 'failed_count': len(failed_tasks),
                 'created_task_ids': created_tasks,
-                'failed_tasks': failed_tasks
+                'failed_tasks': failed_tasks,
+                'job_id': import_job.job_id
             }
         })
 
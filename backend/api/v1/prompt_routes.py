@@ -5,13 +5,10 @@
 """
 
 import os
-import pandas as pd
 import base64
 import io
 from flask import Blueprint, request, jsonify
 from pathlib import Path
-from openpyxl import load_workbook
-from PIL import Image
 
 # 创建蓝图
 prompt_bp = Blueprint('prompt', __name__, url_prefix='/api/prompt')
@@ -21,6 +18,10 @@ PROMPT_DATABASE_PATH = Path(__file__).parent.parent.parent / 'prompt_database'
 
 def extract_images_from_excel(excel_file, platform='jimeng'):
     """从Excel文件中提取图片并返回Base64编码的字典"""
+    # openpyxl、PIL 较重，只在读取提示词库时导入
+    from openpyxl import load_workbook
+    from PIL import Image
+    
     images = {}
     
     try:
@@ -170,6 +171,9 @@ def get_image_base64(image_filename, platform='jimeng'):
 
 def load_prompt_data(platform='jimeng'):
     """加载指定平台的提示词数据"""
+    # pandas 导入耗时较长，只在读取提示词库时导入
+    import pandas as pd
+    
     try:
         platform_path = PROMPT_DATABASE_PATH / platform
         excel_file = platform_path / 'prompt.xlsx'
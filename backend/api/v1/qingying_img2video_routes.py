@@ -13,8 +13,14 @@ from datetime import datetime, timedelta
 from flask import Blueprint, request, jsonify, current_app
 from werkzeug.utils import secure_filename
 import uuid
+import shutil
 
 from backend.models.models import QingyingImage2VideoTask, QingyingAccount
+from backend.core.middleware import etag_by_table_versions
+from backend.utils.task_batch_util import batch_retry_tasks as batch_retry_tasks_util, batch_delete_tasks as batch_delete_tasks_util
+from backend.utils.task_query_util import query_task_page, count_tasks, get_status_text, format_datetime, parse_bool_arg
+from backend.utils.task_import_util import create_import_job, get_import_job, scan_image_files, parallel_map, bulk_insert_tasks
+from backend.utils.task_priority_util import priority_fields
 from backend.core.global_task_manager import global_task_manager
 
 # 创建蓝图
@@ -26,50 +32,59 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 @qingying_img2video_bp.route('/tasks', methods=['GET'])
+@etag_by_table_versions(QingyingImage2VideoTask, QingyingAccount)
 def get_tasks():
     """获取图生视频任务列表"""
     try:
         page = int(request.args.get('page', 1))
         page_size = int(request.args.get('page_size', 20))
-        
-        # 计算偏移量
-        offset = (page - 1) * page_size
-        
-        # 查询任务列表（按创建时间倒序）
-        tasks_query = QingyingImage2VideoTask.select().order_by(QingyingImage2VideoTask.create_at.desc())
-        total_count = tasks_query.count()
-        
-        tasks = list(tasks_query.offset(offset).limit(page_size))
+        cursor = request.args.get('cursor') or None
+        with_total = parse_bool_arg(request.args.get('with_total'))
+        
+        # 查询任务列表（按创建时间倒序），只查询列表需要的列，传入游标时按 (create_at, id) 定位
+        rows, next_cursor = query_task_page(
+            QingyingImage2VideoTask,
+            [QingyingImage2VideoTask.id, QingyingImage2VideoTask.prompt, QingyingImage2VideoTask.generation_mode,
+             QingyingImage2VideoTask.frame_rate, QingyingImage2VideoTask.resolution, QingyingImage2VideoTask.duration,
+             QingyingImage2VideoTask.ai_audio, QingyingImage2VideoTask.status, QingyingImage2VideoTask.image_path,
+             QingyingImage2VideoTask.video_url, QingyingImage2VideoTask.failure_reason,
+             QingyingImage2VideoTask.error_message, QingyingImage2VideoTask.create_at,
+             QingyingImage2VideoTask.update_at, QingyingImage2VideoTask.account_id],
+            page=page, page_size=page_size, cursor=cursor
+        )
+        total_count = count_tasks(QingyingImage2VideoTask, cache_key='all') if with_total else None
+        
+        # 一次查询当前页关联的账号昵称
+        account_ids = {row['account_id'] for row in rows if row['account_id']}
+        nicknames = {}
+        if account_ids:
+            nicknames = dict(
+                QingyingAccount.select(QingyingAccount.id, QingyingAccount.nickname)
+                .where(QingyingAccount.id.in_(list(account_ids)))
+                .tuples()
+            )
         
         # 构建返回数据
         task_list = []
-        for task in tasks:
-            # 获取关联的账号信息
-            account = None
-            if task.account_id:
-                try:
-                    account = QingyingAccount.get_by_id(task.account_id)
-                except QingyingAccount.DoesNotExist:
-                    account = None
-            
+        for row in rows:
             task_data = {
-                'id': task.id,
-                'prompt': task.prompt,
-                'generation_mode': task.generation_mode,
-                'frame_rate': task.frame_rate,
-                'resolution': task.resolution,
-                'duration': task.duration,
-                'ai_audio': task.ai_audio,
-                'status': task.status,
-                'status_text': task.get_status_text(),
-                'image_path': task.image_path,
-                'video_url': task.video_url,
-                'failure_reason': task.failure_reason,  # 失败原因类型
-                'error_message': task.error_message,  # 详细错误信息
-                'create_at': task.create_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'update_at': task.update_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'account_nickname': account.nickname if account else None,
-                'account_id': task.account_id
+                'id': row['id'],
+                'prompt': row['prompt'],
+                'generation_mode': row['generation_mode'],
+                'frame_rate': row['frame_rate'],
+                'resolution': row['resolution'],
+                'duration': row['duration'],
+                'ai_audio': row['ai_audio'],
+                'status': row['status'],
+                'status_text': get_status_text(row['status']),
+                'image_path': row['image_path'],
+                'video_url': row['video_url'],
+                'failure_reason': row['failure_reason'],  # 失败原因类型
+                'error_message': row['error_message'],  # 详细错误信息
+                'create_at': format_datetime(row['create_at']),
+                'update_at': format_datetime(row['update_at']),
+                'account_nickname': nicknames.get(row['account_id']),
+                'account_id': row['account_id']
             }
             task_list.append(task_data)
         
@@ -80,10 +95,17 @@ def get_tasks():
                 'page': page,
                 'page_size': page_size,
                 'total': total_count,
-                'pages': (total_count + page_size - 1) // page_size
+                'pages': (total_count + page_size - 1) // page_size if total_count is not None else None,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
             }
         })
         
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         current_app.logger.error(f"获取清影图生视频任务列表失败: {str(e)}")
         return jsonify({
@@ -92,6 +114,7 @@ def get_tasks():
         }), 500
 
 @qingying_img2video_bp.route('/tasks/stats', methods=['GET'])
+@etag_by_table_versions(QingyingImage2VideoTask)
 def get_stats():
     """获取任务统计信息"""
     try:
@@ -166,6 +189,11 @@ def create_task():
                 'message': '请输入提示词'
             }), 400
         
+        try:
+            scheduling = priority_fields(request.form)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        
         # 保存上传的图片
         filename = secure_filename(file.filename)
         file_ext = filename.rsplit('.', 1)[1].lower()
@@ -189,7 +217,8 @@ def create_task():
             image_path=file_path,
             status=0,  # 排队中
             create_at=datetime.now(),
-            update_at=datetime.now()
+            update_at=datetime.now(),
+            **scheduling
         )
         
         # 提交任务到全局任务管理器
@@ -328,27 +357,13 @@ def batch_retry_tasks():
                 'message': '请选择要重试的任务'
             }), 400
         
-        retry_count = 0
-        for task_id in task_ids:
-            try:
-                task = QingyingImage2VideoTask.get_by_id(task_id)
-                
-                # 重置任务状态
-                task.status = 0  # 排队中
-                task.account_id = None
-                task.video_url = None
-                task.update_at = datetime.now()
-                task.save()
-                
-                # 重新提交任务到全局任务管理器
-                if hasattr(global_task_manager, 'qingying_img2video_manager'):
-                    global_task_manager.qingying_img2video_manager.submit_task(task.id)
-                
-                retry_count += 1
-                
-            except QingyingImage2VideoTask.DoesNotExist:
-                current_app.logger.warning(f"任务 {task_id} 不存在，跳过")
-                continue
+        # 一条 UPDATE 重置选中的任务，任务管理器扫描排队任务时会自动加入队列
+        retry_count = batch_retry_tasks_util(
+            QingyingImage2VideoTask,
+            task_ids,
+            only_failed=False,
+            extra_fields={'account_id': None, 'video_url': None}
+        )
         
         return jsonify({
             'success': True,
@@ -373,9 +388,15 @@ def import_folder_tasks():
         resolution = data.get('resolution', '720p')
         duration = data.get('duration', '5s')
         ai_audio = data.get('ai_audio', False)
+        try:
+            scheduling = priority_fields(data, batch=True)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
         
         print(f"清影导入文件夹任务，参数: {generation_mode}, {frame_rate}, {resolution}, {duration}, {ai_audio}")
         
+        import_job = create_import_job('import-folder')
+        
         def select_folder_and_import():
             try:
                 # 调用原生文件夹选择对话框
@@ -413,58 +434,61 @@ def import_folder_tasks():
                 
                 if not folder_path:
                     print("用户取消了文件夹选择")
+                    import_job.finish('cancelled', '用户取消了文件夹选择')
                     return
                 
                 print(f"选择的文件夹: {folder_path}")
                 
                 if not os.path.exists(folder_path):
                     print(f"文件夹不存在: {folder_path}")
+                    import_job.finish('failed', f'文件夹不存在: {folder_path}')
                     return
                 
-                # 支持的图片格式
-                supported_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'}
+                # 扫描文件夹中的图片文件
+                import_job.update(status='scanning')
+                image_files = scan_image_files(folder_path)
+                import_job.update(status='validating', total=len(image_files))
                 
-                created_count = 0
-                import shutil
-                for filename in os.listdir(folder_path):
-                    file_ext = os.path.splitext(filename)[1].lower()
-                    if file_ext in supported_extensions:
-                        source_path = os.path.join(folder_path, filename)
-                        
-                        # 复制文件到tmp目录
-                        file_ext = filename.rsplit('.', 1)[1].lower()
-                        unique_filename = f"{uuid.uuid4().hex}.{file_ext}"
-                        
-                        tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'tmp')
-                        os.makedirs(tmp_dir, exist_ok=True)
-                        
-                        dest_path = os.path.join(tmp_dir, unique_filename)
-                        
-                        shutil.copy2(source_path, dest_path)
-                        
-                        # 创建任务
-                        task = QingyingImage2VideoTask.create(
-                            prompt="",
-                            generation_mode=generation_mode,
-                            frame_rate=frame_rate,
-                            resolution=resolution,
-                            duration=duration,
-                            ai_audio=ai_audio,
-                            image_path=dest_path,
-                            status=0,
-                            create_at=datetime.now(),
-                            update_at=datetime.now()
-                        )
-                        
-                        # 提交任务到全局任务管理器
-                        if hasattr(global_task_manager, 'qingying_img2video_manager'):
-                            global_task_manager.qingying_img2video_manager.submit_task(task.id)
-                        
-                        created_count += 1
+                tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'tmp')
+                os.makedirs(tmp_dir, exist_ok=True)
+                
+                # 并行复制文件到tmp目录
+                def copy_image(source_path):
+                    file_ext = source_path.rsplit('.', 1)[1].lower()
+                    unique_filename = f"{uuid.uuid4().hex}.{file_ext}"
+                    dest_path = os.path.join(tmp_dir, unique_filename)
+                    shutil.copy2(source_path, dest_path)
+                    return dest_path
+                
+                rows = []
+                now = datetime.now()
+                for source_path, result in zip(image_files, parallel_map(copy_image, image_files, import_job)):
+                    if isinstance(result, Exception):
+                        import_job.add_error(f"{source_path}: {str(result)}")
+                        continue
+                    rows.append({
+                        'prompt': "",
+                        'generation_mode': generation_mode,
+                        'frame_rate': frame_rate,
+                        'resolution': resolution,
+                        'duration': duration,
+                        'ai_audio': ai_audio,
+                        'image_path': result,
+                        'status': 0,
+                        'create_at': now,
+                        'update_at': now,
+                        **scheduling
+                    })
                 
-                print(f"成功导入 {created_count} 个图片任务")
+                # 分块批量创建任务，任务管理器扫描排队任务时会自动加入队列
+                import_job.update(status='inserting')
+                created_task_ids = bulk_insert_tasks(QingyingImage2VideoTask, rows, import_job)
+                import_job.finish('completed', f'成功导入 {len(created_task_ids)} 个图片任务')
+                
+                print(f"成功导入 {len(created_task_ids)} 个图片任务")
                 
             except Exception as e:
+                import_job.finish('failed', str(e))
                 print(f"处理文件夹失败: {str(e)}")
         
         # 在后台线程中执行文件选择和导入
@@ -474,7 +498,10 @@ def import_folder_tasks():
         
         return jsonify({
             'success': True,
-            'message': '开始选择文件夹并导入，请在弹出的对话框中选择包含图片的文件夹'
+            'message': '开始选择文件夹并导入，请在弹出的对话框中选择包含图片的文件夹',
+            'data': {
+                'job_id': import_job.job_id
+            }
         })
         
     except Exception as e:
@@ -484,6 +511,15 @@ def import_folder_tasks():
             'message': f'导入失败: {str(e)}'
         }), 500
 
+@qingying_img2video_bp.route('/tasks/import-jobs/<job_id>', methods=['GET'])
+def get_import_job_progress(job_id):
+    """获取批量导入进度"""
+    import_job = get_import_job(job_id)
+    if not import_job:
+        return jsonify({'success': False, 'message': '导入任务不存在'}), 404
+    
+    return jsonify({'success': True, 'data': import_job.to_dict()})
+
 @qingying_img2video_bp.route('/tasks/batch-add', methods=['POST'])
 def batch_add_tasks():
     """批量添加图生视频任务"""
@@ -508,13 +544,21 @@ def batch_add_tasks():
         resolution = request.form.get('resolution', '720p')
         duration = request.form.get('duration', '5s')
         ai_audio = request.form.get('ai_audio', 'false').lower() == 'true'
+        try:
+            scheduling = priority_fields(request.form, batch=True)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
 
         # 创建临时目录保存上传的图片
         tmp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'tmp', 'qingying_batch_upload')
         os.makedirs(tmp_dir, exist_ok=True)
 
-        created_tasks = []
+        import_job = create_import_job('batch-add')
+        import_job.update(status='validating', total=len(files))
+
+        rows = []
         failed_files = []
+        now = datetime.now()
 
         for i, file in enumerate(files):
             try:
@@ -523,6 +567,7 @@ def batch_add_tasks():
 
                 if not allowed_file(file.filename):
                     failed_files.append(f"{file.filename}: 不支持的文件格式")
+                    import_job.add_error(failed_files[-1])
                     continue
 
                 # 保存上传的图片
@@ -531,35 +576,40 @@ def batch_add_tasks():
                 unique_filename = f"{uuid.uuid4().hex}.{file_ext}"
                 file_path = os.path.join(tmp_dir, unique_filename)
                 file.save(file_path)
+                import_job.add_validated()
 
                 # 获取对应的提示词
                 prompt = request.form.get(f'prompts[{i}]', '')
 
-                # 创建任务
-                task = QingyingImage2VideoTask.create(
-                    prompt=prompt,
-                    generation_mode=generation_mode,
-                    frame_rate=frame_rate,
-                    resolution=resolution,
-                    duration=duration,
-                    ai_audio=ai_audio,
-                    image_path=file_path,
-                    status=0,
-                    create_at=datetime.now(),
-                    update_at=datetime.now()
-                )
-
-                # 提交任务到全局任务管理器
-                if hasattr(global_task_manager, 'qingying_img2video_manager'):
-                    global_task_manager.qingying_img2video_manager.submit_task(task.id)
-
-                created_tasks.append(task.id)
-                print(f"创建清影图生视频任务: {task.id}, 图片: {filename}, 提示词: {prompt}")
+                rows.append({
+                    'prompt': prompt,
+                    'generation_mode': generation_mode,
+                    'frame_rate': frame_rate,
+                    'resolution': resolution,
+                    'duration': duration,
+                    'ai_audio': ai_audio,
+                    'image_path': file_path,
+                    'status': 0,
+                    'create_at': now,
+                    'update_at': now,
+                    **scheduling
+                })
 
             except Exception as e:
                 failed_files.append(f"{file.filename}: {str(e)}")
+                import_job.add_error(failed_files[-1])
                 print(f"处理文件 {file.filename} 失败: {str(e)}")
 
+        # 分块批量创建任务，任务管理器扫描排队任务时会自动加入队列
+        import_job.update(status='inserting')
+        try:
+            created_tasks = bulk_insert_tasks(QingyingImage2VideoTask, rows, import_job)
+        except Exception as e:
+            import_job.finish('failed', str(e))
+            raise
+        import_job.finish('completed', f'成功创建 {len(created_tasks)} 个任务')
+        print(f"批量创建清影图生视频任务: {len(created_tasks)}个")
+
         # 构建响应消息
         message_parts = []
         if created_tasks:
@@ -574,7 +624,8 @@ def batch_add_tasks():
                 'created_count': len(created_tasks),
                 'failed_count': len(failed_files),
                 'created_task_ids': created_tasks,
-                'failed_files': failed_files
+                'failed_files': failed_files,
+                'job_id': import_job.job_id
             }
         })
 
@@ -595,23 +646,10 @@ def batch_delete_tasks():
                 'message': '请提供要删除的任务ID列表'
             }), 400
         
-        # 删除任务
-        deleted_count = 0
-        for task_id in task_ids:
-            try:
-                task = QingyingImage2VideoTask.get_or_none(QingyingImage2VideoTask.id == task_id)
-                if task:
-                    # 删除图片文件
-                    if task.image_path and os.path.exists(task.image_path):
-                        try:
-                            os.remove(task.image_path)
-                        except Exception as e:
-                            print(f"删除图片文件失败: {e}")
-                    
-                    task.delete_instance()
-                    deleted_count += 1
-            except Exception as e:
-                print(f"删除任务 {task_id} 失败: {str(e)}")
+        # 删除任务及图片文件
+        deleted_count, _ = batch_delete_tasks_util(
+            QingyingImage2VideoTask, task_ids, file_fields=('image_path',)
+        )
         
         return jsonify({
             'success': True,
@@ -4,11 +4,15 @@
 """
 from flask import Blueprint, jsonify, request
 from backend.core.global_task_manager import global_task_manager
+from backend.core.middleware import etag_by_content, etag_by_table_versions
+from backend.models.models import TaskPhaseTiming
+from backend.utils.task_timing_util import get_phase_percentiles, get_task_spans
 
 # 创建蓝图
 task_manager_bp = Blueprint('task_manager', __name__, url_prefix='/api/task-manager')
 
 @task_manager_bp.route('/status', methods=['GET'])
+@etag_by_content
 def get_task_manager_status():
     """获取全局任务管理器状态"""
     try:
@@ -29,6 +33,7 @@ def get_task_manager_status():
         }), 500
 
 @task_manager_bp.route('/threads', methods=['GET'])
+@etag_by_content
 def get_thread_details():
     """获取所有线程详细信息"""
     try:
@@ -149,6 +154,7 @@ def resume_task_manager():
         }), 500
 
 @task_manager_bp.route('/summary', methods=['GET'])
+@etag_by_content
 def get_task_summary():
     """获取任务汇总信息"""
     try:
@@ -169,6 +175,7 @@ def get_task_summary():
         }), 500
 
 @task_manager_bp.route('/stats', methods=['GET'])
+@etag_by_content
 def get_task_manager_stats():
     """获取任务管理器统计信息"""
     try:
@@ -201,6 +208,7 @@ def get_task_manager_stats():
         }), 500
 
 @task_manager_bp.route('/processing-tasks', methods=['GET'])
+@etag_by_content
 def get_processing_tasks():
     """获取正在处理的任务列表"""
     try:
@@ -244,6 +252,7 @@ def get_processing_tasks():
         }), 500
 
 @task_manager_bp.route('/health', methods=['GET'])
+@etag_by_content
 def task_manager_health():
     """任务管理器健康检查"""
     try:
@@ -267,4 +276,44 @@ def task_manager_health():
         return jsonify({
             'success': False,
             'message': '健康检查失败: {}'.format(str(e))
-        }), 500 
\ No newline at end of file
+        }), 500
+
+@task_manager_bp.route('/timings', methods=['GET'])
+@etag_by_table_versions(TaskPhaseTiming)
+def get_phase_timings():
+    """按平台和阶段统计执行耗时分位数"""
+    try:
+        platform = request.args.get('platform') or None
+        days = request.args.get('days', 7, type=int)
+        stats = get_phase_percentiles(platform=platform, days=days if days > 0 else None)
+        
+        return jsonify({
+            'success': True,
+            'data': stats,
+            'message': '获取阶段耗时统计成功'
+        })
+        
+    except Exception as e:
+        print("获取阶段耗时统计失败: {}".format(str(e)))
+        return jsonify({
+            'success': False,
+            'message': '获取阶段耗时统计失败: {}'.format(str(e))
+        }), 500
+
+@task_manager_bp.route('/timings/<platform>/<int:task_id>', methods=['GET'])
+@etag_by_table_versions(TaskPhaseTiming)
+def get_task_timings(platform, task_id):
+    """获取单个任务每次执行的阶段耗时"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': get_task_spans(platform, task_id),
+            'message': '获取任务阶段耗时成功'
+        })
+        
+    except Exception as e:
+        print("获取任务阶段耗时失败: {}".format(str(e)))
+        return jsonify({
+            'success': False,
+            'message': '获取任务阶段耗时失败: {}'.format(str(e))
+        }), 500
@@ -10,6 +10,10 @@ import asyncio
 from datetime import datetime
 from flask import Blueprint, request, jsonify
 from backend.models.models import JimengText2ImgTask
+from backend.core.middleware import etag_by_table_versions
+from backend.utils.task_batch_util import batch_retry_tasks, batch_delete_tasks
+from backend.utils.task_priority_util import priority_fields
+from backend.utils.task_query_util import query_task_page, count_tasks, collect_paths, get_status_text, format_datetime, parse_bool_arg
 import subprocess
 import platform
 import threading
@@ -19,42 +23,54 @@ from urllib.parse import urlparse
 jimeng_text2img_bp = Blueprint('jimeng_text2img', __name__, url_prefix='/api/jimeng/text2img')
 
 @jimeng_text2img_bp.route('/tasks', methods=['GET'])
+@etag_by_table_versions(JimengText2ImgTask)
 def get_text2img_tasks():
     """获取文生图任务列表"""
     try:
         page = int(request.args.get('page', 1))
         page_size = int(request.args.get('page_size', 10))
         status = request.args.get('status', None)
+        cursor = request.args.get('cursor') or None
+        with_total = parse_bool_arg(request.args.get('with_total'))
         
         print("获取文生图任务列表，页码: {}, 每页数量: {}, 状态: {}".format(page, page_size, status))
         
         # 构建查询 - 过滤掉空任务
-        query = JimengText2ImgTask.select()
+        conditions = []
         if status is not None:
-            query = query.where(JimengText2ImgTask.status == status)
-        
-        # 分页
-        total = query.count()
-        tasks = query.order_by(JimengText2ImgTask.create_at.desc()).paginate(page, page_size)
+            conditions.append(JimengText2ImgTask.status == status)
+        
+        # 分页：只查询列表需要的列，传入游标时按 (create_at, id) 定位
+        image_fields = ('image1', 'image2', 'image3', 'image4')
+        rows, next_cursor = query_task_page(
+            JimengText2ImgTask,
+            [JimengText2ImgTask.id, JimengText2ImgTask.prompt, JimengText2ImgTask.model,
+             JimengText2ImgTask.ratio, JimengText2ImgTask.quality, JimengText2ImgTask.status,
+             JimengText2ImgTask.account_id, JimengText2ImgTask.image1, JimengText2ImgTask.image2,
+             JimengText2ImgTask.image3, JimengText2ImgTask.image4, JimengText2ImgTask.failure_reason,
+             JimengText2ImgTask.error_message, JimengText2ImgTask.create_at, JimengText2ImgTask.update_at],
+            conditions, page, page_size, cursor
+        )
+        total = count_tasks(JimengText2ImgTask, conditions, cache_key=f'status={status}') if with_total else None
         
         data = []
-        for task in tasks:
-            images = task.get_images()  # 获取所有图片路径
+        for row in rows:
+            images = collect_paths(row, image_fields)  # 获取所有图片路径
             data.append({
-                'id': task.id,
-                'prompt': task.prompt,
-                'model': task.model,
-                'ratio': task.ratio,
-                'quality': task.quality,
-                'status': task.status,
-                'status_text': task.get_status_text(),
-                'account_id': task.account_id,
+                'id': row['id'],
+                'prompt': row['prompt'],
+                'model': row['model'],
+                'ratio': row['ratio'],
+                'quality': row['quality'],
+                'status': row['status'],
+                'status_text': get_status_text(row['status']),
+                'account_id': row['account_id'],
                 'images': images,  # 图片路径列表
                 'image_count': len(images),  # 图片数量
-                'failure_reason': task.failure_reason,  # 失败原因类型
-                'error_message': task.error_message,  # 详细错误信息
-                'create_at': task.create_at.strftime('%Y-%m-%d %H:%M:%S'),
-                'update_at': task.update_at.strftime('%Y-%m-%d %H:%M:%S')
+                'failure_reason': row['failure_reason'],  # 失败原因类型
+                'error_message': row['error_message'],  # 详细错误信息
+                'create_at': format_datetime(row['create_at']),
+                'update_at': format_datetime(row['update_at'])
             })
         
         print("成功获取任务列表，总数: {}, 当前页任务数: {}".format(total, len(data)))
@@ -65,10 +81,17 @@ def get_text2img_tasks():
                 'total': total,
                 'page': page,
                 'page_size': page_size,
-                'total_pages': (total + page_size - 1) // page_size
+                'total_pages': (total + page_size - 1) // page_size if total is not None else None,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
             }
         })
         
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 400
     except Exception as e:
         print("获取任务列表失败: {}".format(str(e)))
         return jsonify({
@@ -92,6 +115,11 @@ def create_text2img_task():
                     'message': '缺少必要字段: {}'.format(field)
                 }), 400
         
+        try:
+            scheduling = priority_fields(data)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        
         # 创建任务（不包含图片路径，这些在任务完成后才填入）
         task = JimengText2ImgTask.create(
             prompt=data['prompt'],
@@ -100,6 +128,7 @@ def create_text2img_task():
             quality=data['quality'],
             account_id=data.get('account_id'),
             status=0,  # 默认状态：0-排队中
+            **scheduling,
             # 图片路径字段保持为空，由任务处理器填入
             image1=None,
             image2=None,
@@ -114,6 +143,7 @@ def create_text2img_task():
                 'id': task.id,
                 'status': task.status,
                 'status_text': task.get_status_text(),
+                'priority': task.priority,
                 'create_at': task.create_at.strftime('%Y-%m-%d %H:%M:%S')
             },
             'message': '任务创建成功'
@@ -186,17 +216,8 @@ def batch_retry_text2img_tasks():
         data = request.get_json()
         task_ids = data.get('task_ids', [])
         
-        if task_ids:
-            # 如果提供了特定的任务ID列表，只重试这些任务
-            retry_count = JimengText2ImgTask.update(status=0).where(
-                JimengText2ImgTask.id.in_(task_ids),
-                JimengText2ImgTask.status == 3  # 只重试失败的任务
-            ).execute()
-        else:
-            # 如果没有提供任务ID，重试所有失败的任务
-            retry_count = JimengText2ImgTask.update(status=0).where(
-                JimengText2ImgTask.status == 3  # 只重试失败的任务
-            ).execute()
+        # 提供任务ID时只重试这些任务中失败的，否则重试所有失败的任务
+        retry_count = batch_retry_tasks(JimengText2ImgTask, task_ids, only_failed=True)
         
         print(f"批量重试文生图任务: {retry_count}个")
         return jsonify({
@@ -215,6 +236,7 @@ def batch_retry_text2img_tasks():
         }), 500
 
 @jimeng_text2img_bp.route('/stats', methods=['GET'])
+@etag_by_table_versions(JimengText2ImgTask)
 def get_text2img_stats():
     """获取文生图任务统计信息"""
     try:
@@ -262,7 +284,7 @@ def batch_delete_text2img_tasks():
             }), 400
         
         # 删除任务
-        deleted_count = JimengText2ImgTask.delete().where(JimengText2ImgTask.id.in_(task_ids)).execute()
+        deleted_count, _ = batch_delete_tasks(JimengText2ImgTask, task_ids)
         
         print(f"批量删除文生图任务: {deleted_count}个")
         return jsonify({
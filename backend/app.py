@@ -6,6 +6,15 @@ import os
 # 将项目根目录添加到 Python 路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# 最先导入，用于统计各启动阶段耗时
+from backend.core.startup import mark_phase, mark_database_ready, print_startup_report
+
+# 日志系统在其他模块之前初始化，退出时写出队列中剩余的日志
+import atexit
+from backend.core.logger import setup_logging, shutdown_logging
+setup_logging()
+atexit.register(shutdown_logging)
+
 from flask import Flask, request
 from flask_cors import CORS
 import time
@@ -16,8 +25,11 @@ from datetime import datetime
 from backend.core.database import init_database
 from backend.core.middleware import before_request, after_request
 from backend.core.global_task_manager import global_task_manager
+from backend.core.cookie_health import cookie_health_scheduler
 from backend.models.models import JimengAccount, JimengText2ImgTask, JimengImg2ImgTask, JimengImg2VideoTask, JimengDigitalHumanTask, QingyingImage2VideoTask
+from backend.models.models import TASK_PHASE_SUBMITTED, TASK_PHASE_AWAITING_RESULT
 from backend.utils.config_util import ConfigUtil
+from backend.utils.task_batch_util import reset_processing_tasks as batch_reset_processing_tasks
 # from backend.utils.retry_util import start_auto_retry_scheduler  # 暂时注释掉
 
 # 导入路由蓝图
@@ -33,6 +45,8 @@ from backend.api.v1.config_routes import config_bp
 from backend.api.v1.task_manager_routes import task_manager_bp
 from backend.api.v1.prompt_routes import prompt_bp
 
+mark_phase('导入模块')
+
 # 创建Flask应用
 app = Flask(__name__)
 CORS(app)  # 允许跨域请求
@@ -43,12 +57,11 @@ app.after_request(after_request)
 
 # 初始化数据库
 init_database()
-
-# 等待数据库初始化完全完成
-time.sleep(0.5)
+mark_phase('初始化数据库')
 
 # 初始化默认配置
 ConfigUtil.init_default_configs()
+mark_phase('初始化默认配置')
 
 def reset_processing_tasks():
     """重置所有生成中的任务为排队状态"""
@@ -59,59 +72,31 @@ def reset_processing_tasks():
         try:
             print("检查并重置生成中的任务...")
             
-            # 重置文生图任务
-            text2img_reset_count = 0
-            processing_text2img_tasks = JimengText2ImgTask.select().where(
-                JimengText2ImgTask.status == 1  # 生成中
-            )
-            
-            for task in processing_text2img_tasks:
-                task.update_status(0)  # 重置为排队状态
-                text2img_reset_count += 1
-            
-            # 重置图生图任务
-            img2img_reset_count = 0
-            processing_img2img_tasks = JimengImg2ImgTask.select().where(
-                JimengImg2ImgTask.status == 1  # 生成中
-            )
-            
-            for task in processing_img2img_tasks:
-                task.update_status(0)  # 重置为排队状态
-                img2img_reset_count += 1
-            
-            # 重置图生视频任务
-            img2video_reset_count = 0
-            processing_img2video_tasks = JimengImg2VideoTask.select().where(
-                JimengImg2VideoTask.status == 1  # 生成中
-            )
+            # 所有任务表在同一个事务中各执行一条 UPDATE
+            task_models = [JimengText2ImgTask, JimengImg2ImgTask, JimengImg2VideoTask, JimengDigitalHumanTask, QingyingImage2VideoTask]
+            reset_counts = batch_reset_processing_tasks(task_models)
             
-            for task in processing_img2video_tasks:
-                task.update_status(0)  # 重置为排队状态
-                img2video_reset_count += 1
+            text2img_reset_count = reset_counts[JimengText2ImgTask._meta.table_name]
+            img2img_reset_count = reset_counts[JimengImg2ImgTask._meta.table_name]
+            img2video_reset_count = reset_counts[JimengImg2VideoTask._meta.table_name]
+            digital_human_reset_count = reset_counts[JimengDigitalHumanTask._meta.table_name]
+            qingying_img2video_reset_count = reset_counts[QingyingImage2VideoTask._meta.table_name]
             
-            # 重置数字人任务
-            digital_human_reset_count = 0
-            processing_digital_human_tasks = JimengDigitalHumanTask.select().where(
-                JimengDigitalHumanTask.status == 1  # 生成中
-            )
-            
-            for task in processing_digital_human_tasks:
-                task.update_status(0)  # 重置为排队状态
-                digital_human_reset_count += 1
-            
-            # 重置清影图生视频任务
-            qingying_img2video_reset_count = 0
-            processing_qingying_img2video_tasks = QingyingImage2VideoTask.select().where(
-                QingyingImage2VideoTask.status == 1  # 生成中
-            )
-            
-            for task in processing_qingying_img2video_tasks:
-                task.update_status(0)  # 重置为排队状态
-                qingying_img2video_reset_count += 1
-            
-            total_reset = text2img_reset_count + img2img_reset_count + img2video_reset_count + digital_human_reset_count + qingying_img2video_reset_count
+            total_reset = sum(reset_counts.values())
             if total_reset > 0:
                 print(f"重置了 {text2img_reset_count} 个文生图任务, {img2img_reset_count} 个图生图任务, {img2video_reset_count} 个图生视频任务, {digital_human_reset_count} 个数字人任务和 {qingying_img2video_reset_count} 个清影图生视频任务为排队状态")
+                
+                # 已提交到远端的任务保留断点，重新调度后直接轮询结果，不再重复提交
+                resumable_count = sum(
+                    model.select().where(
+                        (model.status == 0) &
+                        model.task_id.is_null(False) &
+                        model.phase.in_([TASK_PHASE_SUBMITTED, TASK_PHASE_AWAITING_RESULT])
+                    ).count()
+                    for model in task_models
+                )
+                if resumable_count > 0:
+                    print(f"其中 {resumable_count} 个任务已提交到远端，将直接恢复轮询结果")
             else:
                 print("没有需要重置的生成中任务")
             
@@ -136,9 +121,10 @@ def reset_processing_tasks():
 
 # 在启动任务管理器之前重置任务状态
 reset_processing_tasks()
+mark_phase('重置生成中任务')
 
-# 等待任务重置完成
-time.sleep(1.0)
+# 数据库就绪，任务扫描线程可以开始扫描
+mark_database_ready()
 
 # 注册蓝图路由
 app.register_blueprint(common_bp)
@@ -152,18 +138,22 @@ app.register_blueprint(qingying_img2video_bp)
 app.register_blueprint(config_bp)
 app.register_blueprint(task_manager_bp)
 app.register_blueprint(prompt_bp)
-
-# 等待路由注册完成
-time.sleep(0.5)
+mark_phase('注册路由')
 
 # 启动全局任务管理器
 global_task_manager.start()
 print("全局任务管理器已启动")
+mark_phase('启动任务管理器')
+
+# 启动账号登录态维护，线程池空闲时提前刷新即将过期的登录态
+cookie_health_scheduler.start()
 
 # 启动自动重试调度器
     # start_auto_retry_scheduler()  # 暂时注释掉
 print("自动重试调度器已启动")
 
+print_startup_report()
+
 if __name__ == '__main__':
     print("舒克AI工具集后端服务启动中...")
     print("数据库连接成功")
@@ -15,6 +15,120 @@ COOKIES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'cookies'
 # 任务处理配置
 TASK_PROCESSOR_INTERVAL = 5  # 任务检查间隔（秒）
 TASK_PROCESSOR_ERROR_WAIT = 10  # 错误后等待时间（秒）
+DATABASE_READY_TIMEOUT = 30  # 任务扫描线程等待数据库就绪的最长时间（秒）
 
 # Playwright配置
-PLAYWRIGHT_HEADLESS = True  # 是否无头模式运行
\ No newline at end of file
+PLAYWRIGHT_HEADLESS = True  # 是否无头模式运行
+PLAYWRIGHT_STAMP_FILE = os.path.join(DATABASE_DIR, 'playwright_check.json')  # 安装检查结果缓存
+
+# 账号浏览器配置目录（持久化模式开关为数据库配置 persistent_profile_enabled）
+BROWSER_PROFILES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'browser_profiles')
+BROWSER_PROFILES_MAX_BYTES = int(os.environ.get('BROWSER_PROFILES_MAX_BYTES', 5 * 1024 ** 3))  # 所有配置目录的磁盘上限
+BROWSER_PROFILE_LOCK_TIMEOUT = 5  # 等待配置目录被其他任务释放的最长时间（秒），超时后使用临时浏览器
+
+# Cookie 刷新作业配置
+COOKIE_REFRESH_CONCURRENCY = 3  # 默认同时登录的账号数
+COOKIE_REFRESH_MAX_CONCURRENCY = 10  # 请求中可指定的最大并发数
+COOKIE_REFRESH_JOB_HISTORY = 20  # 内存中保留的已结束作业数
+
+# 任务优先级配置：排队任务按 优先级 + 排队时长加成 + 截止时间加成 从高到低调度
+TASK_PRIORITY_LANES = {'interactive': 10, 'normal': 0, 'bulk': -10}  # 创建任务时可用名称代替数值
+TASK_PRIORITY_RANGE = (-100, 100)  # 优先级取值范围
+TASK_PRIORITY_DEFAULT = 0  # 单个创建的任务的默认优先级
+TASK_PRIORITY_BATCH_DEFAULT = -10  # 批量创建、导入的任务的默认优先级
+TASK_PRIORITY_AGING_SECONDS = 600  # 每排队该时长（秒）优先级加 1，低优先级任务排队足够久后会排到高优先级的新任务之前
+TASK_PRIORITY_AGING_CAP = 30  # 排队时长加成的上限
+TASK_PRIORITY_URGENT = 10  # 队首任务的优先级（不计排队时长加成）达到该值或临近截止时间时，平台在跨平台调度中优先分配槽位
+TASK_DEADLINE_LEAD_SECONDS = 600  # 距截止时间不足该时长（秒）的任务提前执行
+TASK_DEADLINE_BOOST = 1000  # 临近截止时间的任务的优先级加成
+
+# 跨平台公平调度配置：weight 为权重，min_share/max_share 为占全局线程池的最小/最大比例（按线程数四舍五入）
+FAIR_SCHEDULER_SHARES = {
+    'jimeng_text2img': {'weight': 3, 'min_share': 0.34, 'max_share': 1.0},
+    'jimeng_img2img': {'weight': 2, 'min_share': 0, 'max_share': 1.0},
+    'jimeng_img2video': {'weight': 1, 'min_share': 0, 'max_share': 0.67},
+    'jimeng_digital_human': {'weight': 1, 'min_share': 0, 'max_share': 0.67},
+    'qingying_img2video': {'weight': 1, 'min_share': 0, 'max_share': 0.67}
+}
+FAIR_SCHEDULER_DEMAND_TTL = 15  # 平台超过该时间（秒）未上报排队任务数时视为没有排队任务
+
+# 会话批量模式配置（开关为数据库配置 jimeng_session_batching_enabled）
+JIMENG_SESSION_BATCH_MAX = 5  # 一个浏览器会话中最多执行的文生图任务数
+JIMENG_SESSION_MAX_IN_FLIGHT = 3  # 一个页面中同时进行的生成任务数，为 1 时逐个提交并等待结果
+
+# 账号 cookies 回写缓冲配置
+COOKIE_WRITEBACK_FLUSH_INTERVAL = 5  # 定期批量写入的间隔（秒）
+COOKIE_WRITEBACK_BATCH_SIZE = 20  # 待写入的账号达到该数量时立即写入
+
+# 各平台 cookies 的默认域名，用于加载旧格式（"name=value; "）的账号 cookies
+PLATFORM_COOKIE_DOMAINS = {
+    'jimeng': '.capcut.com',
+    'qingying': '.chatglm.cn'
+}
+
+# 账号登录态后台维护配置（开关为数据库配置 cookie_health_enabled）
+JIMENG_SESSION_COOKIE_NAMES = ['sessionid', 'sessionid_ss', 'sid_tt', 'sid_guard']  # 表示即梦登录态的 cookie
+COOKIE_HEALTH_SCAN_INTERVAL = 60  # 扫描需要维护的账号的间隔（秒）
+COOKIE_HEALTH_CHECK_INTERVAL = 12 * 3600  # 登录态过期时间未知的账号多久验证一次（秒）
+COOKIE_HEALTH_REFRESH_AHEAD = 2 * 24 * 3600  # 登录态在多久内过期时提前重新登录（秒）
+COOKIE_HEALTH_RETRY_INTERVAL = 1800  # 刷新失败后多久重试（秒）
+COOKIE_HEALTH_CONCURRENCY = 1  # 同时维护的账号数
+COOKIE_HEALTH_RESERVED_THREADS = 1  # 至少保留多少个空闲线程给生成任务，线程池不够空闲时不做维护
+
+# 上传图片预处理配置
+UPLOAD_IMAGE_PROFILES = {  # 各平台上传图片的长边上限（像素）和 JPEG 质量，未配置的平台直接上传原图
+    'jimeng': {'max_side': 2560, 'quality': 92},
+    'qingying': {'max_side': 1920, 'quality': 90}
+}
+UPLOAD_PREPARE_MAX_BYTES = 5 * 1024 ** 2  # 尺寸未超限但文件大于该值（字节）时也重新压缩
+UPLOAD_PREPARE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'tmp', 'upload_prepared')
+UPLOAD_PREPARE_WORKERS = 2  # 预处理线程数
+UPLOAD_PREPARE_CACHE_MAX_BYTES = 2 * 1024 ** 3  # 预处理结果目录的磁盘上限，超过时按最近使用时间从旧到新删除
+UPLOAD_PREPARE_CACHE_MAX_AGE = 7 * 24 * 3600  # 超过该时间（秒）未使用的预处理结果直接删除
+UPLOAD_PREPARE_CACHE_CLEANUP_INTERVAL = 600  # 两次清理预处理结果目录的最短间隔（秒）
+UPLOAD_PREPARE_LOOKAHEAD = 10  # 每次扫描提前预处理的排队任务数
+
+# 日志配置
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')  # 输出格式：json 或 text
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')  # 默认日志级别
+LOG_LEVELS = {  # 按模块设置日志级别，可用环境变量 LOG_LEVELS 覆盖
+    'backend.api.access': 'INFO',
+    'urllib3': 'WARNING',
+    'asyncio': 'WARNING'
+}
+
+# 自动化页面资源拦截配置（开关为数据库配置 resource_filter_enabled）
+RESOURCE_FILTER_BLOCK_TYPES = ['image', 'media', 'font']  # 拦截的资源类型
+RESOURCE_FILTER_BLOCK_HOSTS = [  # 拦截的统计/埋点域名（包含匹配）
+    'google-analytics.com', 'googletagmanager.com', 'doubleclick.net', 'facebook.net', 'hotjar.com',
+    'sentry.io', 'mcs.zijieapi.com', 'mon.zijieapi.com', 'byteoversea.com', 'hm.baidu.com',
+    'sensorsdata', 'cnzz.com', 'growingio.com'
+]
+RESOURCE_FILTER_OVERRIDES = {  # 按平台覆盖以上配置，可用键: block_types、block_hosts、allow_url_patterns
+    'jimeng': {
+        'allow_url_patterns': ['/close-icon']  # 登录弹窗的关闭按钮是图片，需要加载后才能点击
+    },
+    'qingying': {}
+}
+
+# 登录状态缓存：账号在该时间内验证过登录状态或成功执行过任务时，跳过登录检查（秒，0 表示不缓存）
+LOGIN_STATE_FRESH_SECONDS = int(os.environ.get('LOGIN_STATE_FRESH_SECONDS', 600))
+
+# HTTP 连接池配置（HTTP 直连引擎共用）
+HTTP_POOL_LIMIT = 50  # 连接池最大连接数
+HTTP_POOL_LIMIT_PER_HOST = 20  # 每个域名最大连接数
+HTTP_REQUEST_TIMEOUT = 30  # 单次请求超时（秒）
+
+# 即梦文生图 HTTP 直连引擎（开关为数据库配置 jimeng_http_engine_enabled）
+JIMENG_API_BASE = os.environ.get('JIMENG_API_BASE', '')  # 为空时按模板记录的地址发送，本地联调时可指向模拟服务
+JIMENG_HTTP_POLL_INTERVALS = (2, 3, 5, 8, 10)  # 轮询结果的间隔（秒），依次递增，之后保持最后一个值
+JIMENG_HTTP_MAX_WAIT = 3600  # 轮询结果的最长时间（秒）
+JIMENG_HTTP_REJECT_COOLDOWN = 1800  # 请求模板被接口拒绝后暂停使用 HTTP 引擎的时间（秒）
+
+# 清影图生视频 HTTP 直连引擎（开关为数据库配置 qingying_http_engine_enabled）
+QINGYING_API_BASE = os.environ.get('QINGYING_API_BASE', '')  # 为空时按模板记录的地址发送，本地联调时可指向模拟服务
+QINGYING_HTTP_POLL_MIN = 2  # 状态变化后的轮询间隔（秒）
+QINGYING_HTTP_POLL_MAX = 15  # 状态长时间不变时轮询间隔的上限（秒）
+QINGYING_HTTP_POLL_BACKOFF = 1.5  # 状态未变化时轮询间隔的增长倍数
+QINGYING_HTTP_MAX_WAIT = 3600  # 轮询结果的最长时间（秒）
+QINGYING_HTTP_REJECT_COOLDOWN = 1800  # 请求模板被接口拒绝后暂停使用 HTTP 引擎的时间（秒）
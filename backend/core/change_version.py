@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+数据表变更版本模块
+
+每张表维护一个内存中的版本号，任何 INSERT/UPDATE/DELETE 成功提交后递增。
+接口可以根据版本号生成 ETag，数据未变化时直接返回 304，无需再查询数据库。
+"""
+
+import threading
+import time
+
+from peewee import SqliteDatabase, Insert, Update, Delete
+
+# 服务启动标识，重启后旧的 ETag 全部失效
+BOOT_ID = format(int(time.time()), 'x')
+
+_versions = {}
+_versions_lock = threading.Lock()
+
+def bump_versions(table_names):
+    """递增指定表的版本号"""
+    with _versions_lock:
+        for table_name in table_names:
+            _versions[table_name] = _versions.get(table_name, 0) + 1
+
+def get_version(table_name) -> int:
+    """获取表的当前版本号"""
+    with _versions_lock:
+        return _versions.get(table_name, 0)
+
+def get_versions(table_names) -> str:
+    """获取多张表的版本号组合，用于生成 ETag"""
+    with _versions_lock:
+        return '-'.join(str(_versions.get(name, 0)) for name in table_names)
+
+class ChangeTrackingSqliteDatabase(SqliteDatabase):
+    """
+    记录写操作所涉及数据表的 SqliteDatabase
+
+    事务中的写操作在提交后才递增版本号，避免其他线程在提交前用新版本号缓存旧数据。
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pending_changes = threading.local()
+
+    def _pending_tables(self) -> set:
+        if not hasattr(self._pending_changes, 'tables'):
+            self._pending_changes.tables = set()
+        return self._pending_changes.tables
+
+    def execute(self, query, *args, **kwargs):
+        cursor = super().execute(query, *args, **kwargs)
+        if isinstance(query, (Insert, Update, Delete)):
+            model = getattr(query, 'model', None)
+            table_name = model._meta.table_name if model is not None else getattr(query.table, '__name__', None)
+            if table_name:
+                if self.in_transaction():
+                    self._pending_tables().add(table_name)
+                else:
+                    bump_versions([table_name])
+        return cursor
+
+    def _flush_pending_changes(self):
+        tables = self._pending_tables()
+        if tables:
+            bump_versions(tables)
+            tables.clear()
+
+    def commit(self):
+        try:
+            return super().commit()
+        finally:
+            self._flush_pending_changes()
+
+    def rollback(self):
+        # 回滚后数据未变化，递增版本号只会让客户端多刷新一次，不会返回过期数据
+        try:
+            return super().rollback()
+        finally:
+            self._flush_pending_changes()
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+账号登录态维护模块 - 在线程池空闲时提前验证和刷新即梦账号的登录态
+
+后台线程定期扫描账号，只在全局线程池留有足够空闲线程时才提交维护任务：
+- 被标记为不可用、没有 cookies 或登录态 cookie 即将过期的账号，直接重新登录获取 cookies；
+- 过期时间未知且长时间未检查的账号，用保存的 cookies 打开页面验证登录状态，
+  失效时标记为不可用并重新登录。
+不可用的账号不会被 _get_available_account 选中，刷新成功后恢复。
+清影账号使用手机验证码登录，无法在后台自动刷新，不在维护范围内。
+"""
+
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from backend.config.settings import (COOKIE_HEALTH_SCAN_INTERVAL, COOKIE_HEALTH_CHECK_INTERVAL,
+                                     COOKIE_HEALTH_REFRESH_AHEAD, COOKIE_HEALTH_RETRY_INTERVAL,
+                                     COOKIE_HEALTH_CONCURRENCY, COOKIE_HEALTH_RESERVED_THREADS)
+from backend.core.cookie_refresh_jobs import refresh_account_cookie
+from backend.core.cookie_writeback import cookie_write_buffer
+from backend.core.global_task_manager import global_task_manager
+from backend.core.logger import get_logger
+from backend.core.worker_slots import worker_slots
+from backend.models.models import JimengAccount
+from backend.utils.config_util import get_cookie_health_enabled
+from backend.utils.cookie_util import session_expiry
+
+logger = get_logger(__name__)
+
+# 维护动作
+ACTION_REFRESH = 'refresh'
+ACTION_VALIDATE = 'validate'
+
+async def _validate_session(cookies: str) -> Tuple[Optional[bool], Optional[str], Optional[datetime]]:
+    """
+    用保存的 cookies 打开即梦页面检查登录状态
+
+    返回值:
+        Tuple: (是否已登录，页面无法打开时为 None; 页面返回的最新 cookies; 登录态过期时间)
+    """
+    # 执行器依赖 Playwright，使用时再导入
+    from backend.utils.jimeng_text2img import JimengText2ImageExecutor
+
+    executor = JimengText2ImageExecutor(headless=True)
+    try:
+        result = await executor.init_browser(cookies)
+        if result.code != 200:
+            return None, None, None
+        result = await executor.check_login_status()
+        if result.code != 200:
+            # 出现登录按钮时结果中带有空 cookies，其余失败为页面打开异常
+            return (False if result.cookies == "" else None), None, None
+        latest = await executor.context.cookies()
+        return True, await executor.get_cookies(), session_expiry(latest)
+    finally:
+        await executor.close_browser()
+
+def _maintain_account(account_id: int, action: str):
+    """在全局线程池中维护一个账号的登录态"""
+    account = JimengAccount.get_by_id(account_id)
+    now = datetime.now()
+    if action == ACTION_VALIDATE:
+        valid, cookies, expires_at = asyncio.run(_validate_session(account.cookies))
+        if valid:
+            cookie_write_buffer.discard(account_id)
+            JimengAccount.update(cookies=cookies or account.cookies, cookies_expire_at=expires_at,
+                                 session_ready=True, session_checked_at=now).where(
+                JimengAccount.id == account_id).execute()
+            logger.info("账号登录态有效", extra={'fields': {'account_id': account_id, 'expires_at': str(expires_at)}})
+            return
+        if valid is None:
+            # 页面打不开不代表登录失效，稍后再检查
+            JimengAccount.update(session_checked_at=now).where(JimengAccount.id == account_id).execute()
+            logger.warning("账号登录态检查失败，稍后重试", extra={'fields': {'account_id': account_id}})
+            return
+        JimengAccount.update(session_ready=False).where(JimengAccount.id == account_id).execute()
+        logger.info("账号登录态已失效，重新登录", extra={'fields': {'account_id': account_id}})
+
+    try:
+        ok, message = refresh_account_cookie(account_id)
+    except Exception as e:
+        ok, message = False, str(e)
+    if not ok:
+        JimengAccount.update(session_checked_at=now).where(JimengAccount.id == account_id).execute()
+    logger.info("账号登录态已刷新" if ok else "账号登录态刷新失败",
+                extra={'fields': {'account_id': account_id, 'result': message}})
+
+class CookieHealthScheduler:
+    """后台维护即梦账号登录态的调度器"""
+
+    def __init__(self, concurrency: int = COOKIE_HEALTH_CONCURRENCY):
+        self.concurrency = concurrency
+        self._running = set()  # 正在维护的账号ID
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._loop, name='CookieHealthScheduler', daemon=True)
+        self._thread.start()
+        logger.info("账号登录态维护已启动")
+
+    def stop(self):
+        self._stop_event.set()
+        self._wakeup.set()
+
+    def wake(self):
+        """立即进行一次扫描"""
+        self._wakeup.set()
+
+    def _loop(self):
+        while not self._stop_event.is_set():
+            try:
+                if get_cookie_health_enabled():
+                    self.scan()
+            except Exception as e:
+                logger.error(f"账号登录态维护扫描出错: {str(e)}")
+            self._wakeup.wait(COOKIE_HEALTH_SCAN_INTERVAL)
+            self._wakeup.clear()
+
+    def _idle_threads(self) -> int:
+        """除保留给生成任务的线程外，还有多少线程可用于维护"""
+        return worker_slots.size - worker_slots.active_count() - COOKIE_HEALTH_RESERVED_THREADS
+
+    def due_accounts(self, now: Optional[datetime] = None):
+        """
+        需要维护的账号，按紧急程度排序：不可用的账号在前，其次是即将过期、长时间未检查的账号
+
+        返回值:
+            List[Tuple[JimengAccount, str]]: 账号和维护动作
+        """
+        now = now or datetime.now()
+        retry_before = now - timedelta(seconds=COOKIE_HEALTH_RETRY_INTERVAL)
+        check_before = now - timedelta(seconds=COOKIE_HEALTH_CHECK_INTERVAL)
+        expire_before = now + timedelta(seconds=COOKIE_HEALTH_REFRESH_AHEAD)
+
+        refresh, expiring, validate = [], [], []
+        for account in JimengAccount.select().order_by(JimengAccount.id):
+            checked_at = account.session_checked_at
+            if not account.session_ready or not account.cookies:
+                # 刷新失败后等待重试间隔，避免反复登录
+                if checked_at is None or checked_at < retry_before:
+                    refresh.append((account, ACTION_REFRESH))
+            elif account.cookies_expire_at is not None and account.cookies_expire_at < expire_before:
+                if checked_at is None or checked_at < retry_before:
+                    expiring.append((account, ACTION_REFRESH))
+            elif account.cookies_expire_at is None and (checked_at is None or checked_at < check_before):
+                validate.append((account, ACTION_VALIDATE))
+        return refresh + expiring + validate
+
+    def scan(self):
+        """提交需要维护的账号，直到用完空闲线程或并发上限"""
+        for account, action in self.due_accounts():
+            with self._lock:
+                if len(self._running) >= self.concurrency:
+                    return
+                if account.id in self._running:
+                    continue
+            if self._idle_threads() <= 0:
+                return
+            if not self._submit(account, action):
+                return
+
+    def _submit(self, account: JimengAccount, action: str) -> bool:
+        with self._lock:
+            self._running.add(account.id)
+        try:
+            future = global_task_manager.submit_task(
+                platform_name="即梦账号",
+                task_callable=_maintain_account,
+                task_id=account.id,
+                account_id=account.id,
+                action=action,
+                task_type="刷新登录态" if action == ACTION_REFRESH else "检查登录态",
+                prompt=f"维护账号 {account.account} 的登录态"
+            )
+        except RuntimeError as e:
+            with self._lock:
+                self._running.discard(account.id)
+            logger.debug(f"线程池暂无空位，下次扫描再维护: {str(e)}")
+            return False
+        future.add_done_callback(lambda f: self._on_done(account.id))
+        logger.info("已提交账号登录态维护", extra={'fields': {'account_id': account.id, 'action': action}})
+        return True
+
+    def _on_done(self, account_id: int):
+        with self._lock:
+            self._running.discard(account_id)
+        # 还有待维护的账号时尽快继续
+        self._wakeup.set()
+
+def report_session_invalid(account_id: int):
+    """任务执行中发现账号登录失效时调用：标记为不可用，并尽快安排重新登录"""
+    if not get_cookie_health_enabled():
+        # 未开启后台维护时不标记，下次执行任务时重新登录
+        return
+    try:
+        JimengAccount.update(session_ready=False).where(JimengAccount.id == account_id).execute()
+    except Exception as e:
+        logger.error(f"标记账号登录态失效时出错: {str(e)}")
+        return
+    cookie_health_scheduler.wake()
+
+# 全局账号登录态维护调度器
+cookie_health_scheduler = CookieHealthScheduler()
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+Cookie 刷新作业模块 - 以作业形式批量刷新账号 Cookie
+
+每个作业记录各账号的刷新结果，最多同时在全局线程池中运行 concurrency 个浏览器登录，
+可通过作业ID查询进度或取消。取消后不再提交新的账号，已在登录中的账号执行完为止。
+"""
+
+import asyncio
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from backend.config.settings import COOKIE_REFRESH_CONCURRENCY, COOKIE_REFRESH_MAX_CONCURRENCY, COOKIE_REFRESH_JOB_HISTORY
+from backend.core.cookie_writeback import cookie_write_buffer
+from backend.core.global_task_manager import global_task_manager
+from backend.core.logger import get_logger
+from backend.models.models import JimengAccount
+from backend.utils.jimeng_account_login import login_and_get_cookie
+
+logger = get_logger(__name__)
+
+# 作业状态
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_CANCELLED = 'cancelled'
+
+# 账号状态
+ACCOUNT_PENDING = 'pending'
+ACCOUNT_RUNNING = 'running'
+ACCOUNT_SUCCESS = 'success'
+ACCOUNT_FAILED = 'failed'
+ACCOUNT_CANCELLED = 'cancelled'
+
+# 线程池已满时重新提交的等待时间（秒）
+_SUBMIT_RETRY_INTERVAL = 1
+
+def refresh_account_cookie(account_id: int) -> Tuple[bool, str]:
+    """
+    登录账号获取新的 Cookie 并保存
+
+    返回值:
+        Tuple[bool, str]: 是否成功和结果说明
+    """
+    account = JimengAccount.get_by_id(account_id)
+    result = asyncio.run(login_and_get_cookie(account.account, account.password, headless=True))
+    if result["code"] == 200 and result["data"]:
+        cookie_write_buffer.discard(account_id)
+        now = datetime.now()
+        account.cookies = result["data"]
+        account.cookies_expire_at = result.get("expires_at")
+        account.session_ready = True
+        account.session_checked_at = now
+        account.updated_at = now
+        account.save()
+        return True, "Cookie已更新"
+    return False, result.get("message") or f"获取Cookie失败，错误码: {result['code']}"
+
+class CookieRefreshJob:
+    """一次批量刷新 Cookie 的作业"""
+
+    def __init__(self, name: str, accounts: List[JimengAccount], concurrency: int):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.concurrency = concurrency
+        self.status = JOB_RUNNING
+        self.created_at = datetime.now()
+        self.finished_at = None
+        self.results: Dict[int, Dict] = OrderedDict(
+            (account.id, {
+                'account_id': account.id,
+                'account': account.account,
+                'status': ACCOUNT_PENDING,
+                'message': None,
+                'started_at': None,
+                'finished_at': None
+            }) for account in accounts
+        )
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(concurrency)
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def _update(self, account_id: int, **changes):
+        with self._lock:
+            self.results[account_id].update(changes)
+
+    def counts(self) -> Dict[str, int]:
+        """各状态的账号数量"""
+        counts = {status: 0 for status in (ACCOUNT_PENDING, ACCOUNT_RUNNING, ACCOUNT_SUCCESS,
+                                           ACCOUNT_FAILED, ACCOUNT_CANCELLED)}
+        with self._lock:
+            for result in self.results.values():
+                counts[result['status']] += 1
+        return counts
+
+    def to_dict(self, include_results: bool = False) -> Dict:
+        counts = self.counts()
+        total = len(self.results)
+        done = counts[ACCOUNT_SUCCESS] + counts[ACCOUNT_FAILED] + counts[ACCOUNT_CANCELLED]
+        data = {
+            'job_id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'concurrency': self.concurrency,
+            'total': total,
+            'counts': counts,
+            'progress': round(done * 100 / total, 1) if total else 100.0,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'finished_at': self.finished_at.strftime('%Y-%m-%d %H:%M:%S') if self.finished_at else None
+        }
+        if include_results:
+            with self._lock:
+                data['results'] = [
+                    dict(result,
+                         started_at=result['started_at'].strftime('%Y-%m-%d %H:%M:%S') if result['started_at'] else None,
+                         finished_at=result['finished_at'].strftime('%Y-%m-%d %H:%M:%S') if result['finished_at'] else None)
+                    for result in self.results.values()
+                ]
+        return data
+
+    def run_account(self, account_id: int):
+        """在线程池中刷新一个账号"""
+        try:
+            if self.cancelled:
+                self._update(account_id, status=ACCOUNT_CANCELLED, message='作业已取消', finished_at=datetime.now())
+                return
+            self._update(account_id, status=ACCOUNT_RUNNING, started_at=datetime.now())
+            try:
+                ok, message = refresh_account_cookie(account_id)
+            except Exception as e:
+                ok, message = False, str(e)
+            self._update(account_id, status=ACCOUNT_SUCCESS if ok else ACCOUNT_FAILED,
+                         message=message, finished_at=datetime.now())
+            logger.info("账号Cookie刷新完成" if ok else "账号Cookie刷新失败",
+                        extra={'fields': {'job_id': self.id, 'account_id': account_id, 'result': message}})
+        finally:
+            self._slots.release()
+
+    def _on_future_done(self, future, account_id: int):
+        """线程池关闭时排队中的账号不会执行，需要释放并发名额"""
+        if future.cancelled():
+            self._update(account_id, status=ACCOUNT_CANCELLED, message='线程池已停止', finished_at=datetime.now())
+            self._slots.release()
+
+    def _submit(self, account_id: int) -> bool:
+        """提交一个账号到全局线程池，线程池已满时等待重试；作业取消时返回 False"""
+        account = self.results[account_id]['account']
+        while not self.cancelled:
+            try:
+                future = global_task_manager.submit_task(
+                    platform_name="即梦账号",
+                    task_callable=_run_job_account,
+                    task_id=account_id,
+                    job_id=self.id,
+                    account_id=account_id,
+                    task_type="获取Cookie",
+                    prompt=f"获取账号 {account} 的Cookie"
+                )
+                future.add_done_callback(lambda f: self._on_future_done(f, account_id))
+                return True
+            except RuntimeError as e:
+                logger.debug(f"线程池暂无空位，稍后重新提交: {str(e)}", extra={'fields': {'job_id': self.id}})
+                self._cancel_event.wait(_SUBMIT_RETRY_INTERVAL)
+        return False
+
+    def dispatch(self):
+        """按并发上限逐个提交账号，直到全部提交或作业取消"""
+        for account_id in list(self.results):
+            acquired = False
+            while not acquired and not self.cancelled:
+                acquired = self._slots.acquire(timeout=_SUBMIT_RETRY_INTERVAL)
+            if not acquired:
+                break
+            if not self._submit(account_id):
+                self._slots.release()
+                break
+
+        # 等待已提交的账号执行完
+        for _ in range(self.concurrency):
+            self._slots.acquire()
+        with self._lock:
+            for result in self.results.values():
+                if result['status'] == ACCOUNT_PENDING:
+                    result.update(status=ACCOUNT_CANCELLED, message='作业已取消', finished_at=datetime.now())
+        self.status = JOB_CANCELLED if self.cancelled else JOB_COMPLETED
+        self.finished_at = datetime.now()
+        logger.info("Cookie刷新作业结束", extra={'fields': dict(self.counts(), job_id=self.id, status=self.status)})
+
+    def cancel(self):
+        self._cancel_event.set()
+
+class CookieRefreshJobManager:
+    """管理 Cookie 刷新作业，只在内存中保留最近的作业"""
+
+    def __init__(self, history: int = COOKIE_REFRESH_JOB_HISTORY):
+        self.history = history
+        self._jobs: Dict[str, CookieRefreshJob] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start_job(self, name: str, accounts: List[JimengAccount], concurrency: Optional[int] = None) -> CookieRefreshJob:
+        """创建作业并在后台线程中开始提交"""
+        concurrency = max(1, min(int(concurrency or COOKIE_REFRESH_CONCURRENCY), COOKIE_REFRESH_MAX_CONCURRENCY))
+        job = CookieRefreshJob(name, accounts, concurrency)
+        with self._lock:
+            self._jobs[job.id] = job
+            finished = [job_id for job_id, item in self._jobs.items() if item.status != JOB_RUNNING]
+            for job_id in finished[:max(0, len(self._jobs) - self.history)]:
+                del self._jobs[job_id]
+        threading.Thread(target=job.dispatch, name=f'CookieJob-{job.id}', daemon=True).start()
+        logger.info("Cookie刷新作业已创建",
+                    extra={'fields': {'job_id': job.id, 'name': name, 'total': len(accounts), 'concurrency': concurrency}})
+        return job
+
+    def get_job(self, job_id: str) -> Optional[CookieRefreshJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[CookieRefreshJob]:
+        """按创建时间从新到旧列出作业"""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def cancel_job(self, job_id: str) -> Optional[CookieRefreshJob]:
+        job = self.get_job(job_id)
+        if job is not None:
+            job.cancel()
+        return job
+
+def _run_job_account(job_id, account_id):
+    job = cookie_refresh_jobs.get_job(job_id)
+    if job is not None:
+        job.run_account(account_id)
+
+# 全局 Cookie 刷新作业管理器
+cookie_refresh_jobs = CookieRefreshJobManager()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+账号 cookies 回写缓冲 - 合并任务结束后的 cookies 回写，批量写入数据库
+
+每个任务结束时都会带回账号最新的 cookies（几 KB），直接写库会在任务集中结束时争用数据库写锁。
+回写先进入缓冲：与上次写入的 cookies 相比没有实质变化（名称、域名、路径、取值和按小时取整的
+过期时间都相同）时跳过；同一账号在一次刷新前的多次回写只保留最后一次；后台线程定期或在积累到
+一定数量时在一个事务中写入。
+"""
+
+import atexit
+import hashlib
+import json
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+from backend.config.settings import COOKIE_WRITEBACK_FLUSH_INTERVAL, COOKIE_WRITEBACK_BATCH_SIZE
+from backend.core.logger import get_logger
+from backend.models.models import JimengAccount
+from backend.utils.cookie_util import load_cookies, session_expiry
+
+logger = get_logger(__name__)
+
+def cookies_fingerprint(cookies: Optional[str]) -> str:
+    """cookies 的实质内容摘要，过期时间按小时取整，避免每次请求顺延过期时间都触发写入"""
+    material = sorted(
+        (cookie.get('name', ''), cookie.get('domain', ''), cookie.get('path', ''), cookie.get('value', ''),
+         int(cookie.get('expires') or -1) // 3600)
+        for cookie in load_cookies(cookies)
+    )
+    return hashlib.sha1(json.dumps(material).encode('utf-8')).hexdigest()
+
+class CookieWriteBuffer:
+    """即梦账号 cookies 的回写缓冲"""
+
+    def __init__(self, flush_interval: float = COOKIE_WRITEBACK_FLUSH_INTERVAL,
+                 batch_size: int = COOKIE_WRITEBACK_BATCH_SIZE):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending: Dict[int, str] = {}  # 账号ID -> 待写入的 cookies
+        self._fingerprints: Dict[int, str] = {}  # 账号ID -> 最近写入（或待写入）的 cookies 摘要
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.stats = {'submitted': 0, 'skipped': 0, 'coalesced': 0, 'written': 0, 'flushes': 0}
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._loop, name='CookieWriteBuffer', daemon=True)
+        self._thread.start()
+
+    def submit(self, account_id: int, cookies: Optional[str]) -> bool:
+        """
+        提交账号最新的 cookies
+
+        返回值:
+            bool: 是否需要写入；cookies 为空或没有实质变化时返回 False
+        """
+        if not account_id or not cookies:
+            return False
+        fingerprint = cookies_fingerprint(cookies)
+        with self._lock:
+            self.stats['submitted'] += 1
+            if self._fingerprints.get(account_id) == fingerprint:
+                self.stats['skipped'] += 1
+                return False
+            if account_id in self._pending:
+                self.stats['coalesced'] += 1
+            self._pending[account_id] = cookies
+            self._fingerprints[account_id] = fingerprint
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wakeup.set()
+        self.start()
+        return True
+
+    def discard(self, account_id: int):
+        """账号 cookies 已通过登录等方式直接更新时调用，丢弃缓冲中更旧的回写"""
+        with self._lock:
+            self._pending.pop(account_id, None)
+            self._fingerprints.pop(account_id, None)
+
+    def flush(self) -> int:
+        """把缓冲中的回写在一个事务中写入数据库，返回写入的账号数"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            now = datetime.now()
+            try:
+                with JimengAccount._meta.database.atomic():
+                    for account_id, cookies in pending.items():
+                        JimengAccount.update(
+                            cookies=cookies,
+                            cookies_expire_at=session_expiry(cookies),
+                            updated_at=now
+                        ).where(JimengAccount.id == account_id).execute()
+            except Exception as e:
+                logger.error(f"批量回写账号cookies失败: {str(e)}")
+                with self._lock:
+                    # 放回缓冲等待下次刷新，期间提交的更新的 cookies 优先
+                    for account_id, cookies in pending.items():
+                        self._pending.setdefault(account_id, cookies)
+                return 0
+            with self._lock:
+                self.stats['written'] += len(pending)
+                self.stats['flushes'] += 1
+            logger.debug("已批量回写账号cookies", extra={'fields': {'accounts': len(pending)}})
+            return len(pending)
+
+    def _loop(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+# 全局即梦账号 cookies 回写缓冲
+cookie_write_buffer = CookieWriteBuffer()
+atexit.register(cookie_write_buffer.flush)
@@ -32,10 +32,10 @@ def init_database():
         print("创建数据库目录: {}".format(DATABASE_DIR))
     
     # 导入模型
-    from backend.models.models import Config, JimengAccount, JimengText2ImgTask, JimengImg2ImgTask, JimengImg2VideoTask, JimengDigitalHumanTask, JimengTaskRecord, QingyingAccount, QingyingImage2VideoTask
+    from backend.models.models import Config, JimengAccount, JimengText2ImgTask, JimengImg2ImgTask, JimengImg2VideoTask, JimengDigitalHumanTask, JimengTaskRecord, QingyingAccount, QingyingImage2VideoTask, TaskPhaseTiming
     
     # 定义所有模型类
-    models = [Config, JimengAccount, JimengText2ImgTask, JimengImg2ImgTask, JimengImg2VideoTask, JimengDigitalHumanTask, JimengTaskRecord, QingyingAccount, QingyingImage2VideoTask]
+    models = [Config, JimengAccount, JimengText2ImgTask, JimengImg2ImgTask, JimengImg2VideoTask, JimengDigitalHumanTask, JimengTaskRecord, QingyingAccount, QingyingImage2VideoTask, TaskPhaseTiming]
     
     max_retries = 3
     retry_delay = 1  # 秒
@@ -60,6 +60,15 @@ def init_database():
                 else:
                     print("所有表都已存在，无需创建")
                 
+                # 为已存在的表补充新增字段
+                added_columns = migrate_missing_columns(models)
+                if added_columns:
+                    print(f"补充了 {len(added_columns)} 个缺失的字段: {', '.join(added_columns)}")
+                
+                # 为已存在的表补充新增索引（IF NOT EXISTS）
+                for model in models:
+                    model._schema.create_indexes(safe=True)
+                
                 print("数据库初始化完成: {}".format(DATABASE_PATH))
                 return  # 成功完成，退出重试循环
                 
@@ -80,4 +89,26 @@ def init_database():
                 retry_delay *= 2
                 continue
             else:
-                raise
\ No newline at end of file
+                raise
+
+def migrate_missing_columns(models):
+    """为已存在的表补充模型中新增的字段（新增字段必须可为空或有默认值）"""
+    from playhouse.migrate import SqliteMigrator, migrate
+    
+    added_columns = []
+    for model in models:
+        database = model._meta.database
+        table_name = model._meta.table_name
+        existing_columns = {column.name for column in database.get_columns(table_name)}
+        migrator = SqliteMigrator(database)
+        
+        operations = []
+        for field in model._meta.sorted_fields:
+            if field.column_name not in existing_columns:
+                operations.append(migrator.add_column(table_name, field.column_name, field))
+                added_columns.append(f"{table_name}.{field.column_name}")
+        
+        if operations:
+            migrate(*operations)
+    
+    return added_columns
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+跨平台公平调度 - 按权重和最小/最大份额在各平台之间分配全局线程池
+
+各平台任务管理器每次扫描时上报排队中（尚未提交）的任务数并申请线程槽位，只提交分配到的数量。
+空闲槽位依次分给：队首有紧急任务（优先级达到 TASK_PRIORITY_URGENT 或临近截止时间）的平台优先分到一个；
+其次是低于最小份额的平台；再按 已占用槽位数 / 权重 最小的平台，相同时轮流分配。
+没有排队任务的平台不占份额，空闲槽位可被其他平台借用（不超过各自的最大份额）；
+正在执行的任务不会被中断，借出的槽位在任务结束后按上述顺序重新分配。
+"""
+
+import threading
+import time
+from typing import Dict, Tuple
+
+from backend.config.settings import FAIR_SCHEDULER_SHARES, FAIR_SCHEDULER_DEMAND_TTL
+from backend.core.logger import get_logger
+from backend.core.worker_slots import worker_slots
+from backend.utils.config_util import get_automation_max_threads
+
+logger = get_logger(__name__)
+
+class SlotGrant:
+    """
+    一次分配到的线程槽位
+
+    在 with 语句中提交任务，每提交一个任务调用 bind(future)，任务结束时归还槽位；
+    退出 with 语句时归还未使用的槽位。
+    """
+
+    def __init__(self, scheduler: 'FairScheduler', platform: str, slots: int):
+        self.scheduler = scheduler
+        self.platform = platform
+        self.slots = slots
+        self.used = 0
+
+    @property
+    def remaining(self) -> int:
+        return self.slots - self.used
+
+    def bind(self, future):
+        """一个任务已提交到线程池"""
+        self.used += 1
+        future.add_done_callback(lambda f: self.scheduler.release(self.platform))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.remaining > 0:
+            self.scheduler.release(self.platform, self.remaining)
+        return False
+
+class FairScheduler:
+    """全局线程池的跨平台加权公平调度器"""
+
+    def __init__(self, shares: Dict[str, Dict] = FAIR_SCHEDULER_SHARES,
+                 demand_ttl: float = FAIR_SCHEDULER_DEMAND_TTL):
+        self.shares = shares
+        self.demand_ttl = demand_ttl
+        self._running: Dict[str, int] = {}  # 平台 -> 已分配且未归还的槽位数
+        self._demand: Dict[str, Tuple[int, float]] = {}  # 平台 -> (排队任务数, 上报时间)
+        self._urgent: Dict[str, bool] = {}  # 平台 -> 队首是否有紧急任务
+        self._turns: Dict[str, int] = {}  # 平台 -> 最近一次分配的序号，份额相同时轮流分配
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """全局线程池（重新）创建时调用"""
+        with self._lock:
+            self._running.clear()
+            self._demand.clear()
+            self._urgent.clear()
+            self._turns.clear()
+
+    def capacity(self) -> int:
+        return worker_slots.size or get_automation_max_threads()
+
+    def limits(self, platform: str, capacity: int) -> Tuple[float, int, int]:
+        """
+        平台的调度参数
+
+        返回值:
+            Tuple: (权重, 最小槽位数, 最大槽位数)，份额按线程池大小四舍五入，最大槽位数至少为 1
+        """
+        share = self.shares.get(platform, {})
+        max_slots = max(1, int(share.get('max_share', 1.0) * capacity + 0.5))
+        min_slots = min(int(share.get('min_share', 0) * capacity + 0.5), max_slots)
+        return share.get('weight', 1), min_slots, max_slots
+
+    def grant(self, platform: str, demand: int, urgent: bool = False) -> SlotGrant:
+        """
+        上报排队任务数并申请槽位
+
+        参数:
+            platform: 平台名称，与 FAIR_SCHEDULER_SHARES 的键一致
+            demand: 排队中且尚未提交到线程池的任务数（批量执行时为需要的线程数）
+            urgent: 队首是否有紧急任务
+
+        返回值:
+            SlotGrant: 本次可以提交的任务数为 grant.slots
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._demand[platform] = (max(0, demand), now)
+            self._urgent[platform] = urgent
+            slots = self._allocate(platform, now) if demand > 0 else 0
+            if slots:
+                self._running[platform] = self._running.get(platform, 0) + slots
+                self._demand[platform] = (demand - slots, now)
+        if slots:
+            logger.debug("分配线程槽位", extra={'fields': {'platform': platform, 'slots': slots, 'demand': demand}})
+        return SlotGrant(self, platform, slots)
+
+    def release(self, platform: str, count: int = 1):
+        """归还槽位"""
+        with self._lock:
+            self._running[platform] = max(0, self._running.get(platform, 0) - count)
+
+    def _allocate(self, platform: str, now: float) -> int:
+        """模拟把当前空闲槽位逐个分配给各平台，返回分到申请平台的数量（需持有锁）"""
+        capacity = self.capacity()
+        managed = sum(self._running.values())
+        # 账号登录、登录态维护等不经过调度的任务也占用线程
+        external = max(0, worker_slots.active_count() - managed)
+        free = capacity - managed - external
+        if free <= 0:
+            return 0
+
+        demand = {p: d for p, (d, at) in self._demand.items() if d > 0 and now - at <= self.demand_ttl}
+        running = dict(self._running)
+        turns = dict(self._turns)
+        limits = {p: self.limits(p, capacity) for p in demand}
+        # 紧急任务只优先分配一个槽位，之后按份额排队
+        urgent = {p for p in demand if self._urgent.get(p)}
+        granted = 0
+        for _ in range(free):
+            eligible = [p for p in demand if demand[p] > 0 and running.get(p, 0) < limits[p][2]]
+            if not eligible:
+                break
+            winner = min(eligible, key=lambda p: (p not in urgent,
+                                                 running.get(p, 0) >= limits[p][1],
+                                                 running.get(p, 0) / limits[p][0],
+                                                 turns.get(p, 0)))
+            urgent.discard(winner)
+            running[winner] = running.get(winner, 0) + 1
+            demand[winner] -= 1
+            self._sequence += 1
+            turns[winner] = self._sequence
+            if winner == platform:
+                granted += 1
+        if granted:
+            self._turns[platform] = turns[platform]
+        return granted
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """各平台的调度状态，用于状态接口"""
+        now = time.monotonic()
+        capacity = self.capacity()
+        with self._lock:
+            platforms = set(self.shares) | set(self._running) | set(self._demand)
+            result = {}
+            for platform in sorted(platforms):
+                weight, min_slots, max_slots = self.limits(platform, capacity)
+                demand, at = self._demand.get(platform, (0, 0))
+                result[platform] = {
+                    'running': self._running.get(platform, 0),
+                    'queued': demand if now - at <= self.demand_ttl else 0,
+                    'urgent': self._urgent.get(platform, False),
+                    'weight': weight,
+                    'min_slots': min_slots,
+                    'max_slots': max_slots
+                }
+            return result
+
+# 全局跨平台公平调度器
+fair_scheduler = FairScheduler()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+日志模块 - 异步写出的结构化日志
+
+业务线程只把日志记录放入队列，由后台线程统一格式化并写到标准输出，
+避免大量工作线程同步写 stdout 时互相争抢。支持 JSON/文本两种输出格式和按模块设置日志级别。
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime
+
+from backend.config.settings import LOG_FORMAT, LOG_LEVEL, LOG_LEVELS
+
+# LogRecord 自带的属性，其余属性视为结构化字段
+_RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+_listener = None
+_setup_lock = threading.Lock()
+
+def _record_fields(record) -> dict:
+    """提取日志记录中的结构化字段，extra={'fields': {...}} 中的字段会展开"""
+    fields = {}
+    for key, value in record.__dict__.items():
+        if key in _RESERVED_ATTRS or key.startswith('_'):
+            continue
+        if key == 'fields' and isinstance(value, dict):
+            fields.update(value)
+        else:
+            fields[key] = value
+    return fields
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出一行 JSON"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3],
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        fields = _record_fields(record)
+        if fields:
+            entry['fields'] = fields
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class TextFormatter(logging.Formatter):
+    """便于人工阅读的单行文本，结构化字段附加在末尾"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+
+    def format(self, record):
+        text = super().format(record)
+        fields = _record_fields(record)
+        if fields:
+            text += f" | {fields}"
+        return text
+
+def _parse_levels(value: str) -> dict:
+    """解析 "模块=级别,模块=级别" 形式的环境变量"""
+    levels = {}
+    for item in value.split(','):
+        if '=' in item:
+            name, level = item.split('=', 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+def setup_logging():
+    """
+    初始化日志系统，重复调用无副作用
+
+    环境变量 LOG_FORMAT、LOG_LEVEL、LOG_LEVELS 可覆盖配置中的默认值，
+    例如 LOG_LEVELS="backend.api.access=WARNING,backend.managers=DEBUG"。
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        log_format = LOG_FORMAT.lower()
+        formatter = JsonFormatter() if log_format == 'json' else TextFormatter()
+
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(formatter)
+
+        # 业务线程只入队，由后台线程写出
+        log_queue = queue.SimpleQueue()
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(logging.handlers.QueueHandler(log_queue))
+        root.setLevel(LOG_LEVEL.upper())
+
+        levels = dict(LOG_LEVELS)
+        levels.update(_parse_levels(os.environ.get('LOG_LEVELS', '')))
+        for name, level in levels.items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+
+def shutdown_logging():
+    """停止后台写日志线程，并写出队列中剩余的日志"""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+def get_logger(name: str) -> logging.Logger:
+    """获取模块日志记录器，首次使用时自动初始化日志系统"""
+    setup_logging()
+    return logging.getLogger(name)
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+"""
+运行指标模块 - 以 Prometheus 文本格式输出队列、延迟、执行结果、线程池和内存等指标
+
+不依赖 prometheus_client，计数器和直方图保存在进程内存中，服务重启后从零开始，
+由 Prometheus 按抓取间隔计算速率。
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from backend.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# HTTP 接口耗时分桶（秒）
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# 任务排队等待时长分桶（秒）
+DISPATCH_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200)
+
+# 任务执行时长分桶（秒）
+EXECUTION_BUCKETS = (5, 15, 30, 60, 120, 180, 300, 600, 1200, 1800, 3600)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(label_names, label_values, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_number(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+class _Metric:
+    """指标基类，按标签值分别保存数据"""
+    metric_type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels: Dict) -> tuple:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def clear(self):
+        """清空所有标签下的数据，用于抓取时重新采集的指标"""
+        with self._lock:
+            self._values.clear()
+
+    def _render_samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        if not items and not self.label_names:
+            items = [((), 0)]
+        for key, value in sorted(items):
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_number(value)}"
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(self._render_samples())
+        return '\n'.join(lines)
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    metric_type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    """可增可减的当前值"""
+    metric_type = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(_Metric):
+    """分桶直方图"""
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels=(), buckets=HTTP_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data['buckets'][index] += 1
+                    break
+            data['sum'] += value
+            data['count'] += 1
+
+    def _render_samples(self):
+        with self._lock:
+            items = [(key, {'buckets': list(data['buckets']), 'sum': data['sum'], 'count': data['count']})
+                     for key, data in self._values.items()]
+        for key, data in sorted(items):
+            cumulative = 0
+            for bound, count in zip(self.buckets, data['buckets']):
+                cumulative += count
+                le = ('le', _format_number(float(bound)))
+                yield f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}"
+            yield f"{self.name}_bucket{_format_labels(self.label_names, key, ('le', '+Inf'))} {data['count']}"
+            yield f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_number(round(data['sum'], 6))}"
+            yield f"{self.name}_count{_format_labels(self.label_names, key)} {data['count']}"
+
+# HTTP
+http_request_duration = Histogram(
+    'http_request_duration_seconds', 'HTTP接口耗时', ('method', 'route', 'status'), HTTP_BUCKETS)
+
+# 任务
+task_queue_depth = Gauge('task_queue_depth', '排队中的任务数', ('platform',))
+task_processing = Gauge('task_processing', '生成中的任务数', ('platform',))
+task_dispatch_latency = Histogram(
+    'task_dispatch_latency_seconds', '任务从排队到开始处理的等待时长', ('platform',), DISPATCH_BUCKETS)
+task_execution_duration = Histogram(
+    'task_execution_seconds', '执行器单次执行耗时', ('executor',), EXECUTION_BUCKETS)
+task_results = Counter('task_results_total', '执行器执行结果，按错误码分类', ('executor', 'code'))
+
+# 线程池
+worker_pool_max_threads = Gauge('worker_pool_max_threads', '全局线程池最大线程数')
+worker_pool_busy_threads = Gauge('worker_pool_busy_threads', '全局线程池中正在执行任务的线程数')
+worker_pool_queued_tasks = Gauge('worker_pool_queued_tasks', '全局线程池中等待线程的任务数')
+
+# 浏览器与内存
+browser_instances = Gauge('browser_instances', '当前打开的浏览器实例数')
+process_resident_memory = Gauge('process_resident_memory_bytes', '后端进程常驻内存')
+browser_resident_memory = Gauge('browser_resident_memory_bytes', '后端进程所有子进程（浏览器及驱动）常驻内存')
+
+class MeteredThreadPoolExecutor(ThreadPoolExecutor):
+    """记录忙碌线程数的线程池，提供 slot_registry 时同时登记每个工作线程的槽位"""
+
+    def __init__(self, *args, slot_registry=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._busy_count = 0
+        self._busy_lock = threading.Lock()
+        self._slot_registry = slot_registry
+
+    def submit(self, fn, /, *args, **kwargs):
+        def run():
+            with self._busy_lock:
+                self._busy_count += 1
+            if self._slot_registry is not None:
+                self._slot_registry.acquire()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                if self._slot_registry is not None:
+                    self._slot_registry.release()
+                with self._busy_lock:
+                    self._busy_count -= 1
+        return super().submit(run)
+
+    @property
+    def busy_threads(self) -> int:
+        return self._busy_count
+
+    @property
+    def queued_tasks(self) -> int:
+        return self._work_queue.qsize()
+
+def observe_http_request(method: str, route: str, status: int, seconds: float):
+    """记录一次 HTTP 请求耗时"""
+    http_request_duration.observe(seconds, method=method, route=route, status=status)
+
+def observe_task_dispatch(task):
+    """
+    记录任务从排队到开始处理的等待时长，需在任务状态改为生成中之前调用
+
+    重试任务以最后一次更新时间（重新排队时间）为起点。
+    """
+    queued_at = getattr(task, 'update_at', None) or getattr(task, 'create_at', None)
+    if queued_at is None:
+        return
+    wait_seconds = max(0.0, (datetime.now() - queued_at).total_seconds())
+    task_dispatch_latency.observe(wait_seconds, platform=task._meta.table_name)
+
+def observe_task_result(executor: str, code_name: str, seconds: float):
+    """记录执行器一次执行的结果和耗时"""
+    task_results.inc(executor=executor, code=code_name)
+    task_execution_duration.observe(seconds, executor=executor)
+
+def _collect_task_counts():
+    """采集各平台排队中和生成中的任务数"""
+    from peewee import fn
+    from backend.models.models import (JimengText2ImgTask, JimengImg2ImgTask, JimengImg2VideoTask,
+                                       JimengDigitalHumanTask, QingyingImage2VideoTask)
+
+    task_queue_depth.clear()
+    task_processing.clear()
+    for model in (JimengText2ImgTask, JimengImg2ImgTask, JimengImg2VideoTask,
+                  JimengDigitalHumanTask, QingyingImage2VideoTask):
+        platform = model._meta.table_name
+        counts = dict(model
+                      .select(model.status, fn.COUNT(model.id))
+                      .where(model.status.in_([0, 1]))
+                      .group_by(model.status)
+                      .tuples())
+        task_queue_depth.set(counts.get(0, 0), platform=platform)
+        task_processing.set(counts.get(1, 0), platform=platform)
+
+def _collect_worker_pool():
+    """采集全局线程池使用情况"""
+    from backend.core.global_task_manager import global_task_manager
+
+    pool = global_task_manager.global_executor
+    worker_pool_max_threads.set(global_task_manager.max_threads if pool else 0)
+    worker_pool_busy_threads.set(getattr(pool, 'busy_threads', 0) if pool else 0)
+    worker_pool_queued_tasks.set(getattr(pool, 'queued_tasks', 0) if pool else 0)
+
+# 无法采集内存指标的警告只输出一次
+_memory_unavailable_logged = False
+
+def _read_proc_rss(pid) -> int:
+    """从 /proc 读取进程常驻内存（字节）"""
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) * 1024
+    return 0
+
+def _proc_descendants(root_pid: int):
+    """从 /proc 查找进程的所有子孙进程"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # 进程名可能包含空格，从最后一个右括号之后解析
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    descendants, stack = [], [root_pid]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            descendants.append(child)
+            stack.append(child)
+    return descendants
+
+def _collect_memory():
+    """
+    采集后端进程和浏览器子进程的常驻内存，优先使用 psutil，否则读取 /proc
+
+    与后端相同可执行文件的子进程（Python 工作进程）不计入浏览器内存。
+    """
+    global _memory_unavailable_logged
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+
+    if psutil is not None:
+        process = psutil.Process()
+        process_resident_memory.set(process.memory_info().rss)
+        executable = process.exe()
+        total = 0
+        for child in process.children(recursive=True):
+            try:
+                if child.exe() == executable:
+                    continue
+                total += child.memory_info().rss
+            except psutil.Error:
+                continue
+        browser_resident_memory.set(total)
+    elif os.path.isdir('/proc'):
+        process_resident_memory.set(_read_proc_rss('self'))
+        executable = os.path.realpath('/proc/self/exe')
+        total = 0
+        for pid in _proc_descendants(os.getpid()):
+            try:
+                if os.path.realpath(f'/proc/{pid}/exe') == executable:
+                    continue
+                total += _read_proc_rss(pid)
+            except OSError:
+                continue
+        browser_resident_memory.set(total)
+    elif not _memory_unavailable_logged:
+        _memory_unavailable_logged = True
+        logger.warning("未安装 psutil，无法采集内存指标")
+
+def render_metrics() -> str:
+    """采集运行时指标并输出 Prometheus 文本格式"""
+    for collector in (_collect_task_counts, _collect_worker_pool, _collect_memory):
+        try:
+            collector()
+        except Exception as e:
+            logger.warning(f"采集指标失败: {str(e)}", extra={'fields': {'collector': collector.__name__}})
+
+    with _registry_lock:
+        metrics = list(_registry)
+    return '\n'.join(metric.render() for metric in metrics) + '\n'
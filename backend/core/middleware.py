@@ -3,8 +3,24 @@
 中间件模块
 """
 
+import gzip
+import hashlib
 import time
-from flask import request
+from datetime import date
+from functools import wraps
+from flask import request, make_response
+
+from backend.core.change_version import BOOT_ID, get_versions
+from backend.core.logger import get_logger
+from backend.core.metrics import observe_http_request
+
+access_logger = get_logger('backend.api.access')
+
+# 超过该大小的 JSON 响应才压缩（字节）
+GZIP_MIN_SIZE = 1024
+
+# gzip 压缩级别，兼顾速度和压缩率
+GZIP_LEVEL = 5
 
 def before_request():
     """记录请求开始时间的中间件"""
@@ -12,8 +28,89 @@ def before_request():
 
 def after_request(response):
     """记录API响应的中间件"""
+    response = compress_response(response)
     if hasattr(request, 'start_time'):
-        response_time = round((time.time() - request.start_time) * 1000, 2)
-        print("API响应 - {} {}, 状态码: {}, 响应时间: {}ms".format(
-            request.method, request.url, response.status_code, response_time))
-    return response
\ No newline at end of file
+        elapsed = time.time() - request.start_time
+        response_time = round(elapsed * 1000, 2)
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        observe_http_request(request.method, route, response.status_code, elapsed)
+        access_logger.info("API响应", extra={'fields': {
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'status': response.status_code,
+            'duration_ms': response_time
+        }})
+    return response
+
+def compress_response(response):
+    """对较大的 JSON 响应进行 gzip 压缩"""
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or response.mimetype != 'application/json'
+            or 'Content-Encoding' in response.headers
+            or 'gzip' not in request.headers.get('Accept-Encoding', '').lower()):
+        return response
+
+    data = response.get_data()
+    if len(data) < GZIP_MIN_SIZE:
+        return response
+
+    response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+def _not_modified(etag):
+    """If-None-Match 命中时返回 304"""
+    if etag in request.if_none_match:
+        response = make_response('', 304)
+        response.set_etag(etag)
+        return response
+    return None
+
+def etag_by_table_versions(*models):
+    """
+    根据数据表变更版本生成 ETag 的装饰器
+
+    相关表没有写操作时直接返回 304，不执行接口里的查询。
+    ETag 包含请求路径和参数、服务启动标识以及当天日期（用于“今日”类统计）。
+    """
+    table_names = [model._meta.table_name for model in models]
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            # 在执行查询前读取版本号，查询期间发生的写操作会在下次请求时体现
+            key = f"{request.full_path}|{BOOT_ID}|{date.today()}|{get_versions(table_names)}"
+            etag = hashlib.md5(key.encode('utf-8')).hexdigest()
+
+            response = _not_modified(etag)
+            if response is not None:
+                return response
+
+            response = func(*args, **kwargs)
+            if getattr(response, 'status_code', None) == 200:
+                response.set_etag(etag)
+            return response
+        return wrapper
+    return decorator
+
+def etag_by_content(func):
+    """
+    根据响应内容生成 ETag 的装饰器，用于内存状态接口
+
+    接口仍会执行，但内容未变化时只返回 304，不重复传输数据。
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        response = func(*args, **kwargs)
+        if getattr(response, 'status_code', None) != 200:
+            return response
+
+        etag = hashlib.md5(response.get_data()).hexdigest()
+        not_modified = _not_modified(etag)
+        if not_modified is not None:
+            return not_modified
+        response.set_etag(etag)
+        return response
+    return wrapper
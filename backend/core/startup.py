@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+启动流程模块 - 就绪信号与分阶段启动耗时统计
+"""
+
+import threading
+import time
+
+from backend.config.settings import DATABASE_READY_TIMEOUT
+
+# 数据库初始化且生成中任务已重置后置位，任务扫描线程据此开始扫描
+database_ready = threading.Event()
+
+_startup_begin = time.perf_counter()
+_last_mark = _startup_begin
+_phases = []  # [(阶段名称, 耗时秒数)]
+_scanners_ready = {}  # 平台名称 -> 启动后多少秒开始扫描
+_lock = threading.Lock()
+
+def mark_phase(name: str):
+    """记录一个启动阶段，耗时为距上一个阶段结束的时间"""
+    global _last_mark
+    now = time.perf_counter()
+    with _lock:
+        _phases.append((name, now - _last_mark))
+        _last_mark = now
+
+def mark_database_ready():
+    """标记数据库已就绪"""
+    database_ready.set()
+
+def wait_for_database_ready(platform_name: str) -> bool:
+    """
+    任务扫描线程等待数据库就绪
+
+    参数:
+        platform_name: 平台名称，用于记录开始扫描的时间
+
+    返回值:
+        bool: 是否在超时前就绪
+    """
+    ready = database_ready.wait(DATABASE_READY_TIMEOUT)
+    with _lock:
+        _scanners_ready.setdefault(platform_name, time.perf_counter() - _startup_begin)
+    return ready
+
+def get_startup_report() -> dict:
+    """获取启动耗时报告"""
+    with _lock:
+        return {
+            'phases': [{'name': name, 'seconds': round(seconds, 3)} for name, seconds in _phases],
+            'total_seconds': round(_last_mark - _startup_begin, 3),
+            'scanners_ready_seconds': {name: round(seconds, 3) for name, seconds in _scanners_ready.items()},
+            'database_ready': database_ready.is_set()
+        }
+
+def print_startup_report():
+    """打印启动耗时报告"""
+    report = get_startup_report()
+    print("启动耗时统计:")
+    for phase in report['phases']:
+        print(f"  {phase['name']}: {phase['seconds'] * 1000:.0f}ms")
+    print(f"  合计: {report['total_seconds'] * 1000:.0f}ms")
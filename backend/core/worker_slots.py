@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+线程槽位登记模块 - 记录全局线程池中每个工作线程当前的任务和执行阶段
+
+每个工作线程首次执行任务时绑定一个固定槽位。写操作在锁内生成新的槽位元组并整体替换，
+读取方直接拿到当前元组，无需加锁，也不会读到更新了一半的槽位。
+"""
+
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# 执行阶段对应的大致进度（百分比），用于线程面板显示
+PHASE_PROGRESS = {
+    'init_browser': 5,
+    'handle_cookies': 10,
+    'check_login_status': 15,
+    'perform_login': 20,
+    'validate_login_success': 25,
+    'navigate_to_generation_page': 30,
+    'navigate_to_image2video_page': 30,
+    'navigate_to_digital_human_page': 30,
+    'navigate_to_platform': 30,
+    'upload_image': 40,
+    'upload_input_images': 40,
+    'upload_avatar_image': 40,
+    'http_upload_image': 40,
+    'upload_speech_audio': 45,
+    'start_generation': 55,
+    'http_submit': 55,
+    'wait_for_generation_complete': 70,
+    'wait_for_completion': 70,
+    'http_wait_for_result': 70,
+    'close_browser': 95
+}
+
+def _idle_slot(slot_id: int) -> Dict:
+    return {
+        'id': slot_id,
+        'status': 'idle',
+        'task_id': None,
+        'platform': None,
+        'task_type': None,
+        'prompt': None,
+        'start_time': None,
+        'phase': None,
+        'phase_start_time': None,
+        'progress': 0
+    }
+
+class WorkerSlotRegistry:
+    """全局线程池的槽位登记表"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._generation = 0
+        self._bound = set()  # 已绑定工作线程的槽位下标
+        self._slots: Tuple[Dict, ...] = ()
+
+    @property
+    def size(self) -> int:
+        """槽位数量，即线程池大小；线程池未启动时为 0"""
+        return len(self._slots)
+
+    def reset(self, size: int):
+        """线程池（重新）创建时调用，清空所有槽位绑定"""
+        with self._lock:
+            self._generation += 1
+            self._bound = set()
+            self._slots = tuple(_idle_slot(i) for i in range(1, size + 1))
+
+    def _current_index(self) -> Optional[int]:
+        """获取当前线程绑定的槽位下标，首次调用时绑定一个空闲槽位"""
+        binding = getattr(self._local, 'binding', None)
+        if binding and binding[0] == self._generation:
+            return binding[1]
+        with self._lock:
+            for index in range(len(self._slots)):
+                if index not in self._bound:
+                    self._bound.add(index)
+                    self._local.binding = (self._generation, index)
+                    return index
+        return None
+
+    def _update(self, index: Optional[int], generation: int, **changes):
+        """替换一个槽位；线程池已重建（代数变化）时忽略"""
+        if index is None:
+            return
+        with self._lock:
+            if generation != self._generation or index >= len(self._slots):
+                return
+            slots = list(self._slots)
+            slot = dict(slots[index])
+            slot.update(changes)
+            slots[index] = slot
+            self._slots = tuple(slots)
+
+    def acquire(self):
+        """工作线程开始执行任务"""
+        index = self._current_index()
+        self._update(index, self._generation, status='active', start_time=datetime.now(),
+                     task_id=None, platform=None, task_type=None, prompt=None,
+                     phase=None, phase_start_time=None, progress=0)
+
+    def release(self):
+        """工作线程执行完任务"""
+        index = self._current_index()
+        if index is not None:
+            self._update(index, self._generation, **{k: v for k, v in _idle_slot(index + 1).items() if k != 'id'})
+
+    def assign_task(self, task_id=None, platform: str = None, task_type: str = None, prompt: str = None):
+        """登记当前线程正在执行的任务"""
+        if prompt and len(prompt) > 100:
+            prompt = prompt[:100] + '...'
+        self._update(self._current_index(), self._generation,
+                     task_id=task_id, platform=platform, task_type=task_type, prompt=prompt)
+
+    def current_slot(self) -> Optional[Tuple[int, int]]:
+        """
+        获取当前线程的槽位句柄 (代数, 下标)
+
+        执行器在构造时保存句柄，之后即使在其他线程中运行协程也能更新原槽位。
+        不在全局线程池中的线程返回 None。
+        """
+        binding = getattr(self._local, 'binding', None)
+        if binding and binding[0] == self._generation:
+            return binding
+        return None
+
+    def set_phase(self, handle: Optional[Tuple[int, int]], phase: str):
+        """更新槽位当前执行阶段"""
+        if handle is None:
+            return
+        generation, index = handle
+        progress = PHASE_PROGRESS.get(phase)
+        changes = {'phase': phase, 'phase_start_time': datetime.now()}
+        if progress is not None:
+            changes['progress'] = progress
+        self._update(index, generation, **changes)
+
+    def snapshot(self) -> Tuple[Dict, ...]:
+        """获取所有槽位的只读快照（无锁）"""
+        return self._slots
+
+    def active_count(self) -> int:
+        """正在执行任务的槽位数量"""
+        return sum(1 for slot in self._slots if slot['status'] == 'active')
+
+def format_slot(slot: Dict, now: Optional[datetime] = None) -> Dict:
+    """将槽位转换为接口返回格式"""
+    now = now or datetime.now()
+    phase_start = slot['phase_start_time']
+    return {
+        'id': slot['id'],
+        'status': slot['status'],
+        'task_id': slot['task_id'],
+        'platform': slot['platform'] or '全局线程池',
+        'task_type': slot['task_type'],
+        'prompt': slot['prompt'],
+        'progress': slot['progress'],
+        'start_time': slot['start_time'],
+        'phase': slot['phase'],
+        'phase_start_time': phase_start,
+        'phase_elapsed': round((now - phase_start).total_seconds(), 1) if phase_start else None
+    }
+
+def get_slot_details(platform: Optional[str] = None) -> List[Dict]:
+    """获取槽位详情，可按平台过滤"""
+    now = datetime.now()
+    return [format_slot(slot, now) for slot in worker_slots.snapshot()
+            if platform is None or slot['platform'] == platform]
+
+# 全局线程池槽位登记表
+worker_slots = WorkerSlotRegistry()
@@ -15,7 +15,17 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from backend.models.models import JimengImg2ImgTask, JimengAccount
 from backend.utils.jimeng_img2img import JimengImg2ImgExecutor
 from backend.utils.config_util import get_automation_max_threads, get_hide_window
-from backend.config.settings import TASK_PROCESSOR_INTERVAL, TASK_PROCESSOR_ERROR_WAIT
+from backend.core.startup import wait_for_database_ready
+from backend.config.settings import TASK_PROCESSOR_INTERVAL, TASK_PROCESSOR_ERROR_WAIT, UPLOAD_PREPARE_LOOKAHEAD
+from backend.core.logger import get_logger
+from backend.core.metrics import observe_task_dispatch
+from backend.utils.task_timing_util import save_task_spans
+from backend.utils.image_prepare_util import prefetch_queued_images
+from backend.core.fair_scheduler import fair_scheduler
+from backend.utils.task_priority_util import is_urgent
+from backend.core.worker_slots import worker_slots
+
+logger = get_logger(__name__)
 
 def run_async_safe(coro):
     """安全地运行异步协程，处理事件循环冲突"""
@@ -66,6 +76,7 @@ class JimengImg2ImgTaskManager:
         self.executor = None
         self.max_threads = 1  # 默认线程数
         self.active_tasks = {}  # 存储正在执行的任务信息 {thread_id: task_info}
+        self.submitted_tasks = set()  # 已提交到线程池、尚未结束的任务ID
         self._task_id_counter = 0  # 用于分配线程ID
         
         # 统计信息
@@ -87,12 +98,12 @@ class JimengImg2ImgTaskManager:
     def set_global_executor(self, executor):
         """设置全局线程池（兼容全局任务管理器）"""
         self.global_executor = executor
-        print("即梦图生图已设置全局线程池")
+        logger.info("即梦图生图已设置全局线程池")
     
     def start(self):
         """启动任务管理器"""
         if self.status == TaskManagerStatus.RUNNING:
-            print("即梦图生图任务管理器已在运行中")
+            logger.warning("即梦图生图任务管理器已在运行中")
             return False
         
         self.status = TaskManagerStatus.RUNNING
@@ -106,16 +117,16 @@ class JimengImg2ImgTaskManager:
         self.thread = threading.Thread(target=self._task_loop, daemon=True)
         self.thread.start()
         
-        print(f"即梦图生图任务管理器已启动，最大线程数: {self.max_threads}")
+        logger.info(f"即梦图生图任务管理器已启动，最大线程数: {self.max_threads}")
         return True
     
     def stop(self):
         """停止任务管理器"""
         if self.status == TaskManagerStatus.STOPPED:
-            print("即梦图生图任务管理器已停止")
+            logger.info("即梦图生图任务管理器已停止")
             return False
         
-        print("正在停止即梦图生图任务管理器...")
+        logger.info("正在停止即梦图生图任务管理器...")
         self.status = TaskManagerStatus.STOPPED
         
         # 关闭线程池
@@ -127,20 +138,20 @@ class JimengImg2ImgTaskManager:
         if self.thread and self.thread.is_alive():
             self.thread.join(timeout=5)
         
-        print("即梦图生图任务管理器已停止")
+        logger.info("即梦图生图任务管理器已停止")
         return True
     
     def pause(self):
         """暂停任务管理器"""
         if self.status == TaskManagerStatus.RUNNING:
             self.status = TaskManagerStatus.PAUSED
-            print("即梦图生图任务管理器已暂停")
+            logger.info("即梦图生图任务管理器已暂停")
     
     def resume(self):
         """恢复任务管理器"""
         if self.status == TaskManagerStatus.PAUSED:
             self.status = TaskManagerStatus.RUNNING
-            print("即梦图生图任务管理器已恢复")
+            logger.info("即梦图生图任务管理器已恢复")
     
     def get_status(self) -> Dict:
         """获取任务管理器状态"""
@@ -169,7 +180,11 @@ class JimengImg2ImgTaskManager:
     
     def _task_loop(self):
         """主任务循环"""
-        print("即梦图生图任务管理器主循环已启动")
+        logger.info("即梦图生图任务管理器主循环已启动")
+        
+        # 等待数据库初始化和生成中任务重置完成
+        if not wait_for_database_ready("即梦图生图"):
+            logger.warning("即梦图生图等待数据库就绪超时，继续扫描")
         
         while self.status != TaskManagerStatus.STOPPED:
             try:
@@ -177,43 +192,59 @@ class JimengImg2ImgTaskManager:
                     time.sleep(1)
                     continue
                 
-                # 获取待处理的任务
-                pending_tasks = self._get_pending_tasks()
-                
-                if not pending_tasks:
-                    time.sleep(TASK_PROCESSOR_INTERVAL)
-                    continue
+                # 提前预处理排队任务的图片
+                prefetch_queued_images(JimengImg2ImgTask, 'jimeng', UPLOAD_PREPARE_LOOKAHEAD)
                 
-                # 提交任务到线程池
-                futures = []
-                for task in pending_tasks[:self.max_threads - len(self.active_tasks)]:
-                    future = self.executor.submit(self._process_task, task)
-                    futures.append((future, task))
+                # 提交任务到线程池，可提交的数量由跨平台公平调度器分配
+                pending_query = self._pending_query()
+                pending_tasks = self._get_pending_tasks(pending_query, fair_scheduler.capacity())
+                with fair_scheduler.grant('jimeng_img2img', pending_query.count(), is_urgent(pending_tasks)) as grant:
+                    for task in pending_tasks[:grant.slots]:
+                        grant.bind(self._submit_task(task))
                 
                 # 等待任务完成（非阻塞）
                 time.sleep(TASK_PROCESSOR_INTERVAL)
                 
             except Exception as e:
-                print(f"即梦图生图任务循环错误: {str(e)}")
+                logger.error(f"即梦图生图任务循环错误: {str(e)}")
                 with self.stats_lock:
                     self.stats['error_count'] += 1
                 time.sleep(TASK_PROCESSOR_ERROR_WAIT)
         
-        print("即梦图生图任务管理器主循环已结束")
+        logger.info("即梦图生图任务管理器主循环已结束")
     
-    def _get_pending_tasks(self) -> List[JimengImg2ImgTask]:
+    def _pending_query(self):
+        """排队中且尚未提交到线程池的任务"""
+        with self.tasks_lock:
+            submitted = list(self.submitted_tasks)
+        query = JimengImg2ImgTask.select().where(JimengImg2ImgTask.status == 0)  # 排队中
+        if submitted:
+            query = query.where(JimengImg2ImgTask.id.not_in(submitted))
+        return query
+    
+    def _get_pending_tasks(self, pending_query, limit: int) -> List[JimengImg2ImgTask]:
         """获取待处理的任务"""
+        if limit <= 0:
+            return []
         try:
-            # 获取排队中的任务，按创建时间排序
-            tasks = list(JimengImg2ImgTask.select().where(
-                JimengImg2ImgTask.status == 0  # 排队中
-            ).order_by(JimengImg2ImgTask.create_at).limit(self.max_threads))
-            
-            return tasks
+            # 按有效优先级排序
+            return JimengImg2ImgTask.select_for_dispatch(pending_query, limit)
         except Exception as e:
-            print(f"获取待处理任务失败: {str(e)}")
+            logger.error(f"获取待处理任务失败: {str(e)}")
             return []
     
+    def _submit_task(self, task: JimengImg2ImgTask):
+        """提交任务到全局线程池（未设置时使用本管理器的线程池）"""
+        with self.tasks_lock:
+            self.submitted_tasks.add(task.id)
+        future = (self.global_executor or self.executor).submit(self._process_task, task)
+        future.add_done_callback(lambda f: self._on_task_done(task.id))
+        return future
+    
+    def _on_task_done(self, task_id: int):
+        with self.tasks_lock:
+            self.submitted_tasks.discard(task_id)
+    
     def _process_task(self, task: JimengImg2ImgTask):
         """处理单个任务"""
         thread_id = self._get_next_task_id()
@@ -229,8 +260,13 @@ class JimengImg2ImgTaskManager:
                 'status': 'processing'
             }
         
+        if self.global_executor:
+            worker_slots.assign_task(task_id=task.id, platform='即梦图生图', task_type='图生图', prompt=task.prompt)
+        
         try:
-            print(f"[线程{thread_id}] 开始处理图生图任务 {task.id}: {task.prompt[:50]}...")
+            logger.info(f"[线程{thread_id}] 开始处理图生图任务 {task.id}: {task.prompt[:50]}...")
+            
+            observe_task_dispatch(task)
             
             # 更新任务状态为生成中
             task.update_status(1)
@@ -253,7 +289,7 @@ class JimengImg2ImgTaskManager:
                     self.stats['success_count'] += 1
                     self.stats['last_task_time'] = datetime.now()
                 
-                print(f"[线程{thread_id}] 任务 {task.id} 完成成功")
+                logger.info(f"[线程{thread_id}] 任务 {task.id} 完成成功")
             else:
                 # 任务失败
                 error_code = result.get('error_code', 'UNKNOWN_ERROR')
@@ -263,10 +299,10 @@ class JimengImg2ImgTaskManager:
                 with self.stats_lock:
                     self.stats['error_count'] += 1
                 
-                print(f"[线程{thread_id}] 任务 {task.id} 执行失败: {error_message}")
+                logger.error(f"[线程{thread_id}] 任务 {task.id} 执行失败: {error_message}")
         
         except Exception as e:
-            print(f"[线程{thread_id}] 任务 {task.id} 处理异常: {str(e)}")
+            logger.error(f"[线程{thread_id}] 任务 {task.id} 处理异常: {str(e)}")
             task.set_failure('PROCESSING_ERROR', str(e))
             
             with self.stats_lock:
@@ -286,6 +322,8 @@ class JimengImg2ImgTaskManager:
         try:
             # 创建执行器
             executor = JimengImg2ImgExecutor(headless=get_hide_window())
+            executor.set_timing_callback(lambda spans: save_task_spans(task, spans))
+            executor.bind_account(account.id)
             
             # 准备任务参数
             input_images = task.get_input_images()
@@ -317,7 +355,7 @@ class JimengImg2ImgTaskManager:
             return result
             
         except Exception as e:
-            print(f"执行图生图任务异常: {str(e)}")
+            logger.error(f"执行图生图任务异常: {str(e)}")
             return {
                 'success': False,
                 'error_code': 'EXECUTION_ERROR',
@@ -330,16 +368,13 @@ class JimengImg2ImgTaskManager:
             # 如果指定了账号ID，优先使用指定账号
             if preferred_account_id:
                 try:
-                    account = JimengAccount.get_by_id(preferred_account_id)
-                    if account.status == 1:  # 账号可用
-                        return account
+                    account = JimengAccount.select_ready().where(JimengAccount.id == preferred_account_id).get()
+                    return account
                 except:
                     pass
             
             # 获取所有可用账号
-            available_accounts = list(JimengAccount.select().where(
-                JimengAccount.status == 1  # 可用状态
-            ))
+            available_accounts = list(JimengAccount.select_ready())
             
             if not available_accounts:
                 return None
@@ -348,7 +383,7 @@ class JimengImg2ImgTaskManager:
             return random.choice(available_accounts)
             
         except Exception as e:
-            print(f"获取可用账号失败: {str(e)}")
+            logger.error(f"获取可用账号失败: {str(e)}")
             return None
     
     def _get_next_task_id(self) -> int:
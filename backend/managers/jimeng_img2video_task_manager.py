@@ -3,7 +3,6 @@
 基于新的BaseTaskExecutor架构
 """
 import asyncio
-import logging
 import threading
 import time
 import random
@@ -15,13 +14,19 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from backend.utils.jimeng_image2video import JimengImage2VideoExecutor
 from backend.models.models import JimengAccount, JimengTaskRecord, JimengImg2VideoTask
 from backend.utils.base_task_executor import ErrorCode
-from backend.core.database import db as database
 from backend.utils.config_util import get_automation_max_threads, get_hide_window
-from backend.config.settings import TASK_PROCESSOR_INTERVAL, TASK_PROCESSOR_ERROR_WAIT
+from backend.core.startup import wait_for_database_ready
+from backend.core.logger import get_logger
+from backend.core.metrics import observe_task_dispatch
+from backend.core.worker_slots import worker_slots
+from backend.utils.task_timing_util import save_task_spans
+from backend.core.cookie_writeback import cookie_write_buffer
+from backend.core.fair_scheduler import fair_scheduler
+from backend.utils.task_priority_util import is_urgent
+from backend.utils.image_prepare_util import prefetch_queued_images
+from backend.config.settings import TASK_PROCESSOR_INTERVAL, TASK_PROCESSOR_ERROR_WAIT, UPLOAD_PREPARE_LOOKAHEAD
 
-# 配置日志
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-logger = logging.getLogger(__name__)
+logger = get_logger(__name__)
 
 def run_async_safe(coro):
     """安全地运行异步协程，处理事件循环冲突"""
@@ -153,9 +158,10 @@ class JimengImg2VideoTaskManager:
         """工作线程主循环"""
         logger.info(f"{self.platform_name}任务扫描线程已启动")
         
-        # 初始延迟，等待数据库操作完全稳定
-        logger.info(f"{self.platform_name}任务扫描线程等待数据库稳定...")
-        time.sleep(5.0)
+        # 等待数据库初始化和生成中任务重置完成
+        logger.info(f"{self.platform_name}任务扫描线程等待数据库就绪...")
+        if not wait_for_database_ready(self.platform_name):
+            logger.warning(f"{self.platform_name}等待数据库就绪超时，继续扫描")
         logger.info(f"{self.platform_name}开始扫描任务...")
         
         while not self.stop_event.is_set():
@@ -187,46 +193,44 @@ class JimengImg2VideoTaskManager:
         logger.info(f"{self.platform_name}任务扫描线程已结束")
     
     def _scan_and_process_tasks(self):
-        """扫描并处理待处理任务"""
+        """扫描并处理待处理任务，可提交的数量由跨平台公平调度器分配"""
         try:
             if not self.global_executor or self.global_executor._shutdown:
                 return
-                
-            # 获取配置的最大线程数
-            max_threads = get_automation_max_threads()
-            
-            # 获取当前活跃的任务数量
-            with self._lock:
-                active_count = len([f for f in self.active_futures.values() if not f.done()])
             
-            if active_count >= max_threads:
-                return
+            # 线程池占满时也提前预处理排队任务的图片
+            prefetch_queued_images(JimengImg2VideoTask, 'jimeng', UPLOAD_PREPARE_LOOKAHEAD)
             
-            # 计算可以启动的新任务数量
-            available_slots = max_threads - active_count
+            # 按有效优先级取排队中的图生视频任务，最多取满线程池能执行的数量
+            pending_query = self._pending_query()
+            queued = pending_query.count()
+            pending_tasks = JimengImg2VideoTask.select_for_dispatch(pending_query, fair_scheduler.capacity()) if queued else []
             
-            # 查找排队中的图生视频任务
-            pending_tasks = JimengImg2VideoTask.select().where(
-                JimengImg2VideoTask.status == 0
-            ).order_by(JimengImg2VideoTask.create_at).limit(available_slots)
-            
-            for task in pending_tasks:
-                # 检查是否已经在处理中
-                if task.id in self.processing_tasks:
-                    continue
-                
-                # 提交任务到线程池
-                self._submit_task_to_pool(task)
+            with fair_scheduler.grant('jimeng_img2video', queued, is_urgent(pending_tasks)) as grant:
+                for task in pending_tasks[:grant.slots]:
+                    # 提交任务到线程池
+                    future = self._submit_task_to_pool(task)
+                    if future:
+                        grant.bind(future)
                 
         except Exception as e:
             logger.error(f"{self.platform_name}扫描任务失败: {str(e)}")
     
+    def _pending_query(self):
+        """排队中且尚未提交到线程池的任务"""
+        with self._lock:
+            processing = list(self.processing_tasks.keys())
+        query = JimengImg2VideoTask.select().where(JimengImg2VideoTask.status == 0)
+        if processing:
+            query = query.where(JimengImg2VideoTask.id.not_in(processing))
+        return query
+    
     def _submit_task_to_pool(self, task):
-        """提交任务到全局线程池"""
+        """提交任务到全局线程池，返回 Future，提交失败时返回 None"""
         try:
             if not self.global_executor:
                 logger.error(f"无法提交任务：全局线程池未设置")
-                return
+                return None
                 
             # 通过全局任务管理器提交任务，以便正确跟踪线程状态
             from backend.core.global_task_manager import global_task_manager
@@ -253,9 +257,11 @@ class JimengImg2VideoTaskManager:
             future.add_done_callback(lambda f: self._on_task_completed(task.id, f))
             
             logger.info(f"提交{self.platform_name}任务到线程池，任务ID: {task.id}")
+            return future
             
         except Exception as e:
             logger.error(f"提交{self.platform_name}任务到线程池失败，错误: {str(e)}")
+            return None
     
     def _on_task_completed(self, task_id, future):
         """任务完成回调"""
@@ -284,6 +290,8 @@ class JimengImg2VideoTaskManager:
             
             logger.info(f"开始处理{self.platform_name}任务，ID: {task.id}")
             
+            observe_task_dispatch(task)
+            
             # 更新任务状态为处理中
             task.status = 1
             task.update_at = datetime.now()
@@ -305,6 +313,7 @@ class JimengImg2VideoTaskManager:
                         run_async_safe(self.update_account_cookies(result['account_id'], result['cookies']))
                 
                 task.status = 2  # 已完成
+                task.phase = None  # 任务结束，清除断点
                 task.update_at = datetime.now()
                 task.save()
                 
@@ -402,8 +411,13 @@ class JimengImg2VideoTaskManager:
         logger.info(f"任务参数: image_path='{task.image_path}', prompt='{task.prompt}'")
         
         try:
-            # 获取可用账号
-            available_account = self._get_available_account('img2video')
+            # 已提交到远端的任务沿用原账号，直接轮询结果
+            available_account, resume_task_id = self._get_resume_account(task)
+            if resume_task_id:
+                logger.info(f"任务 {task.id} 已提交过，恢复轮询远端任务: {resume_task_id}")
+            else:
+                # 获取可用账号
+                available_account = self._get_available_account('img2video')
             if not available_account:
                 return {'success': False, 'error': '没有可用的即梦账号或账号使用次数已达上限', 'account_id': None}
             
@@ -414,13 +428,19 @@ class JimengImg2VideoTaskManager:
             
             # 使用图生视频执行器
             executor = JimengImage2VideoExecutor(headless=headless)
+            executor.set_checkpoint_callback(
+                lambda phase, **data: task.save_checkpoint(phase, account_id=available_account.id, **data)
+            )
+            executor.set_timing_callback(lambda spans: save_task_spans(task, spans))
+            executor.bind_account(available_account.id)
             result = await executor.run(
                 image_path=task.image_path,
                 prompt=task.prompt,
                 second=task.second,
                 username=available_account.account,
                 password=available_account.password,
-                cookies=available_account.cookies
+                cookies=available_account.cookies,
+                resume_task_id=resume_task_id
             )
             
             if result.code == 200 and result.data:
@@ -474,24 +494,9 @@ class JimengImg2VideoTaskManager:
             return None
     
     async def update_account_cookies(self, account_id: int, cookies: str):
-        """更新账号的cookies"""
-        try:
-            # 确保在数据库事务中执行
-            with database.atomic():
-                account = JimengAccount.get_by_id(account_id)
-                old_cookies = account.cookies
-                account.cookies = cookies
-                account.updated_at = datetime.now()
-                account.save()
-                
-                logger.info(f"更新账号cookies成功，账号ID: {account_id}, 旧cookies长度: {len(old_cookies) if old_cookies else 0}, 新cookies长度: {len(cookies)}")
-            
-        except JimengAccount.DoesNotExist:
-            logger.error(f"更新账号cookies失败: 账号不存在，ID: {account_id}")
-            raise
-        except Exception as e:
-            logger.error(f"更新账号cookies失败，账号ID: {account_id}, 错误: {str(e)}")
-            raise
+        """更新账号的cookies，交给回写缓冲合并后批量写入"""
+        if cookie_write_buffer.submit(account_id, cookies):
+            logger.debug(f"账号cookies已加入回写缓冲，账号ID: {account_id}")
     
     async def get_account_by_id(self, account_id: int) -> Optional[Dict[str, Any]]:
         """根据ID获取账号信息"""
@@ -513,6 +518,20 @@ class JimengImg2VideoTaskManager:
             logger.error(f"获取账号信息失败: {str(e)}")
             return None
     
+    def _get_resume_account(self, task):
+        """
+        获取可恢复任务的原账号
+        
+        返回值:
+            (JimengAccount, 远端任务ID)，任务不可恢复时返回 (None, None)
+        """
+        if not task.can_resume() or not task.account_id:
+            return None, None
+        account = JimengAccount.get_or_none(JimengAccount.id == task.account_id)
+        if not account:
+            return None, None
+        return account, task.task_id
+    
     def _get_available_account(self, task_type='img2video'):
         """
         获取可用的即梦账号
@@ -531,10 +550,10 @@ class JimengImg2VideoTaskManager:
             from datetime import date
             today = date.today()
             
-            # 查询所有账号
-            accounts = list(JimengAccount.select())
+            # 查询登录态可用的账号，登录态失效的账号等待后台刷新
+            accounts = list(JimengAccount.select_ready())
             if not accounts:
-                logger.error("没有配置的即梦账号")
+                logger.error("没有登录态可用的即梦账号")
                 return None
             
             # 根据任务类型设置每日限制
@@ -830,7 +849,7 @@ class JimengImg2VideoTaskManager:
     def get_status(self) -> Dict:
         """获取即梦图生视频任务管理器状态"""
         with self._lock:
-            max_threads = get_automation_max_threads()
+            max_threads = worker_slots.size or get_automation_max_threads()
             active_threads = len([f for f in self.active_futures.values() if not f.done()])
             
             return {
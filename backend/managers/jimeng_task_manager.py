@@ -12,10 +12,32 @@ from typing import Dict, List, Optional
 from enum import Enum
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from peewee import fn
+
 from backend.models.models import JimengText2ImgTask, JimengAccount
 from backend.utils.jimeng_text2img import JimengText2ImageExecutor
-from backend.utils.config_util import get_automation_max_threads, get_hide_window
-from backend.config.settings import TASK_PROCESSOR_INTERVAL, TASK_PROCESSOR_ERROR_WAIT
+from backend.utils.base_task_executor import ErrorCode
+from backend.utils.config_util import (get_automation_max_threads, get_hide_window, get_jimeng_http_engine_enabled,
+                                       get_jimeng_session_batching_enabled)
+from backend.core.startup import wait_for_database_ready
+from backend.config.settings import (TASK_PROCESSOR_INTERVAL, TASK_PROCESSOR_ERROR_WAIT, JIMENG_SESSION_BATCH_MAX,
+                                     JIMENG_SESSION_MAX_IN_FLIGHT)
+from backend.core.logger import get_logger
+from backend.core.metrics import observe_task_dispatch
+from backend.core.worker_slots import worker_slots, get_slot_details
+from backend.utils.task_timing_util import save_task_spans
+from backend.core.cookie_writeback import cookie_write_buffer
+from backend.core.fair_scheduler import fair_scheduler
+from backend.utils.task_priority_util import is_urgent
+
+logger = get_logger(__name__)
+
+# 每个账号每天各类型任务的次数上限
+DAILY_LIMITS = {
+    'text2img': 10,      # 图片生成每天10次
+    'img2video': 2,      # 视频生成每天2次
+    'digital_human': 1   # 数字人生成每天1次
+}
 
 def run_async_safe(coro):
     """安全地运行异步协程，处理事件循环冲突"""
@@ -77,22 +99,23 @@ class JimengTaskManager:
         self._lock = threading.Lock()
         self.global_executor = None  # 全局线程池引用
         self.active_futures = {}  # 活跃的Future对象
+        self.reserved_quota = {}  # 账号ID -> 批量执行中预留的今日次数
     
     def set_global_executor(self, executor):
         """设置全局线程池"""
         self.global_executor = executor
-        print(f"{self.platform_name}已设置全局线程池")
+        logger.info(f"{self.platform_name}已设置全局线程池")
     
     def start(self) -> bool:
         """启动即梦任务管理器"""
         if self.status == JimengTaskManagerStatus.RUNNING:
-            print(f"{self.platform_name}任务管理器已经在运行中")
+            logger.warning(f"{self.platform_name}任务管理器已经在运行中")
             return False
             
-        print(f"启动{self.platform_name}任务管理器...")
+        logger.info(f"启动{self.platform_name}任务管理器...")
         
         if not self.global_executor:
-            print(f"{self.platform_name}任务管理器启动失败：未设置全局线程池")
+            logger.error(f"{self.platform_name}任务管理器启动失败：未设置全局线程池")
             return False
         
         self.stop_event.clear()
@@ -103,16 +126,16 @@ class JimengTaskManager:
         self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
         self.worker_thread.start()
         
-        print(f"{self.platform_name}任务管理器启动成功")
+        logger.info(f"{self.platform_name}任务管理器启动成功")
         return True
     
     def stop(self) -> bool:
         """停止即梦任务管理器"""
         if self.status == JimengTaskManagerStatus.STOPPED:
-            print(f"{self.platform_name}任务管理器已经停止")
+            logger.warning(f"{self.platform_name}任务管理器已经停止")
             return False
             
-        print(f"正在停止{self.platform_name}任务管理器...")
+        logger.info(f"正在停止{self.platform_name}任务管理器...")
         self.status = JimengTaskManagerStatus.STOPPED
         self.stop_event.set()
         
@@ -127,14 +150,14 @@ class JimengTaskManager:
         if self.worker_thread and self.worker_thread.is_alive():
             self.worker_thread.join(timeout=10)
             
-        print(f"{self.platform_name}任务管理器已停止")
+        logger.info(f"{self.platform_name}任务管理器已停止")
         return True
     
     def pause(self) -> bool:
         """暂停即梦任务管理器"""
         if self.status == JimengTaskManagerStatus.RUNNING:
             self.status = JimengTaskManagerStatus.PAUSED
-            print(f"任务管理器已暂停")
+            logger.info(f"任务管理器已暂停")
             return True
         return False
     
@@ -142,7 +165,7 @@ class JimengTaskManager:
         """恢复即梦任务管理器"""
         if self.status == JimengTaskManagerStatus.PAUSED:
             self.status = JimengTaskManagerStatus.RUNNING
-            print(f"任务管理器已恢复")
+            logger.info(f"任务管理器已恢复")
             return True
         return False
     
@@ -177,7 +200,7 @@ class JimengTaskManager:
                 'total': pending_count + processing_count + completed_count + failed_count
             }
         except Exception as e:
-            print(f"获取{self.platform_name}汇总失败: {str(e)}")
+            logger.error(f"获取{self.platform_name}汇总失败: {str(e)}")
             return {
                 'platform': self.platform_name,
                 'pending': 0, 'processing': 0, 'completed': 0, 'failed': 0, 'total': 0
@@ -186,8 +209,8 @@ class JimengTaskManager:
     def get_status(self) -> Dict:
         """获取即梦任务管理器状态"""
         with self._lock:
-            max_threads = get_automation_max_threads()
-            active_threads = len([f for f in self.active_futures.values() if not f.done()])
+            max_threads = worker_slots.size or get_automation_max_threads()
+            active_threads = len({f for f in self.active_futures.values() if not f.done()})
             
             return {
                 'platform': self.platform_name,
@@ -241,17 +264,18 @@ class JimengTaskManager:
                 }
             }
         except Exception as e:
-            print(f"获取{self.platform_name}详细任务失败: {str(e)}")
+            logger.error(f"获取{self.platform_name}详细任务失败: {str(e)}")
             return {'platform': self.platform_name, 'tasks': [], 'pagination': {}}
     
     def _worker_loop(self):
         """工作线程主循环"""
-        print(f"{self.platform_name}任务扫描线程已启动")
+        logger.info(f"{self.platform_name}任务扫描线程已启动")
         
-        # 初始延迟，等待数据库操作完全稳定
-        print(f"{self.platform_name}任务扫描线程等待数据库稳定...")
-        time.sleep(5.0)
-        print(f"{self.platform_name}开始扫描任务...")
+        # 等待数据库初始化和生成中任务重置完成
+        logger.info(f"{self.platform_name}任务扫描线程等待数据库就绪...")
+        if not wait_for_database_ready(self.platform_name):
+            logger.warning(f"{self.platform_name}等待数据库就绪超时，继续扫描")
+        logger.info(f"{self.platform_name}开始扫描任务...")
         
         while not self.stop_event.is_set():
             try:
@@ -273,55 +297,175 @@ class JimengTaskManager:
                 time.sleep(TASK_PROCESSOR_INTERVAL)
                 
             except Exception as e:
-                print(f"{self.platform_name}任务扫描异常: {str(e)}")
+                logger.error(f"{self.platform_name}任务扫描异常: {str(e)}")
                 self.stats['error_count'] += 1
                 self.status = JimengTaskManagerStatus.ERROR
                 time.sleep(TASK_PROCESSOR_ERROR_WAIT)
                 self.status = JimengTaskManagerStatus.RUNNING  # 自动恢复
         
-        print(f"{self.platform_name}任务扫描线程已结束")
+        logger.info(f"{self.platform_name}任务扫描线程已结束")
     
     def _scan_and_process_tasks(self):
-        """扫描并处理待处理任务"""
+        """扫描并处理待处理任务，可提交的数量由跨平台公平调度器分配"""
         try:
             if not self.global_executor or self.global_executor._shutdown:
                 return
-                
-            # 获取配置的最大线程数
-            max_threads = get_automation_max_threads()
-            
-            # 获取当前活跃的任务数量
-            with self._lock:
-                active_count = len([f for f in self.active_futures.values() if not f.done()])
             
-            if active_count >= max_threads:
-                return
+            # 会话批量模式只用于浏览器引擎，HTTP直连引擎没有登录和页面开销
+            batching = get_jimeng_session_batching_enabled() and not get_jimeng_http_engine_enabled()
             
-            # 计算可以启动的新任务数量
-            available_slots = max_threads - active_count
+            pending_query = self._pending_query()
+            queued = pending_query.count()
+            # 批量执行时一组任务占用一个线程
+            batch_size = JIMENG_SESSION_BATCH_MAX if batching else 1
+            demand = -(-queued // batch_size)
             
-            # 查找排队中的任务 - 只扫描非空任务
-            pending_tasks = JimengText2ImgTask.select().where(
-                JimengText2ImgTask.status == 0
-            ).order_by(JimengText2ImgTask.create_at).limit(available_slots)
+            # 按有效优先级取排队任务，最多取满线程池能执行的数量
+            pending_tasks = JimengText2ImgTask.select_for_dispatch(
+                pending_query, fair_scheduler.capacity() * batch_size) if queued else []
             
-            for task in pending_tasks:
-                # 检查是否已经在处理中
-                if task.id in self.processing_tasks:
-                    continue
+            with fair_scheduler.grant('jimeng_text2img', demand, is_urgent(pending_tasks)) as grant:
+                if grant.slots <= 0:
+                    return
+                
+                if batching:
+                    self._scan_and_process_batches(pending_tasks[:grant.slots * batch_size], grant)
+                    return
                 
-                # 提交任务到线程池
-                self._submit_task_to_pool(task)
+                for task in pending_tasks[:grant.slots]:
+                    # 提交任务到线程池
+                    future = self._submit_task_to_pool(task)
+                    if future:
+                        grant.bind(future)
                 
         except Exception as e:
-            print(f"{self.platform_name}扫描任务失败: {str(e)}")
+            logger.error(f"{self.platform_name}扫描任务失败: {str(e)}")
+    
+    def _pending_query(self):
+        """排队中且尚未提交到线程池的任务"""
+        with self._lock:
+            processing = list(self.processing_tasks.keys())
+        query = JimengText2ImgTask.select().where(JimengText2ImgTask.status == 0)
+        if processing:
+            query = query.where(JimengText2ImgTask.id.not_in(processing))
+        return query
+    
+    def _scan_and_process_batches(self, pending_tasks: List, grant):
+        """
+        会话批量模式：按账号把排队中的任务分组，每组在一个浏览器会话中执行
+        
+        同一页面中连续提交多个任务（最多同时进行 JIMENG_SESSION_MAX_IN_FLIGHT 个），
+        结果按远端任务ID对应回各自的任务。每个线程执行一组，组的大小不超过账号今日剩余次数和 JIMENG_SESSION_BATCH_MAX。
+        已提交到远端的任务需要沿用原账号恢复轮询，仍按单个任务执行。
+        """
+        queue = []
+        for task in pending_tasks:
+            if task.can_resume() and task.account_id:
+                if grant.remaining > 0:
+                    future = self._submit_task_to_pool(task)
+                    if future:
+                        grant.bind(future)
+            else:
+                queue.append(task)
+        
+        while queue and grant.remaining > 0:
+            account, size = self._reserve_batch_account(min(len(queue), JIMENG_SESSION_BATCH_MAX))
+            if not account:
+                # 没有剩余次数的账号，按单个任务处理（与非批量模式的结果一致）
+                for task in queue[:grant.remaining]:
+                    future = self._submit_task_to_pool(task)
+                    if future:
+                        grant.bind(future)
+                return
+            batch, queue = queue[:size], queue[size:]
+            future = self._submit_batch_to_pool(batch, account)
+            if future:
+                grant.bind(future)
+    
+    def _reserve_batch_account(self, max_size: int):
+        """
+        选择今日文生图剩余次数最多的账号，并为一组任务预留次数
+        
+        返回值:
+            (JimengAccount, 预留次数)，没有可用账号时返回 (None, 0)
+        """
+        from backend.models.models import JimengTaskRecord
+        from datetime import date
+        
+        accounts = list(JimengAccount.select_ready())
+        if not accounts:
+            return None, 0
+        usage = dict(JimengTaskRecord.select(JimengTaskRecord.account_id, fn.COUNT(JimengTaskRecord.id)).where(
+            (JimengTaskRecord.task_type == 1) &
+            (JimengTaskRecord.created_at >= date.today())
+        ).group_by(JimengTaskRecord.account_id).tuples())
+        
+        with self._lock:
+            remaining = {
+                account.id: DAILY_LIMITS['text2img'] - usage.get(account.id, 0) - self.reserved_quota.get(account.id, 0)
+                for account in accounts
+            }
+            best = max(remaining.values())
+            if best <= 0:
+                return None, 0
+            # 剩余次数相同的账号中随机选择
+            account = random.choice([account for account in accounts if remaining[account.id] == best])
+            size = min(best, max_size)
+            self.reserved_quota[account.id] = self.reserved_quota.get(account.id, 0) + size
+        logger.debug(f"为 {size} 个任务选择账号: {account.account} (今日文生图剩余: {best})")
+        return account, size
+    
+    def _release_quota(self, account_id: int, count: int = 1):
+        """释放为批量任务预留的账号次数"""
+        with self._lock:
+            left = self.reserved_quota.get(account_id, 0) - count
+            if left > 0:
+                self.reserved_quota[account_id] = left
+            else:
+                self.reserved_quota.pop(account_id, None)
+    
+    def _submit_batch_to_pool(self, tasks: List, account):
+        """提交一组任务到全局线程池，在同一个浏览器会话中执行"""
+        try:
+            from backend.core.global_task_manager import global_task_manager
+            future = global_task_manager.submit_task(
+                self.platform_name,
+                self._process_task_batch,
+                tasks,
+                account,
+                task_id=tasks[0].id,
+                task_type='文生图',
+                prompt=f"[{len(tasks)}个任务] {tasks[0].prompt}"
+            )
+        except Exception as e:
+            self._release_quota(account.id, len(tasks))
+            logger.error(f"提交{self.platform_name}批量任务到线程池失败，错误: {str(e)}")
+            return None
+        
+        with self._lock:
+            for task in tasks:
+                self.processing_tasks[task.id] = {
+                    'future': future,
+                    'start_time': datetime.now(),
+                    'status': 'starting',
+                    'task': task
+                }
+                self.active_futures[task.id] = future
+        
+        def on_done(f):
+            for task in tasks:
+                self._on_task_completed(task.id, f)
+        future.add_done_callback(on_done)
+        
+        logger.debug(f"提交{self.platform_name}批量任务到线程池，任务ID: {[task.id for task in tasks]}，账号: {account.account}")
+        return future
     
     def _submit_task_to_pool(self, task):
-        """提交任务到全局线程池"""
+        """提交任务到全局线程池，返回 Future，提交失败时返回 None"""
         try:
             if not self.global_executor:
-                print(f"无法提交任务：全局线程池未设置")
-                return
+                logger.error(f"无法提交任务：全局线程池未设置")
+                return None
                 
             # 通过全局任务管理器提交任务，以便正确跟踪线程状态
             from backend.core.global_task_manager import global_task_manager
@@ -347,10 +491,12 @@ class JimengTaskManager:
             # 添加完成回调
             future.add_done_callback(lambda f: self._on_task_completed(task.id, f))
             
-            print(f"提交{self.platform_name}任务到线程池，任务ID: {task.id}")
+            logger.debug(f"提交{self.platform_name}任务到线程池，任务ID: {task.id}")
+            return future
             
         except Exception as e:
-            print(f"提交{self.platform_name}任务到线程池失败，错误: {str(e)}")
+            logger.error(f"提交{self.platform_name}任务到线程池失败，错误: {str(e)}")
+            return None
     
     def _on_task_completed(self, task_id, future):
         """任务完成回调"""
@@ -364,10 +510,10 @@ class JimengTaskManager:
                 if task_id in self.active_futures:
                     del self.active_futures[task_id]
                     
-            print(f"{self.platform_name}任务执行完成，任务ID: {task_id}")
+            logger.info(f"{self.platform_name}任务执行完成，任务ID: {task_id}")
             
         except Exception as e:
-            print(f"处理{self.platform_name}任务完成回调失败: {str(e)}")
+            logger.error(f"处理{self.platform_name}任务完成回调失败: {str(e)}")
     
     def _process_single_task(self, task):
         """处理单个任务"""
@@ -377,7 +523,9 @@ class JimengTaskManager:
                 if task.id in self.processing_tasks:
                     self.processing_tasks[task.id]['status'] = 'processing'
             
-            print(f"开始处理{self.platform_name}任务，ID: {task.id}")
+            logger.info(f"开始处理{self.platform_name}任务，ID: {task.id}")
+            
+            observe_task_dispatch(task)
             
             # 更新任务状态为处理中
             task.status = 1
@@ -386,94 +534,10 @@ class JimengTaskManager:
             
             # 执行具体的任务处理逻辑 - 这里需要用户自己实现
             result = run_async_safe(self._execute_text2img_task(task))
-            
-            if result['success']:
-                # 任务成功 - 账号使用记录已在_execute_text2img_task中处理
-                if 'images' in result and result['images']:
-                    task.set_images(result['images'])
-                
-                if 'account_id' in result:
-                    task.account_id = result['account_id']
-                    
-                    # 更新账号cookies
-                    if 'cookies' in result and result['cookies']:
-                        try:
-                            from backend.core.database import db
-                            with db.atomic():
-                                account = JimengAccount.get_by_id(result['account_id'])
-                                old_cookies = account.cookies
-                                account.cookies = result['cookies']
-                                account.updated_at = datetime.now()
-                                account.save()
-                                print(f"已更新账号 {account.account} 的cookies，旧cookies长度: {len(old_cookies) if old_cookies else 0}, 新cookies长度: {len(result['cookies'])}")
-                        except Exception as e:
-                            print(f"更新账号cookies失败: {str(e)}")
-                
-                task.status = 2  # 已完成
-                task.update_at = datetime.now()
-                task.save()
-                
-                print(f"{self.platform_name}任务完成，ID: {task.id}")
-                with self._lock:
-                    self.stats['successful'] += 1
-            else:
-                # 任务失败，但仍要更新cookies - 账号使用记录已在_execute_text2img_task中处理
-                if 'account_id' in result:
-                    # 更新账号cookies（即使失败也要更新）
-                    if 'cookies' in result and result['cookies']:
-                        try:
-                            from backend.core.database import db
-                            with db.atomic():
-                                account = JimengAccount.get_by_id(result['account_id'])
-                                old_cookies = account.cookies
-                                account.cookies = result['cookies']
-                                account.updated_at = datetime.now()
-                                account.save()
-                                print(f"已更新账号 {account.account} 的cookies，旧cookies长度: {len(old_cookies) if old_cookies else 0}, 新cookies长度: {len(result['cookies'])}")
-                        except Exception as e:
-                            print(f"更新账号cookies失败: {str(e)}")
-                
-                # 检查是否需要重试（600/900错误码）
-                error_code = result.get('code', 0)
-                if error_code in [600, 900]:
-                    # 设置失败状态和原因
-                    task.set_failure(error_code, result.get('error', '未知错误'))
-                    
-                    # 检查是否可以重试
-                    if task.can_retry():
-                        # 重试任务，重新进入排队状态
-                        if task.retry_task():
-                            print(f"{self.platform_name}任务重试，ID: {task.id}，重试次数: {task.retry_count}/{task.max_retry}")
-                            # 不增加失败计数，因为任务重新排队了
-                        else:
-                            print(f"{self.platform_name}任务重试失败，ID: {task.id}，已达最大重试次数")
-                            with self._lock:
-                                self.stats['failed'] += 1
-                    else:
-                        print(f"{self.platform_name}任务不可重试，ID: {task.id}，原因: {result.get('error', '未知错误')}")
-                        with self._lock:
-                            self.stats['failed'] += 1
-                elif error_code == 800:
-                    # 800错误码：生成失败，账号使用记录已在执行方法中处理
-                    task.set_failure(error_code, result.get('error', '未知错误'))
-                    print(f"{self.platform_name}任务生成失败，ID: {task.id}，原因: {result.get('error', '未知错误')}")
-                    with self._lock:
-                        self.stats['failed'] += 1
-                else:
-                    # 非600/900/800错误，直接设置失败
-                    task.status = 3  # 失败
-                    task.update_at = datetime.now()
-                    task.save()
-                    
-                    print(f"{self.platform_name}任务失败，ID: {task.id}，原因: {result.get('error', '未知错误')}")
-                    with self._lock:
-                        self.stats['failed'] += 1
-            
-            with self._lock:
-                self.stats['total_processed'] += 1
+            self._finish_task(task, result)
             
         except Exception as e:
-            print(f"处理{self.platform_name}任务异常，ID: {task.id}，错误: {str(e)}")
+            logger.error(f"处理{self.platform_name}任务异常，ID: {task.id}，错误: {str(e)}")
             try:
                 # 异常情况下也更新账号使用情况（如果有账号信息）
                 try:
@@ -492,6 +556,124 @@ class JimengTaskManager:
             except:
                 pass
     
+    def _process_task_batch(self, tasks: List, account):
+        """在一个浏览器会话中处理同一账号的一组任务"""
+        pending = {task.id: task for task in tasks}
+        try:
+            logger.info(f"开始批量处理{self.platform_name}任务，ID: {list(pending)}，账号: {account.account}")
+            for task in tasks:
+                with self._lock:
+                    if task.id in self.processing_tasks:
+                        self.processing_tasks[task.id]['status'] = 'processing'
+                observe_task_dispatch(task)
+                task.status = 1
+                task.update_at = datetime.now()
+                task.save()
+            
+            run_async_safe(self._execute_text2img_batch(tasks, account, pending))
+        except Exception as e:
+            logger.error(f"批量处理{self.platform_name}任务异常，ID: {list(pending)}，错误: {str(e)}")
+        finally:
+            # 未得到结果的任务按页面交互失败处理，可重试并从断点恢复
+            for task in list(pending.values()):
+                try:
+                    self._finish_task(task, {'success': False, 'error': '批量执行异常，未得到结果',
+                                            'code': ErrorCode.WEB_INTERACTION_FAILED.value})
+                except Exception as e:
+                    logger.error(f"更新{self.platform_name}任务状态失败，ID: {task.id}，错误: {str(e)}")
+            self._release_quota(account.id, len(pending))
+    
+    async def _execute_text2img_batch(self, tasks: List, account, pending: Dict):
+        """执行一组文生图任务，每个任务得到结果后立即更新，完成的任务从 pending 中移除"""
+        executor = JimengText2ImageExecutor(headless=get_hide_window())
+        executor.bind_account(account.id)
+        items = [{
+            'prompt': task.prompt,
+            'model': task.model,
+            'aspect_ratio': task.ratio,  # 使用ratio字段作为aspect_ratio
+            'quality': task.quality,
+            'checkpoint_callback': lambda phase, task=task, **data: task.save_checkpoint(phase, account_id=account.id, **data),
+            'timing_callback': lambda spans, task=task: save_task_spans(task, spans)
+        } for task in tasks]
+        
+        async def on_result(index, result):
+            task = tasks[index]
+            pending.pop(task.id, None)
+            self._release_quota(account.id)
+            self._finish_task(task, await self._to_result_dict(account.id, result))
+        
+        await executor.execute_batch(items, account.account, account.password, account.cookies, on_result,
+                                     max_in_flight=JIMENG_SESSION_MAX_IN_FLIGHT)
+    
+    def _finish_task(self, task, result: Dict):
+        """根据执行结果更新任务状态、账号cookies和统计"""
+        if result['success']:
+            # 任务成功 - 账号使用记录已在_execute_text2img_task中处理
+            if 'images' in result and result['images']:
+                task.set_images(result['images'])
+            
+            if 'account_id' in result:
+                task.account_id = result['account_id']
+                
+                # 更新账号cookies
+                if 'cookies' in result and result['cookies']:
+                    cookie_write_buffer.submit(result['account_id'], result['cookies'])
+            
+            task.status = 2  # 已完成
+            task.phase = None  # 任务结束，清除断点
+            task.update_at = datetime.now()
+            task.save()
+            
+            logger.info(f"{self.platform_name}任务完成，ID: {task.id}")
+            with self._lock:
+                self.stats['successful'] += 1
+        else:
+            # 任务失败，但仍要更新cookies - 账号使用记录已在_execute_text2img_task中处理
+            if 'account_id' in result:
+                # 更新账号cookies（即使失败也要更新）
+                if 'cookies' in result and result['cookies']:
+                    cookie_write_buffer.submit(result['account_id'], result['cookies'])
+            
+            # 检查是否需要重试（600/900错误码）
+            error_code = result.get('code', 0)
+            if error_code in [600, 900]:
+                # 设置失败状态和原因
+                task.set_failure(error_code, result.get('error', '未知错误'))
+                
+                # 检查是否可以重试
+                if task.can_retry():
+                    # 重试任务，重新进入排队状态
+                    if task.retry_task():
+                        logger.info(f"{self.platform_name}任务重试，ID: {task.id}，重试次数: {task.retry_count}/{task.max_retry}")
+                        # 不增加失败计数，因为任务重新排队了
+                    else:
+                        logger.error(f"{self.platform_name}任务重试失败，ID: {task.id}，已达最大重试次数")
+                        with self._lock:
+                            self.stats['failed'] += 1
+                else:
+                    logger.warning(f"{self.platform_name}任务不可重试，ID: {task.id}，原因: {result.get('error', '未知错误')}")
+                    with self._lock:
+                        self.stats['failed'] += 1
+            elif error_code == 800:
+                # 800错误码：生成失败，账号使用记录已在执行方法中处理
+                task.set_failure(error_code, result.get('error', '未知错误'))
+                logger.error(f"{self.platform_name}任务生成失败，ID: {task.id}，原因: {result.get('error', '未知错误')}")
+                with self._lock:
+                    self.stats['failed'] += 1
+            else:
+                # 非600/900/800错误，直接设置失败
+                task.status = 3  # 失败
+                task.update_at = datetime.now()
+                task.save()
+                
+                logger.error(f"{self.platform_name}任务失败，ID: {task.id}，原因: {result.get('error', '未知错误')}")
+                with self._lock:
+                    self.stats['failed'] += 1
+        
+        with self._lock:
+            self.stats['total_processed'] += 1
+        
+    
     async def _execute_text2img_task(self, task) -> Dict:
         """
         执行即梦文生图任务的具体逻辑
@@ -503,23 +685,33 @@ class JimengTaskManager:
             Dict: 执行结果
         """
         
-        print(f"开始执行文生图任务，任务ID: {task.id}")
-        print(f"任务参数: prompt='{task.prompt}', model='{task.model}', ratio='{task.ratio}', quality='{task.quality}'")
+        logger.info(f"开始执行文生图任务，任务ID: {task.id}")
+        logger.debug(f"任务参数: prompt='{task.prompt}', model='{task.model}', ratio='{task.ratio}', quality='{task.quality}'")
         
         client = None
         try:
-            # 获取可用账号
-            available_account = self._get_available_account('text2img')
+            # 已提交到远端的任务沿用原账号，直接轮询结果
+            available_account, resume_task_id = self._get_resume_account(task)
+            if resume_task_id:
+                logger.info(f"任务 {task.id} 已提交过，恢复轮询远端任务: {resume_task_id}")
+            else:
+                # 获取可用账号
+                available_account = self._get_available_account('text2img')
             if not available_account:
                 return {'success': False, 'error': '没有可用的即梦账号或账号使用次数已达上限', 'account_id': None}
             
-            print(f"使用账号: {available_account.account}")
+            logger.debug(f"使用账号: {available_account.account}")
             
             # 获取浏览器隐藏配置
             headless = get_hide_window()
             
             # 使用新的执行器
             executor = JimengText2ImageExecutor(headless=headless)
+            executor.set_checkpoint_callback(
+                lambda phase, **data: task.save_checkpoint(phase, account_id=available_account.id, **data)
+            )
+            executor.set_timing_callback(lambda spans: save_task_spans(task, spans))
+            executor.bind_account(available_account.id)
             result = await executor.run(
                 prompt=task.prompt,
                 username=available_account.account,
@@ -527,39 +719,14 @@ class JimengTaskManager:
                 model=task.model,
                 aspect_ratio=task.ratio,  # 使用ratio字段作为aspect_ratio
                 quality=task.quality,
-                cookies=available_account.cookies
+                cookies=available_account.cookies,
+                resume_task_id=resume_task_id
             )
             
-            if result.code == 200 and result.data and len(result.data) > 0:
-                # 更新账号使用次数
-                await self.add_task_record(available_account.id, 1)  # 1=文生图
-                
-                return {
-                    'success': True, 
-                    'images': result.data,
-                    'account_id': available_account.id,
-                    'cookies': result.cookies
-                }
-            else:
-                error_msg = result.message or "即梦平台图片生成失败"
-                error_code = result.code
-                
-                # 如果是700（任务ID等待超时）或800（生成失败），需要更新账号使用记录
-                if error_code in [700, 800]:
-                    print(f"错误码 {error_code}，更新账号使用情况")
-                    await self.add_task_record(available_account.id, 1)  # 1=文生图
-                
-                return {
-                    'success': False, 
-                    'error': error_msg, 
-                    'account_id': available_account.id, 
-                    'should_create_empty_task': error_code in [700, 800], 
-                    'code': error_code,
-                    'cookies': result.cookies
-                }
+            return await self._to_result_dict(available_account.id, result)
                 
         except Exception as e:
-            print(f"即梦任务执行异常: {str(e)}")
+            logger.error(f"即梦任务执行异常: {str(e)}")
             return {'success': False, 'error': f'任务执行异常: {str(e)}'}
         finally:
             # 确保浏览器关闭
@@ -567,9 +734,53 @@ class JimengTaskManager:
                 try:
                     await client.close()
                 except Exception as e:
-                    print(f"关闭浏览器异常: {str(e)}")
+                    logger.error(f"关闭浏览器异常: {str(e)}")
                     pass
     
+    async def _to_result_dict(self, account_id: int, result) -> Dict:
+        """把执行器结果转换为 _finish_task 使用的结果，并记录账号使用次数"""
+        if result.code == 200 and result.data and len(result.data) > 0:
+            # 更新账号使用次数
+            await self.add_task_record(account_id, 1)  # 1=文生图
+            
+            return {
+                'success': True, 
+                'images': result.data,
+                'account_id': account_id,
+                'cookies': result.cookies
+            }
+        
+        error_msg = result.message or "即梦平台图片生成失败"
+        error_code = result.code
+        
+        # 如果是700（任务ID等待超时）或800（生成失败），需要更新账号使用记录
+        if error_code in [700, 800]:
+            logger.warning(f"错误码 {error_code}，更新账号使用情况")
+            await self.add_task_record(account_id, 1)  # 1=文生图
+        
+        return {
+            'success': False, 
+            'error': error_msg, 
+            'account_id': account_id, 
+            'should_create_empty_task': error_code in [700, 800], 
+            'code': error_code,
+            'cookies': result.cookies
+        }
+    
+    def _get_resume_account(self, task):
+        """
+        获取可恢复任务的原账号
+        
+        返回值:
+            (JimengAccount, 远端任务ID)，任务不可恢复时返回 (None, None)
+        """
+        if not task.can_resume() or not task.account_id:
+            return None, None
+        account = JimengAccount.get_or_none(JimengAccount.id == task.account_id)
+        if not account:
+            return None, None
+        return account, task.task_id
+    
     def _get_available_account(self, task_type='text2img'):
         """
         获取可用的即梦账号
@@ -587,20 +798,14 @@ class JimengTaskManager:
             from datetime import date
             today = date.today()
             
-            # 查询所有账号
-            accounts = list(JimengAccount.select())
+            # 查询登录态可用的账号，登录态失效的账号等待后台刷新
+            accounts = list(JimengAccount.select_ready())
             if not accounts:
-                print("没有配置的即梦账号")
+                logger.warning("没有登录态可用的即梦账号")
                 return None
             
             # 根据任务类型设置每日限制
-            daily_limits = {
-                'text2img': 10,      # 图片生成每天10次
-                'img2video': 2,      # 视频生成每天1次
-                'digital_human': 1   # 数字人生成每天1次
-            }
-            
-            daily_limit = daily_limits.get(task_type, 10)
+            daily_limit = DAILY_LIMITS.get(task_type, 10)
             
             # 查找今日使用次数最少且未达上限的账号，在相同使用次数中随机选择
             available_accounts = []
@@ -626,7 +831,7 @@ class JimengTaskManager:
                     (JimengTaskRecord.created_at >= today)
                 ).count()
                 
-                print(f"账号 {account.account} 今日{task_type}已使用: {today_usage}/{daily_limit} 次")
+                logger.debug(f"账号 {account.account} 今日{task_type}已使用: {today_usage}/{daily_limit} 次")
                 
                 # 检查是否还有可用次数
                 if today_usage < daily_limit:
@@ -641,14 +846,14 @@ class JimengTaskManager:
             if available_accounts:
                 # 在使用次数最少的账号中随机选择
                 selected_account = random.choice(available_accounts)
-                print(f"随机选择账号: {selected_account.account} (今日{task_type}已使用: {min_usage}/{daily_limit})")
+                logger.debug(f"随机选择账号: {selected_account.account} (今日{task_type}已使用: {min_usage}/{daily_limit})")
                 return selected_account
             else:
-                print(f"所有账号今日{task_type}使用次数已达上限")
+                logger.warning(f"所有账号今日{task_type}使用次数已达上限")
                 return None
                 
         except Exception as e:
-            print(f"获取可用账号失败: {str(e)}")
+            logger.error(f"获取可用账号失败: {str(e)}")
             return None
     
 
@@ -662,7 +867,7 @@ class JimengTaskManager:
             task_type: 任务类型 ('text2img', 'img2video', 'digital_human')
         """
         try:
-            print(f"更新账号 {account_id} 的 {task_type} 使用记录")
+            logger.debug(f"更新账号 {account_id} 的 {task_type} 使用记录")
             
             # 添加即梦账号使用记录到数据库
             from backend.models.models import JimengTaskRecord
@@ -681,10 +886,10 @@ class JimengTaskManager:
                 updated_at=datetime.now()
             )
             
-            print(f"添加即梦账号使用记录成功，记录ID: {record.id}, 账号ID: {account_id}, 任务类型: {task_type}")
+            logger.debug(f"添加即梦账号使用记录成功，记录ID: {record.id}, 账号ID: {account_id}, 任务类型: {task_type}")
             
         except Exception as e:
-            print(f"更新账号使用记录失败: {str(e)}")
+            logger.error(f"更新账号使用记录失败: {str(e)}")
     
     async def add_task_record(self, account_id: int, task_type: int = 1, 
                             task_id: Optional[str] = None) -> Optional[int]:
@@ -698,11 +903,11 @@ class JimengTaskManager:
                 updated_at=datetime.now()
             )
             
-            print(f"添加任务记录成功，记录ID: {record.id}")
+            logger.debug(f"添加任务记录成功，记录ID: {record.id}")
             return record.id
             
         except Exception as e:
-            print(f"添加任务记录失败: {str(e)}")
+            logger.error(f"添加任务记录失败: {str(e)}")
             return None
     
 # 已删除_login_and_generate方法，现在直接使用text2image函数
@@ -730,66 +935,5 @@ class JimengTaskManager:
                     del self.active_futures[task_id]
     
     def get_thread_details(self) -> List[Dict]:
-        """获取线程详细信息，用于前端显示"""
-        max_threads = get_automation_max_threads()
-        threads = []
-        
-        with self._lock:
-            active_tasks = {
-                task_id: info for task_id, info in self.processing_tasks.items()
-                if info.get('status') == 'processing'
-            }
-            
-            # 生成线程信息
-            for i in range(1, max_threads + 1):
-                thread_info = {
-                    'id': i,
-                    'status': 'inactive',
-                    'task_id': None,
-                    'platform': self.platform_name,
-                    'task_type': None,
-                    'prompt': None,
-                    'progress': 0,
-                    'start_time': None
-                }
-                
-                # 如果有活跃任务，分配给线程
-                if active_tasks:
-                    task_id, task_info = active_tasks.popitem()
-                    task = task_info.get('task')
-                    
-                    if task:
-                        thread_info.update({
-                            'status': 'active',
-                            'task_id': task_id,
-                            'task_type': '文生图',
-                            'prompt': task.prompt,
-                            'progress': self._calculate_task_progress(task_info),
-                            'start_time': task_info.get('start_time')
-                        })
-                
-                threads.append(thread_info)
-                
-            # 如果还有未分配的任务，标记额外线程为空闲
-            idle_count = len([t for t in threads if t['status'] == 'inactive'])
-            if idle_count > 0 and len(self.active_futures) < max_threads:
-                # 将一些线程标记为空闲状态
-                for thread in threads:
-                    if thread['status'] == 'inactive' and idle_count > 0:
-                        thread['status'] = 'idle'
-                        idle_count -= 1
-                        if idle_count <= 0:
-                            break
-        
-        return threads
-    
-    def _calculate_task_progress(self, task_info) -> int:
-        """计算任务进度"""
-        if not task_info.get('start_time'):
-            return 0
-            
-        # 基于运行时间估算进度
-        elapsed = (datetime.now() - task_info['start_time']).total_seconds()
-        # 假设平均任务需要10秒，计算百分比
-        progress = min(int((elapsed / 10) * 100), 95)  # 最多95%，避免100%但未完成
-        return progress 
\ No newline at end of file
+        """获取本平台任务所在线程的详细信息，用于前端显示"""
+        return get_slot_details(self.platform_name) 
\ No newline at end of file
@@ -10,6 +10,17 @@ from datetime import datetime
 from backend.utils.config_util import get_hide_window
 from backend.models.models import QingyingImage2VideoTask, QingyingAccount
 from backend.utils.qingying_image2video import QingyingImage2VideoExecutor
+from backend.core.startup import wait_for_database_ready
+from backend.core.logger import get_logger
+from backend.core.metrics import observe_task_dispatch
+from backend.core.worker_slots import worker_slots
+from backend.utils.task_timing_util import save_task_spans
+from backend.utils.image_prepare_util import prefetch_queued_images
+from backend.core.fair_scheduler import fair_scheduler
+from backend.utils.task_priority_util import is_urgent
+from backend.config.settings import UPLOAD_PREPARE_LOOKAHEAD
+
+logger = get_logger(__name__)
 
 def run_async_safe(coro):
     """安全地运行异步协程，处理事件循环冲突"""
@@ -52,6 +63,7 @@ class QingyingImg2VideoTaskManager:
         self.worker_thread = None
         self.global_executor = None
         self.task_queue = []
+        self.queue_urgent = False  # 队首是否有紧急任务
         self.processing_tasks = set()
         # 账号并发控制：账号ID -> 当前处理任务数
         self.account_task_count = {}
@@ -59,7 +71,7 @@ class QingyingImg2VideoTaskManager:
     def start(self):
         """启动任务管理器"""
         if self.running:
-            print("清影图生视频任务管理器已在运行中")
+            logger.warning("清影图生视频任务管理器已在运行中")
             return False
             
         self.running = True
@@ -67,19 +79,19 @@ class QingyingImg2VideoTaskManager:
         self.reset_account_counters()
         self.worker_thread = threading.Thread(target=self._task_processor_loop, daemon=True)
         self.worker_thread.start()
-        print("清影图生视频任务管理器已启动")
+        logger.info("清影图生视频任务管理器已启动")
         return True
     
     def stop(self):
         """停止任务管理器"""
         if not self.running:
-            print("清影图生视频任务管理器已停止")
+            logger.info("清影图生视频任务管理器已停止")
             return False
             
         self.running = False
         if self.worker_thread and self.worker_thread.is_alive():
             self.worker_thread.join()
-        print("清影图生视频任务管理器已停止")
+        logger.info("清影图生视频任务管理器已停止")
         return True
     
     def set_global_executor(self, executor):
@@ -90,47 +102,56 @@ class QingyingImg2VideoTaskManager:
         """提交任务到队列"""
         if task_id not in self.task_queue and task_id not in self.processing_tasks:
             self.task_queue.append(task_id)
-            print(f"清影图生视频任务 {task_id} 已加入队列")
+            logger.debug(f"清影图生视频任务 {task_id} 已加入队列")
     
     def _task_processor_loop(self):
         """任务处理循环"""
-        # 初始延迟，等待数据库和其他组件初始化完成
-        time.sleep(5.0)
+        # 等待数据库初始化和生成中任务重置完成
+        if not wait_for_database_ready("清影图生视频"):
+            logger.warning("清影图生视频等待数据库就绪超时，继续扫描")
         
         while self.running:
             try:
                 # 扫描待处理任务
                 self._scan_pending_tasks()
                 
-                # 处理队列中的任务
-                if self.task_queue and self.global_executor:
-                    task_id = self.task_queue.pop(0)
-                    if task_id not in self.processing_tasks:
-                        self.processing_tasks.add(task_id)
-                        # 使用全局线程池处理任务
-                        future = self.global_executor.submit(self._process_task, task_id)
-                        future.add_done_callback(lambda f: self._on_task_complete(task_id, f))
+                # 处理队列中的任务，可提交的数量由跨平台公平调度器分配
+                if self.global_executor:
+                    with fair_scheduler.grant('qingying_img2video', len(self.task_queue), self.queue_urgent) as grant:
+                        while self.task_queue and grant.remaining > 0:
+                            task_id = self.task_queue.pop(0)
+                            if task_id in self.processing_tasks:
+                                continue
+                            self.processing_tasks.add(task_id)
+                            # 使用全局线程池处理任务
+                            future = self.global_executor.submit(self._process_task, task_id)
+                            future.add_done_callback(lambda f, task_id=task_id: self._on_task_complete(task_id, f))
+                            grant.bind(future)
                 
                 time.sleep(2)  # 每2秒检查一次
                 
             except Exception as e:
-                print(f"清影图生视频任务处理循环出错: {str(e)}")
+                logger.error(f"清影图生视频任务处理循环出错: {str(e)}")
                 time.sleep(5)
     
     def _scan_pending_tasks(self):
         """扫描数据库中的待处理任务"""
         try:
-            # 查找状态为0（排队中）的任务
-            pending_tasks = QingyingImage2VideoTask.select().where(
-                QingyingImage2VideoTask.status == 0
+            # 查找状态为0（排队中）的任务，队列按有效优先级重新排序
+            pending_tasks = QingyingImage2VideoTask.select_for_dispatch(
+                QingyingImage2VideoTask.select(QingyingImage2VideoTask.id, QingyingImage2VideoTask.priority,
+                                               QingyingImage2VideoTask.deadline)
+                .where(QingyingImage2VideoTask.status == 0)
             )
+            pending_tasks = [task for task in pending_tasks if task.id not in self.processing_tasks]
+            self.task_queue = [task.id for task in pending_tasks]
+            self.queue_urgent = is_urgent(pending_tasks)
             
-            for task in pending_tasks:
-                if task.id not in self.task_queue and task.id not in self.processing_tasks:
-                    self.task_queue.append(task.id)
+            # 提前预处理排队任务的图片
+            prefetch_queued_images(QingyingImage2VideoTask, 'qingying', UPLOAD_PREPARE_LOOKAHEAD)
                     
         except Exception as e:
-            print(f"扫描清影图生视频待处理任务失败: {str(e)}")
+            logger.error(f"扫描清影图生视频待处理任务失败: {str(e)}")
     
     def _process_task(self, task_id):
         """处理单个任务"""
@@ -138,18 +159,26 @@ class QingyingImg2VideoTaskManager:
         try:
             # 获取任务信息
             task = QingyingImage2VideoTask.get_by_id(task_id)
+            worker_slots.assign_task(task_id=task_id, platform='清影图生视频', task_type='图生视频', prompt=task.prompt)
+            
+            logger.info(f"开始处理清影图生视频任务: {task_id}")
             
-            print(f"开始处理清影图生视频任务: {task_id}")
+            observe_task_dispatch(task)
             
             # 更新任务状态为处理中
             task.status = 1
             task.update_at = datetime.now()
             task.save()
             
-            # 获取可用的清影账号
-            account = self._get_available_account()
+            # 已提交到远端的任务沿用原账号，直接轮询结果
+            account, resume_chat_id = self._get_resume_account(task)
+            if resume_chat_id:
+                logger.info(f"清影图生视频任务 {task_id}: 已提交过，恢复轮询 chat_id: {resume_chat_id}")
+            else:
+                # 获取可用的清影账号
+                account = self._get_available_account()
             if not account:
-                print(f"清影图生视频任务 {task_id}: 没有可用的账号")
+                logger.warning(f"清影图生视频任务 {task_id}: 没有可用的账号")
                 task.status = 0  # 排队中
                 task.update_at = datetime.now()
                 task.save()
@@ -162,12 +191,17 @@ class QingyingImg2VideoTaskManager:
             task.account_id = account.id
             task.save()
             
-            print(f"清影图生视频任务 {task_id}: 使用账号 {account.nickname}")
+            logger.debug(f"清影图生视频任务 {task_id}: 使用账号 {account.nickname}")
             headless = get_hide_window()
             
             try:
                 # 创建清影图生视频执行器
                 executor = QingyingImage2VideoExecutor(headless=headless)
+                executor.set_checkpoint_callback(
+                    lambda phase, **data: task.save_checkpoint(phase, account_id=account.id, **data)
+                )
+                executor.set_timing_callback(lambda spans: save_task_spans(task, spans))
+                executor.bind_account(account.id)
                 
                 # 执行任务
                 result = run_async_safe(executor.execute(
@@ -178,7 +212,8 @@ class QingyingImg2VideoTaskManager:
                     frame_rate=task.frame_rate,
                     resolution=task.resolution,
                     duration=task.duration,
-                    ai_audio=task.ai_audio
+                    ai_audio=task.ai_audio,
+                    resume_chat_id=resume_chat_id
                 ))
                 
                 # 处理结果
@@ -187,8 +222,9 @@ class QingyingImg2VideoTaskManager:
                     data = result.data or {}
                     task.video_url = data.get('video_url', '')
                     task.status = 2  # 已完成
-                    print(f"清影图生视频任务 {task_id}: 生成成功")
-                    print(f"视频URL: {task.video_url}")
+                    task.phase = None  # 任务结束，清除断点
+                    logger.info(f"清影图生视频任务 {task_id}: 生成成功")
+                    logger.info(f"视频URL: {task.video_url}")
                 else:
                     # 失败 - 检查是否需要重试
                     error_code = result.code
@@ -202,20 +238,20 @@ class QingyingImg2VideoTaskManager:
                         if task.can_retry():
                             # 重试任务，重新进入排队状态
                             if task.retry_task():
-                                print(f"清影图生视频任务 {task_id}: 重试，重试次数: {task.retry_count}/{task.max_retry}")
+                                logger.info(f"清影图生视频任务 {task_id}: 重试，重试次数: {task.retry_count}/{task.max_retry}")
                                 # 任务重新排队，不需要更新状态
                             else:
-                                print(f"清影图生视频任务 {task_id}: 重试失败，已达最大重试次数")
+                                logger.error(f"清影图生视频任务 {task_id}: 重试失败，已达最大重试次数")
                                 # task.retry_task()已经设置了失败状态
                         else:
-                            print(f"清影图生视频任务 {task_id}: 不可重试 - {error_message}")
+                            logger.warning(f"清影图生视频任务 {task_id}: 不可重试 - {error_message}")
                             # task.set_failure()已经设置了失败状态
                     else:
                         # 非600/900错误，直接设置失败
                         task.status = 3  # 失败
                         task.update_at = datetime.now()
                         task.save()
-                        print(f"清影图生视频任务 {task_id}: 生成失败 - {error_message}")
+                        logger.error(f"清影图生视频任务 {task_id}: 生成失败 - {error_message}")
                 
                 # 只有非重试情况才需要手动更新时间
                 if task.status != 0:  # 如果不是重新排队状态
@@ -223,7 +259,7 @@ class QingyingImg2VideoTaskManager:
                     task.save()
                 
             except Exception as process_error:
-                print(f"清影图生视频任务 {task_id} 处理过程出错: {str(process_error)}")
+                logger.error(f"清影图生视频任务 {task_id} 处理过程出错: {str(process_error)}")
                 # 异常情况通常是网络或系统错误，可以考虑重试
                 task.set_failure(900, f'处理异常: {str(process_error)}')
                 
@@ -231,18 +267,18 @@ class QingyingImg2VideoTaskManager:
                 if task.can_retry():
                     # 重试任务，重新进入排队状态
                     if task.retry_task():
-                        print(f"清影图生视频任务 {task_id}: 异常后重试，重试次数: {task.retry_count}/{task.max_retry}")
+                        logger.warning(f"清影图生视频任务 {task_id}: 异常后重试，重试次数: {task.retry_count}/{task.max_retry}")
                     else:
-                        print(f"清影图生视频任务 {task_id}: 异常后重试失败，已达最大重试次数")
+                        logger.error(f"清影图生视频任务 {task_id}: 异常后重试失败，已达最大重试次数")
                 else:
-                    print(f"清影图生视频任务 {task_id}: 异常后不可重试")
+                    logger.warning(f"清影图生视频任务 {task_id}: 异常后不可重试")
                 
                 raise  # 重新抛出异常，确保外层的finally块能执行
             
         except QingyingImage2VideoTask.DoesNotExist:
-            print(f"清影图生视频任务 {task_id} 不存在")
+            logger.warning(f"清影图生视频任务 {task_id} 不存在")
         except Exception as e:
-            print(f"处理清影图生视频任务 {task_id} 时出错: {str(e)}")
+            logger.error(f"处理清影图生视频任务 {task_id} 时出错: {str(e)}")
             try:
                 task = QingyingImage2VideoTask.get_by_id(task_id)
                 task.status = 3  # 失败
@@ -256,9 +292,24 @@ class QingyingImg2VideoTaskManager:
                 current_count = self.account_task_count.get(account_id, 0)
                 if current_count > 0:
                     self.account_task_count[account_id] = current_count - 1
-                    print(f"任务 {task_id} 完成，减少账号 {account_id} 任务计数，当前: {self.account_task_count[account_id]}")
+                    logger.debug(f"任务 {task_id} 完成，减少账号 {account_id} 任务计数，当前: {self.account_task_count[account_id]}")
                 else:
-                    print(f"警告: 账号 {account_id} 任务计数已为0，无法减少")
+                    logger.warning(f"警告: 账号 {account_id} 任务计数已为0，无法减少")
+    
+    def _get_resume_account(self, task):
+        """
+        获取可恢复任务的原账号，并占用该账号的并发计数
+        
+        返回值:
+            (QingyingAccount, chat_id)，任务不可恢复时返回 (None, None)
+        """
+        if not task.can_resume() or not task.account_id:
+            return None, None
+        account = QingyingAccount.get_or_none(QingyingAccount.id == task.account_id)
+        if not account:
+            return None, None
+        self.account_task_count[account.id] = self.account_task_count.get(account.id, 0) + 1
+        return account, task.task_id
     
     def _get_available_account(self):
         """获取可用的清影账号（支持并发，每个账号最多同时处理4个任务）"""
@@ -285,15 +336,15 @@ class QingyingImg2VideoTaskManager:
                     # 增加该账号的任务计数
                     self.account_task_count[selected_account.id] = self.account_task_count.get(selected_account.id, 0) + 1
                     
-                    print(f"选择账号 {selected_account.nickname}，当前并发数: {self.account_task_count[selected_account.id]}")
+                    logger.debug(f"选择账号 {selected_account.nickname}，当前并发数: {self.account_task_count[selected_account.id]}")
                     return selected_account
                 else:
-                    print("所有清影账号都已达到最大并发数（4个任务）")
+                    logger.warning("所有清影账号都已达到最大并发数（4个任务）")
             
             return None
             
         except Exception as e:
-            print(f"获取可用清影账号失败: {str(e)}")
+            logger.error(f"获取可用清影账号失败: {str(e)}")
             return None
     
     def _on_task_complete(self, task_id, future):
@@ -304,7 +355,7 @@ class QingyingImg2VideoTaskManager:
         # 这里不再重复减少，避免计数错误
         
         if future.exception():
-            print(f"清影图生视频任务 {task_id} 执行出错: {future.exception()}")
+            logger.error(f"清影图生视频任务 {task_id} 执行出错: {future.exception()}")
             try:
                 task = QingyingImage2VideoTask.get_by_id(task_id)
                 task.status = 3  # 失败
@@ -313,12 +364,12 @@ class QingyingImg2VideoTaskManager:
             except:
                 pass
         else:
-            print(f"清影图生视频任务 {task_id} 处理完成")
+            logger.info(f"清影图生视频任务 {task_id} 处理完成")
     
     def reset_account_counters(self):
         """重置账号任务计数器（用于修复计数不一致问题）"""
         try:
-            print("重置清影账号任务计数器...")
+            logger.info("重置清影账号任务计数器...")
             
             # 清空当前计数
             self.account_task_count.clear()
@@ -333,10 +384,10 @@ class QingyingImg2VideoTaskManager:
                 if task.account_id:
                     self.account_task_count[task.account_id] = self.account_task_count.get(task.account_id, 0) + 1
             
-            print(f"重置完成，当前账号任务计数: {self.account_task_count}")
+            logger.debug(f"重置完成，当前账号任务计数: {self.account_task_count}")
             
         except Exception as e:
-            print(f"重置账号任务计数器失败: {str(e)}")
+            logger.error(f"重置账号任务计数器失败: {str(e)}")
     
     def get_status(self):
         """获取管理器状态"""
@@ -1,17 +1,86 @@
 # -*- coding: utf-8 -*-
-from datetime import datetime
+from datetime import datetime, timedelta
 from peewee import *
 
-from backend.config.settings import DATABASE_PATH
+from backend.config.settings import (DATABASE_PATH, TASK_PRIORITY_AGING_SECONDS, TASK_PRIORITY_AGING_CAP,
+                                     TASK_DEADLINE_LEAD_SECONDS, TASK_DEADLINE_BOOST)
+from backend.core.change_version import ChangeTrackingSqliteDatabase
 
-# 初始化数据库连接
-db = SqliteDatabase(DATABASE_PATH)
+# 初始化数据库连接，写操作提交后递增对应表的变更版本
+db = ChangeTrackingSqliteDatabase(DATABASE_PATH)
 
 class BaseModel(Model):
     """基础模型类"""
     class Meta:
         database = db
 
+# 任务执行阶段（断点），服务重启后据此恢复已提交的远端任务
+TASK_PHASE_LOGGED_IN = 'logged_in'  # 已登录
+TASK_PHASE_SUBMITTED = 'submitted'  # 已提交，获取到远端任务ID
+TASK_PHASE_AWAITING_RESULT = 'awaiting_result'  # 等待生成结果
+
+class TaskCheckpointMixin:
+    """任务断点 - 持久化任务执行阶段"""
+    
+    def save_checkpoint(self, phase, task_id=None, account_id=None):
+        """
+        保存任务断点（单独UPDATE，避免覆盖任务的其他字段）
+        
+        已提交到远端的任务恢复执行时会再次登录，此时不回退到已登录阶段，
+        否则恢复过程中失败重试时会重新提交任务
+        """
+        if phase == TASK_PHASE_LOGGED_IN and self.can_resume():
+            return
+        model = type(self)
+        now = datetime.now()
+        fields = {model.phase: phase, model.phase_at: now}
+        self.phase = phase
+        self.phase_at = now
+        if task_id is not None:
+            fields[model.task_id] = task_id
+            self.task_id = task_id
+        if account_id is not None:
+            fields[model.account_id] = account_id
+            self.account_id = account_id
+        model.update(fields).where(model.id == self.id).execute()
+    
+    def clear_checkpoint(self):
+        """清除任务断点，下次执行将重新提交"""
+        model = type(self)
+        self.phase = None
+        self.phase_at = None
+        model.update({model.phase: None, model.phase_at: None}).where(model.id == self.id).execute()
+    
+    def can_resume(self):
+        """判断任务是否已提交到远端，可跳过提交直接轮询结果"""
+        return bool(self.task_id) and self.phase in [TASK_PHASE_SUBMITTED, TASK_PHASE_AWAITING_RESULT]
+
+class TaskPriorityMixin:
+    """任务优先级 - 排队任务按有效优先级调度"""
+    
+    @classmethod
+    def effective_priority(cls, now=None):
+        """
+        有效优先级的 SQL 表达式：优先级 + 排队时长加成（每 TASK_PRIORITY_AGING_SECONDS 秒加 1，
+        最多加 TASK_PRIORITY_AGING_CAP），距截止时间不足 TASK_DEADLINE_LEAD_SECONDS 秒的任务再加 TASK_DEADLINE_BOOST
+        """
+        now = now or datetime.now()
+        waited_days = fn.julianday(now.strftime('%Y-%m-%d %H:%M:%S.%f')) - fn.julianday(cls.create_at)
+        deadline_boost = Case(None, [(
+            cls.deadline.is_null(False) & (cls.deadline <= now + timedelta(seconds=TASK_DEADLINE_LEAD_SECONDS)),
+            TASK_DEADLINE_BOOST
+        )], 0)
+        # SQLite 的多参数 min() 为标量函数
+        aging = fn.MIN(waited_days * (86400.0 / TASK_PRIORITY_AGING_SECONDS), TASK_PRIORITY_AGING_CAP)
+        return cls.priority + aging + deadline_boost
+    
+    @classmethod
+    def select_for_dispatch(cls, query, limit=None, now=None):
+        """按有效优先级从高到低取排队任务，每个任务带有 effective_priority 属性"""
+        priority = cls.effective_priority(now)
+        return list(query.select_extend(priority.alias('effective_priority'))
+                    .order_by(priority.desc(), cls.create_at, cls.id).limit(limit))
+
 class Config(BaseModel):
     """系统配置表"""
     key = CharField(max_length=100, unique=True)  # 配置键
@@ -28,11 +97,29 @@ class JimengAccount(BaseModel):
     account = CharField(max_length=100)
     password = CharField(max_length=100)
     cookies = TextField(null=True)
+    cookies_expire_at = DateTimeField(null=True)  # 登录态cookie的过期时间，未知时为空
+    session_ready = BooleanField(default=True)  # 登录态是否可用，不可用的账号不分配任务，等待后台刷新
+    session_checked_at = DateTimeField(null=True)  # 最近一次后台检查或刷新登录态的时间
     created_at = DateTimeField(default=datetime.now)
     updated_at = DateTimeField(default=datetime.now)
     
     class Meta:
         table_name = 'jimeng_accounts'
+    
+    @classmethod
+    def select_ready(cls):
+        """
+        查询登录态可用的账号：未被标记为不可用，且登录态cookie未过期
+        
+        关闭后台登录态维护时没有任务会刷新这些账号，返回全部账号，由执行任务时重新登录
+        """
+        from backend.utils.config_util import get_cookie_health_enabled
+        if not get_cookie_health_enabled():
+            return cls.select()
+        return cls.select().where(
+            (cls.session_ready == True) &
+            (cls.cookies_expire_at.is_null() | (cls.cookies_expire_at > datetime.now()))
+        )
 
 class QingyingAccount(BaseModel):
     """清影账号管理"""
@@ -45,7 +132,7 @@ class QingyingAccount(BaseModel):
     class Meta:
         table_name = 'qingying_accounts'
 
-class JimengText2ImgTask(BaseModel):
+class JimengText2ImgTask(TaskCheckpointMixin, TaskPriorityMixin, BaseModel):
     """即梦文生图任务"""
     # 基本字段
     prompt = TextField()  # 提示词
@@ -68,18 +155,30 @@ class JimengText2ImgTask(BaseModel):
     
     task_id = CharField(max_length=100, null=True)  # 任务ID
 
+    # 断点字段 - 记录任务执行阶段
+    phase = CharField(max_length=20, null=True)  # 执行阶段
+    phase_at = DateTimeField(null=True)  # 阶段更新时间
+
     # 重试相关字段
     retry_count = IntegerField(default=0)  # 重试次数
     max_retry = IntegerField(default=10)  # 最大重试次数
     failure_reason = CharField(max_length=50, null=True)  # 失败原因类型
     error_message = TextField(null=True)  # 详细错误信息
     
+    # 调度字段
+    priority = IntegerField(default=0)  # 优先级，数值越大越先执行
+    deadline = DateTimeField(null=True)  # 截止时间，临近时提前执行
+    
     # 时间戳
     create_at = DateTimeField(default=datetime.now)
     update_at = DateTimeField(default=datetime.now)
     
     class Meta:
         table_name = 'jimeng_text2img_tasks'
+        indexes = (
+            (('create_at', 'id'), False),  # 列表游标分页
+            (('status', 'create_at', 'id'), False),  # 按状态筛选的列表和排队扫描
+        )
         
     def get_status_text(self):
         """获取状态文字描述"""
@@ -143,6 +242,10 @@ class JimengText2ImgTask(BaseModel):
         else:
             self.failure_reason = 'OTHER_ERROR'
         
+        # 远端已明确失败的任务不再恢复轮询，重试时重新提交
+        if self.failure_reason in ['TASK_ID_NOT_OBTAINED', 'GENERATION_FAILED']:
+            self.phase = None
+        
         self.update_at = datetime.now()
         self.save()
     
@@ -157,7 +260,7 @@ class JimengText2ImgTask(BaseModel):
             return True
         return False
 
-class JimengImg2ImgTask(BaseModel):
+class JimengImg2ImgTask(TaskCheckpointMixin, TaskPriorityMixin, BaseModel):
     """即梦图生图任务"""
     # 基本字段
     prompt = TextField()  # 提示词
@@ -167,6 +270,9 @@ class JimengImg2ImgTask(BaseModel):
     # 状态字段 - 使用数字状态码
     # 0: 排队中, 1: 生成中, 2: 已完成, 3: 失败
     status = IntegerField(default=0)
+    
+    # 关联账号
+    account_id = IntegerField(null=True)  # 使用的账号ID
 
     # 输入图片 - 最多3张输入图片
     input_image1 = CharField(max_length=500, null=True)
@@ -181,18 +287,30 @@ class JimengImg2ImgTask(BaseModel):
     
     task_id = CharField(max_length=100, null=True)  # 任务ID
 
+    # 断点字段 - 记录任务执行阶段
+    phase = CharField(max_length=20, null=True)  # 执行阶段
+    phase_at = DateTimeField(null=True)  # 阶段更新时间
+
     # 重试相关字段
     retry_count = IntegerField(default=0)  # 重试次数
     max_retry = IntegerField(default=10)  # 最大重试次数
     failure_reason = CharField(max_length=50, null=True)  # 失败原因类型
     error_message = TextField(null=True)  # 详细错误信息
     
+    # 调度字段
+    priority = IntegerField(default=0)  # 优先级，数值越大越先执行
+    deadline = DateTimeField(null=True)  # 截止时间，临近时提前执行
+    
     # 时间戳
     create_at = DateTimeField(default=datetime.now)
     update_at = DateTimeField(default=datetime.now)
     
     class Meta:
         table_name = 'jimeng_img2img_tasks'
+        indexes = (
+            (('create_at', 'id'), False),  # 列表游标分页
+            (('status', 'create_at', 'id'), False),  # 按状态筛选的列表和排队扫描
+        )
         
     def get_status_text(self):
         """获取状态文字描述"""
@@ -230,6 +348,10 @@ class JimengImg2ImgTask(BaseModel):
             if img:
                 images.append(img)
         return images
+
+    def get_upload_images(self):
+        """获取需要上传的图片路径列表，用于上传前预处理"""
+        return self.get_input_images()
         
     def set_images(self, image_paths):
         """设置生成的图片路径"""
@@ -277,6 +399,10 @@ class JimengImg2ImgTask(BaseModel):
         else:
             self.failure_reason = 'OTHER_ERROR'
         
+        # 远端已明确失败的任务不再恢复轮询，重试时重新提交
+        if self.failure_reason in ['TASK_ID_NOT_OBTAINED', 'GENERATION_FAILED']:
+            self.phase = None
+        
         self.update_at = datetime.now()
         self.save()
     
@@ -291,7 +417,7 @@ class JimengImg2ImgTask(BaseModel):
             return True
         return False
 
-class JimengImg2VideoTask(BaseModel):
+class JimengImg2VideoTask(TaskCheckpointMixin, TaskPriorityMixin, BaseModel):
     """即梦图生视频任务"""
     # 基本字段
     prompt = TextField()  # 提示词
@@ -311,18 +437,30 @@ class JimengImg2VideoTask(BaseModel):
     
     task_id = CharField(max_length=100, null=True)  # 任务ID
 
+    # 断点字段 - 记录任务执行阶段
+    phase = CharField(max_length=20, null=True)  # 执行阶段
+    phase_at = DateTimeField(null=True)  # 阶段更新时间
+
     # 重试相关字段
     retry_count = IntegerField(default=0)  # 重试次数
     max_retry = IntegerField(default=10)  # 最大重试次数
     failure_reason = CharField(max_length=50, null=True)  # 失败原因类型
     error_message = TextField(null=True)  # 详细错误信息
     
+    # 调度字段
+    priority = IntegerField(default=0)  # 优先级，数值越大越先执行
+    deadline = DateTimeField(null=True)  # 截止时间，临近时提前执行
+    
     # 时间戳
     create_at = DateTimeField(default=datetime.now)
     update_at = DateTimeField(default=datetime.now)
     
     class Meta:
         table_name = 'jimeng_img2video_tasks'
+        indexes = (
+            (('create_at', 'id'), False),  # 列表游标分页
+            (('status', 'create_at', 'id'), False),  # 按状态筛选的列表和排队扫描
+        )
         
     def get_status_text(self):
         """获取状态文字描述"""
@@ -340,6 +478,10 @@ class JimengImg2VideoTask(BaseModel):
         self.update_at = datetime.now()
         self.save()
     
+    def get_upload_images(self):
+        """获取需要上传的图片路径列表，用于上传前预处理"""
+        return [self.image_path] if self.image_path else []
+    
     def can_retry(self):
         """判断任务是否可以重试"""
         # 只有网络相关的失败才能重试
@@ -363,6 +505,10 @@ class JimengImg2VideoTask(BaseModel):
         else:
             self.failure_reason = 'OTHER_ERROR'
         
+        # 远端已明确失败的任务不再恢复轮询，重试时重新提交
+        if self.failure_reason in ['TASK_ID_NOT_OBTAINED', 'GENERATION_FAILED']:
+            self.phase = None
+        
         self.update_at = datetime.now()
         self.save()
     
@@ -377,7 +523,7 @@ class JimengImg2VideoTask(BaseModel):
             return True
         return False
 
-class JimengDigitalHumanTask(BaseModel):
+class JimengDigitalHumanTask(TaskCheckpointMixin, TaskPriorityMixin, BaseModel):
     """即梦数字人任务"""
     # 基本字段
     image_path = CharField(max_length=500)  # 图片路径
@@ -390,6 +536,10 @@ class JimengDigitalHumanTask(BaseModel):
     # 关联账号
     account_id = IntegerField(null=True)  # 使用的账号ID
     
+    # 调度字段
+    priority = IntegerField(default=0)  # 优先级，数值越大越先执行
+    deadline = DateTimeField(null=True)  # 截止时间，临近时提前执行
+    
     # 时间字段
     create_at = DateTimeField(default=datetime.now)  # 创建时间
     start_time = DateTimeField(null=True)  # 开始处理时间
@@ -398,6 +548,10 @@ class JimengDigitalHumanTask(BaseModel):
     video_url = TextField(null=True)  # 生成的视频URL
 
     task_id = CharField(max_length=100, null=True)  # 任务ID
+
+    # 断点字段 - 记录任务执行阶段
+    phase = CharField(max_length=20, null=True)  # 执行阶段
+    phase_at = DateTimeField(null=True)  # 阶段更新时间
     
     # 重试相关字段
     retry_count = IntegerField(default=0)  # 重试次数
@@ -407,6 +561,14 @@ class JimengDigitalHumanTask(BaseModel):
     
     class Meta:
         table_name = 'jimeng_digital_human_tasks'
+        indexes = (
+            (('create_at', 'id'), False),  # 列表游标分页
+            (('status', 'create_at', 'id'), False),  # 按状态筛选的列表和排队扫描
+        )
+    
+    def get_upload_images(self):
+        """获取需要上传的图片路径列表，用于上传前预处理"""
+        return [self.image_path] if self.image_path else []
     
     def can_retry(self):
         """判断任务是否可以重试"""
@@ -431,6 +593,10 @@ class JimengDigitalHumanTask(BaseModel):
         else:
             self.failure_reason = 'OTHER_ERROR'
         
+        # 远端已明确失败的任务不再恢复轮询，重试时重新提交
+        if self.failure_reason in ['TASK_ID_NOT_OBTAINED', 'GENERATION_FAILED']:
+            self.phase = None
+        
         self.update_at = datetime.now()
         self.save()
     
@@ -461,7 +627,24 @@ class JimengTaskRecord(BaseModel):
     class Meta:
         table_name = 'jimeng_task_records'
 
-class QingyingImage2VideoTask(BaseModel):
+class TaskPhaseTiming(BaseModel):
+    """任务执行阶段耗时，每次执行的每个阶段一条记录"""
+    platform = CharField(max_length=50)  # 平台（任务表名）
+    task_id = IntegerField()  # 本地任务ID
+    phase = CharField(max_length=50)  # 阶段名称，execute 为整体耗时
+    start_offset = FloatField()  # 距本次执行开始的秒数
+    duration = FloatField()  # 耗时（秒）
+    success = BooleanField(default=True)  # 阶段是否成功
+    created_at = DateTimeField(default=datetime.now)
+    
+    class Meta:
+        table_name = 'task_phase_timings'
+        indexes = (
+            (('platform', 'phase', 'created_at'), False),
+            (('platform', 'task_id'), False),
+        )
+
+class QingyingImage2VideoTask(TaskCheckpointMixin, TaskPriorityMixin, BaseModel):
     """清影图生视频任务"""
     # 基本字段
     prompt = TextField()  # 提示词
@@ -482,18 +665,32 @@ class QingyingImage2VideoTask(BaseModel):
     image_path = CharField(max_length=500, null=True)  # 输入图片路径
     video_url = CharField(max_length=500, null=True)  # 生成的视频URL
     
+    task_id = CharField(max_length=100, null=True)  # 任务ID（清影chat_id）
+
+    # 断点字段 - 记录任务执行阶段
+    phase = CharField(max_length=20, null=True)  # 执行阶段
+    phase_at = DateTimeField(null=True)  # 阶段更新时间
+    
     # 重试相关字段
     retry_count = IntegerField(default=0)  # 重试次数
     max_retry = IntegerField(default=10)  # 最大重试次数
     failure_reason = CharField(max_length=50, null=True)  # 失败原因类型
     error_message = TextField(null=True)  # 详细错误信息
     
+    # 调度字段
+    priority = IntegerField(default=0)  # 优先级，数值越大越先执行
+    deadline = DateTimeField(null=True)  # 截止时间，临近时提前执行
+    
     # 时间戳
     create_at = DateTimeField(default=datetime.now)
     update_at = DateTimeField(default=datetime.now)
     
     class Meta:
         table_name = 'qingying_image2video_tasks'
+        indexes = (
+            (('create_at', 'id'), False),  # 列表游标分页
+            (('status', 'create_at', 'id'), False),  # 按状态筛选的列表和排队扫描
+        )
         
     def get_status_text(self):
         """获取状态文字描述"""
@@ -511,6 +708,10 @@ class QingyingImage2VideoTask(BaseModel):
         self.update_at = datetime.now()
         self.save()
     
+    def get_upload_images(self):
+        """获取需要上传的图片路径列表，用于上传前预处理"""
+        return [self.image_path] if self.image_path else []
+    
     def can_retry(self):
         """判断任务是否可以重试"""
         # 只有网络相关的失败才能重试
@@ -534,6 +735,10 @@ class QingyingImage2VideoTask(BaseModel):
         else:
             self.failure_reason = 'OTHER_ERROR'
         
+        # 远端已明确失败的任务不再恢复轮询，重试时重新提交
+        if self.failure_reason in ['TASK_ID_NOT_OBTAINED', 'GENERATION_FAILED']:
+            self.phase = None
+        
         self.update_at = datetime.now()
         self.save()
     
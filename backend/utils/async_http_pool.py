@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+共享 HTTP 连接池 - 在后台事件循环中维护一个 aiohttp 会话
+
+任务执行器每次在新建的事件循环中运行（见 run_async_safe），直接在其中创建的会话无法跨任务复用。
+这里把会话放在常驻的后台事件循环里，任意事件循环中都可以 await 池中的请求，连接在任务之间保持复用。
+"""
+
+import asyncio
+import atexit
+import threading
+from typing import Optional
+
+import aiohttp
+
+from backend.config.settings import HTTP_POOL_LIMIT, HTTP_POOL_LIMIT_PER_HOST, HTTP_REQUEST_TIMEOUT
+from backend.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+class AsyncHttpPool:
+    """后台事件循环中的共享 aiohttp 会话"""
+
+    def __init__(self, limit: int = HTTP_POOL_LIMIT, limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST,
+                 timeout: float = HTTP_REQUEST_TIMEOUT):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='HttpPoolLoop', daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """在后台事件循环中获取会话，不存在时创建"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host)
+            # 不同账号共用会话，cookies 由调用方按请求携带，会话本身不保存
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                cookie_jar=aiohttp.DummyCookieJar(),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            logger.debug("已创建HTTP连接池会话", extra={'fields': {'limit': self.limit}})
+        return self._session
+
+    async def run(self, func, *args, **kwargs):
+        """
+        在后台事件循环中执行 func(session, *args, **kwargs) 并返回结果
+
+        可以在任意事件循环中 await；调用方被取消时池中的请求同时取消。
+        """
+        async def call():
+            session = await self._get_session()
+            return await func(session, *args, **kwargs)
+
+        future = asyncio.run_coroutine_threadsafe(call(), self._ensure_loop())
+        return await asyncio.wrap_future(future)
+
+    def close(self):
+        """关闭会话并停止后台事件循环"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None or loop.is_closed():
+            return
+
+        async def close_session():
+            if self._session is not None and not self._session.closed:
+                await self._session.close()
+            self._session = None
+
+        try:
+            asyncio.run_coroutine_threadsafe(close_session(), loop).result(timeout=5)
+        except Exception as e:
+            logger.warning(f"关闭HTTP连接池失败: {str(e)}")
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+
+# 全局共享连接池
+http_pool = AsyncHttpPool()
+atexit.register(http_pool.close)
@@ -3,17 +3,23 @@
 """
 
 import asyncio
+import functools
 import time
 import traceback
 from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
 from enum import Enum
 from dataclasses import dataclass
 from typing import Optional, List, Dict, Any
-from playwright.async_api import async_playwright
-from colorama import Fore, Style, init
 
-# 初始化colorama
-init()
+from backend.core.logger import get_logger
+from backend.core.metrics import browser_instances, observe_task_result
+from backend.core.worker_slots import worker_slots
+from backend.utils.config_util import get_resource_filter_enabled, get_persistent_profile_enabled
+from backend.utils.cookie_util import load_cookies, serialize_cookies
+from backend.utils.browser_profile_util import get_profile_key, acquire_profile, release_profile
+from backend.utils.login_state_cache import is_login_fresh, mark_login_valid, invalidate_login
+from backend.utils.resource_filter import get_resource_filter
 
 class ErrorCode(Enum):
     """错误代码枚举 - 简化为4大类型"""
@@ -40,40 +46,249 @@ class TaskResult:
     error_details: Optional[Dict[str, Any]] = None
     execution_time: Optional[float] = None
     cookies: Optional[str] = None
+    spans: Optional[List[Dict[str, Any]]] = None  # 各阶段耗时
 
 class TaskLogger:
-    """结构化日志记录器"""
-    
-    @staticmethod
-    def info(message: str, **kwargs):
-        extra_info = f" | {kwargs}" if kwargs else ""
-        print(f"{Fore.GREEN}[INFO] {message}{extra_info}{Style.RESET_ALL}")
-    
-    @staticmethod
-    def warning(message: str, **kwargs):
-        extra_info = f" | {kwargs}" if kwargs else ""
-        print(f"{Fore.YELLOW}[WARN] {message}{extra_info}{Style.RESET_ALL}")
-    
-    @staticmethod
-    def error(message: str, **kwargs):
-        extra_info = f" | {kwargs}" if kwargs else ""
-        print(f"{Fore.RED}[ERROR] {message}{extra_info}{Style.RESET_ALL}")
-    
-    @staticmethod
-    def debug(message: str, **kwargs):
-        extra_info = f" | {kwargs}" if kwargs else ""
-        print(f"{Fore.CYAN}[DEBUG] {message}{extra_info}{Style.RESET_ALL}")
+    """结构化日志记录器，关键字参数作为结构化字段异步写出"""
+    
+    def __init__(self, name: str = __name__):
+        self._logger = get_logger(name)
+    
+    def info(self, message: str, **kwargs):
+        self._logger.info(message, extra={'fields': kwargs})
+    
+    def warning(self, message: str, **kwargs):
+        self._logger.warning(message, extra={'fields': kwargs})
+    
+    def error(self, message: str, **kwargs):
+        self._logger.error(message, extra={'fields': kwargs})
+    
+    def debug(self, message: str, **kwargs):
+        self._logger.debug(message, extra={'fields': kwargs})
+
+# 自动计时的执行阶段，子类中同名的异步方法会被包装为计时阶段
+TIMED_PHASES = (
+    'init_browser', 'handle_cookies', 'check_login_status', 'perform_login', 'validate_login_success',
+    'navigate_to_generation_page', 'navigate_to_image2video_page', 'navigate_to_digital_human_page',
+    'navigate_to_platform', 'upload_image', 'upload_input_images', 'upload_avatar_image', 'upload_speech_audio',
+    'start_generation', 'wait_for_generation_complete', 'wait_for_completion', 'close_browser'
+)
+
+# 整体执行耗时的阶段名称
+EXECUTE_PHASE = 'execute'
+
+def timed_phase(name: str):
+    """将异步方法包装为计时阶段，返回 TaskResult 时按其 code 记录阶段是否成功"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            async with self.span(name) as record:
+                result = await func(self, *args, **kwargs)
+                if record is not None and isinstance(result, TaskResult):
+                    record['ok'] = result.code == ErrorCode.SUCCESS.value
+                return result
+        wrapper._timed_phase = name
+        return wrapper
+    return decorator
+
+def _result_code_name(result) -> str:
+    """将执行结果转换为错误码名称，用于按错误码统计"""
+    if not isinstance(result, TaskResult):
+        return 'EXCEPTION'
+    try:
+        return ErrorCode(result.code).name
+    except ValueError:
+        return str(result.code)
+
+def _timed_execute(func):
+    """包装 execute：每次执行重新计时，结束后补全 execution_time 并上报各阶段耗时"""
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        self.begin_run()
+        result = None
+        try:
+            result = await func(self, *args, **kwargs)
+            return result
+        finally:
+            self.complete_run(result)
+    wrapper._timed_phase = EXECUTE_PHASE
+    return wrapper
 
 class BaseTaskExecutor(ABC):
     """任务执行基类"""
     
+    # 平台标识，用于选择资源拦截规则（见 RESOURCE_FILTER_OVERRIDES）
+    resource_platform: Optional[str] = None
+    
     def __init__(self, headless: bool = False):
         self.headless = headless
         self.playwright = None
         self.browser = None
         self.context = None
         self.page = None
-        self.logger = TaskLogger()
+        self.logger = TaskLogger(type(self).__module__)
+        self.checkpoint_callback = None  # 断点回调 callback(phase, **data)
+        self.timing_callback = None  # 阶段耗时回调 callback(spans)
+        self.spans = []  # 本次执行的阶段耗时
+        self._run_started = None
+        self._active_spans = set()
+        self._worker_slot = worker_slots.current_slot()  # 所在全局线程池槽位，用于展示当前阶段
+        self.blocked_requests = 0  # 本次执行中被拦截的请求数
+        self.account_id = None  # 执行任务的账号ID
+        self.account_key = None  # 账号标识（平台_账号ID），用于登录状态缓存
+        self.profile_key = None  # 账号浏览器配置目录名称，为空时使用临时浏览器
+        self.login_check_skipped = False  # 本次执行是否因缓存跳过了登录检查
+        self.auth_failed = False  # 本次执行是否检测到登录失效
+        self._profile_in_use = None
+    
+    def __init_subclass__(cls, **kwargs):
+        """自动为子类中的执行阶段方法和 execute 加上计时"""
+        super().__init_subclass__(**kwargs)
+        for name in TIMED_PHASES:
+            func = cls.__dict__.get(name)
+            if asyncio.iscoroutinefunction(func) and not hasattr(func, '_timed_phase'):
+                setattr(cls, name, timed_phase(name)(func))
+        func = cls.__dict__.get('execute')
+        if asyncio.iscoroutinefunction(func) and not hasattr(func, '_timed_phase'):
+            setattr(cls, 'execute', _timed_execute(func))
+    
+    @asynccontextmanager
+    async def span(self, name: str):
+        """
+        记录一个阶段的耗时
+        
+        用法: async with self.span('select_model'): ...
+        同名阶段嵌套时（如子类调用父类的同名方法）只记录最外层。
+        """
+        if name in self._active_spans:
+            yield None
+            return
+        
+        start = time.perf_counter()
+        if self._run_started is None:
+            self._run_started = start
+        record = {'phase': name, 'start': round(start - self._run_started, 3), 'duration': None, 'ok': True}
+        self._active_spans.add(name)
+        if name != EXECUTE_PHASE:
+            worker_slots.set_phase(self._worker_slot, name)
+        try:
+            yield record
+        except BaseException:
+            record['ok'] = False
+            raise
+        finally:
+            self._active_spans.discard(name)
+            record['duration'] = round(time.perf_counter() - start, 3)
+            self.spans.append(record)
+    
+    def get_spans(self) -> List[Dict[str, Any]]:
+        """获取本次执行的阶段耗时，按开始时间排序"""
+        return sorted(self.spans, key=lambda record: (record['start'], record['phase'] != EXECUTE_PHASE))
+    
+    def set_timing_callback(self, callback):
+        """设置阶段耗时回调，执行结束后调用以持久化各阶段耗时"""
+        self.timing_callback = callback
+    
+    def report_spans(self):
+        """上报本次执行的阶段耗时"""
+        spans = self.get_spans()
+        self.logger.debug("阶段耗时", spans=spans)
+        if not self.timing_callback:
+            return
+        try:
+            self.timing_callback(spans)
+        except Exception as e:
+            self.logger.warning("保存阶段耗时失败", error=str(e))
+    
+    def bind_account(self, account_id):
+        """
+        绑定执行任务的账号
+        
+        用于登录状态缓存；开启持久化配置模式时同时使用账号独立的浏览器配置目录。
+        """
+        if not self.resource_platform or not account_id:
+            return
+        self.account_id = account_id
+        self.account_key = get_profile_key(self.resource_platform, account_id)
+        if get_persistent_profile_enabled():
+            self.profile_key = self.account_key
+    
+    async def check_login_cached(self) -> TaskResult:
+        """账号登录状态在有效期内时跳过 check_login_status，否则检查并更新缓存"""
+        if self.account_key and is_login_fresh(self.account_key):
+            self.login_check_skipped = True
+            self.logger.info("账号登录状态在有效期内，跳过登录检查", account=self.account_key)
+            return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="登录状态有效")
+        
+        result = await self.check_login_status()
+        if self.account_key:
+            if result.code == ErrorCode.SUCCESS.value:
+                mark_login_valid(self.account_key)
+            else:
+                invalidate_login(self.account_key)
+        return result
+    
+    def begin_run(self):
+        """开始一次任务执行：重新计时并清空本次执行的状态"""
+        self.spans = []
+        self._run_started = time.perf_counter()
+        self.login_check_skipped = False
+        self.auth_failed = False
+    
+    def complete_run(self, result):
+        """
+        结束一次任务执行：补全执行耗时，统计结果，更新登录状态缓存并上报阶段耗时
+        
+        execute 自动调用；一次会话执行多个任务时（如批量执行）在每个任务结束时调用。
+        """
+        total = time.perf_counter() - self._run_started
+        ok = isinstance(result, TaskResult) and result.code == ErrorCode.SUCCESS.value
+        self.spans.append({'phase': EXECUTE_PHASE, 'start': 0.0, 'duration': round(total, 3), 'ok': ok})
+        if isinstance(result, TaskResult):
+            if result.execution_time is None:
+                result.execution_time = total
+            result.spans = self.get_spans()
+        observe_task_result(type(self).__name__, _result_code_name(result), total)
+        self._update_login_cache(result)
+        self.report_spans()
+    
+    def mark_auth_failed(self, reason: str):
+        """执行中发现登录失效（如接口返回 401/403），作废登录状态缓存"""
+        self.auth_failed = True
+        if self.account_key:
+            invalidate_login(self.account_key)
+        if self.resource_platform == 'jimeng' and self.account_id:
+            # 开启后台登录态维护时，即梦账号交给后台重新登录，在此之前不再分配任务
+            from backend.core.cookie_health import report_session_invalid
+            report_session_invalid(self.account_id)
+        self.logger.warning("检测到登录失效", reason=reason, account=self.account_key)
+    
+    def _update_login_cache(self, result):
+        """根据执行结果更新登录状态缓存"""
+        if not self.account_key or self.auth_failed:
+            return
+        code = result.code if isinstance(result, TaskResult) else None
+        if code == ErrorCode.SUCCESS.value:
+            mark_login_valid(self.account_key)
+        elif self.login_check_skipped and code in (ErrorCode.WEB_INTERACTION_FAILED.value,
+                                                   ErrorCode.TASK_ID_NOT_OBTAINED.value):
+            # 跳过检查后页面交互失败或拿不到任务ID，可能是登录已失效，下次重新检查
+            invalidate_login(self.account_key)
+    
+    def set_checkpoint_callback(self, callback):
+        """设置断点回调，执行器在关键阶段调用以持久化任务进度"""
+        self.checkpoint_callback = callback
+    
+    async def report_checkpoint(self, phase: str, callback=None, **data):
+        """上报任务执行断点，callback 为空时使用 set_checkpoint_callback 设置的回调"""
+        callback = callback or self.checkpoint_callback
+        if not callback:
+            return
+        try:
+            callback(phase, **data)
+            self.logger.debug("已保存任务断点", phase=phase, **data)
+        except Exception as e:
+            self.logger.warning("保存任务断点失败", phase=phase, error=str(e))
     
     def get_browser_config(self) -> Dict[str, Any]:
         """获取浏览器配置"""
@@ -89,22 +304,40 @@ class BaseTaskExecutor(ABC):
         self.logger.info("浏览器配置已设置")
         return config
     
+    @timed_phase('init_browser')
     async def init_browser(self, cookies: Optional[str] = None) -> TaskResult:
         """初始化浏览器"""
         try:
             self.logger.info("正在启动浏览器")
             config = self.get_browser_config()
             
+            # 启动浏览器时才导入 Playwright，避免拖慢服务启动
+            from playwright.async_api import async_playwright
             self.playwright = await async_playwright().start()
-            self.browser = await self.playwright.chromium.launch(headless=self.headless)
-            self.context = await self.browser.new_context(**config)
+            
+            profile_dir = await asyncio.to_thread(acquire_profile, self.profile_key) if self.profile_key else None
+            if profile_dir:
+                # 持久化配置目录：保留磁盘缓存和登录状态。路由拦截会让 Chromium 停用 HTTP 缓存，因此不再拦截资源
+                self._profile_in_use = self.profile_key
+                self.context = await self.playwright.chromium.launch_persistent_context(
+                    profile_dir, headless=self.headless, **config)
+                browser_instances.inc()
+                self.logger.info("使用账号浏览器配置目录", profile=self.profile_key)
+            else:
+                if self.profile_key:
+                    self.logger.warning("账号浏览器配置目录正被其他任务使用，改用临时浏览器", profile=self.profile_key)
+                self.browser = await self.playwright.chromium.launch(headless=self.headless)
+                browser_instances.inc()
+                self.context = await self.browser.new_context(**config)
+                await self.install_resource_filter()
             
             # 如果提供了cookies，则添加到浏览器上下文中
             if cookies:
                 await self.hook_cookies(cookies)
                 self.logger.info("已加载cookies")
             
-            self.page = await self.context.new_page()
+            # 持久化上下文启动时自带一个空白页
+            self.page = self.context.pages[0] if self.context.pages else await self.context.new_page()
             
             self.logger.info("浏览器启动成功")
             return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="浏览器启动成功")
@@ -118,54 +351,76 @@ class BaseTaskExecutor(ABC):
                 error_details={"error": str(e), "traceback": traceback.format_exc()}
             )
     
+    async def install_resource_filter(self):
+        """
+        在浏览器上下文中拦截非必要资源
+        
+        使用 context.route，弹窗等新页面同样生效。注意开启路由拦截后 Chromium 不再使用 HTTP 缓存。
+        """
+        if not get_resource_filter_enabled():
+            return
+        resource_filter = get_resource_filter(self.resource_platform)
+        
+        async def handle_route(route):
+            request = route.request
+            try:
+                if resource_filter.should_block(request.resource_type, request.url):
+                    self.blocked_requests += 1
+                    await route.abort()
+                else:
+                    await route.continue_()
+            except Exception as e:
+                # 页面关闭时未完成的请求会抛错，忽略即可
+                self.logger.debug("资源拦截处理失败", url=request.url, error=str(e))
+        
+        await self.context.route('**/*', handle_route)
+        self.logger.info("已启用资源拦截", platform=self.resource_platform)
+    
     async def hook_cookies(self, cookies: str):
-        """设置cookies到浏览器上下文"""
+        """设置账号保存的cookies到浏览器上下文，旧格式字符串使用平台默认域名"""
         try:
-            # 处理cookies字符串格式
-            # 将cookies字符串转换为字典列表格式
-            cookie_pairs = cookies.split('; ')
-            cookie_list = []
-            for pair in cookie_pairs:
-                if '=' in pair:
-                    name, value = pair.split('=', 1)
-                    cookie_list.append({
-                        'name': name.strip(),
-                        'value': value.strip(),
-                        'domain': '.capcut.com',
-                        'path': '/'
-                    })
-            
-            await self.context.add_cookies(cookie_list)
+            await self.context.add_cookies(load_cookies(cookies, self.resource_platform))
             self.logger.info("Cookies设置成功")
             
         except Exception as e:
             self.logger.error("设置cookies时出错", error=str(e))
     
     async def get_cookies(self) -> Optional[str]:
-        """获取当前页面的cookies"""
+        """获取浏览器上下文的cookies，保留域名、路径和过期时间"""
         try:
             if self.context:
                 cookies = await self.context.cookies()
-                # 将Cookie转换为字符串格式
-                cookie_string = "; ".join([f"{cookie['name']}={cookie['value']}" for cookie in cookies])
                 self.logger.debug("获取到cookies", count=len(cookies))
-                return cookie_string
+                return serialize_cookies(cookies)
             else:
                 self.logger.warning("无法获取cookies：浏览器上下文不存在")
                 return None
         except Exception as e:
             self.logger.error("获取cookies时出错", error=str(e))
             return None
+    
+    @timed_phase('close_browser')
     async def close_browser(self):
         """关闭浏览器"""
         try:
             if self.browser:
-                await self.browser.close()
-                self.logger.info("浏览器已关闭")
+                browser, self.browser = self.browser, None
+                browser_instances.dec()
+                await browser.close()
+                self.logger.info("浏览器已关闭", blocked_requests=self.blocked_requests)
+            elif self._profile_in_use and self.context:
+                context, self.context = self.context, None
+                browser_instances.dec()
+                await context.close()
+                self.logger.info("浏览器已关闭", profile=self._profile_in_use)
             if self.playwright:
                 await self.playwright.stop()
         except Exception as e:
             self.logger.error("关闭浏览器时出错", error=str(e))
+        finally:
+            if self._profile_in_use:
+                release_profile(self._profile_in_use)
+                self._profile_in_use = None
     
     @abstractmethod
     async def execute(self, **kwargs) -> TaskResult:
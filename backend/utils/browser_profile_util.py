@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+账号浏览器配置目录工具 - 为每个账号保留独立的浏览器用户数据目录
+
+持久化的配置目录保留磁盘缓存、localStorage 和登录状态，任务之间无需重复下载页面资源。
+同一目录同一时间只能被一个浏览器使用，所有目录的总大小超过上限时按最近使用时间淘汰。
+"""
+
+import os
+import shutil
+import threading
+import time
+from typing import Dict, List, Optional
+
+from backend.config.settings import BROWSER_PROFILES_DIR, BROWSER_PROFILES_MAX_BYTES, BROWSER_PROFILE_LOCK_TIMEOUT
+from backend.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 记录最近使用时间的文件
+LAST_USED_FILE = '.last_used'
+
+_profile_locks: Dict[str, threading.Lock] = {}
+_profile_locks_guard = threading.Lock()
+_cleanup_lock = threading.Lock()
+
+def get_profile_key(platform: str, account_id) -> str:
+    """配置目录名称，例如 jimeng_12"""
+    return f"{platform}_{account_id}"
+
+def get_profile_dir(profile_key: str) -> str:
+    """配置目录路径"""
+    return os.path.join(BROWSER_PROFILES_DIR, profile_key)
+
+def _get_lock(profile_key: str) -> threading.Lock:
+    with _profile_locks_guard:
+        lock = _profile_locks.get(profile_key)
+        if lock is None:
+            lock = _profile_locks[profile_key] = threading.Lock()
+        return lock
+
+def acquire_profile(profile_key: str, timeout: float = BROWSER_PROFILE_LOCK_TIMEOUT) -> Optional[str]:
+    """
+    占用账号的配置目录
+
+    参数:
+        profile_key: 配置目录名称
+        timeout: 等待其他任务释放的最长时间（秒）
+
+    返回值:
+        Optional[str]: 配置目录路径，超时未能占用时返回 None
+    """
+    if not _get_lock(profile_key).acquire(timeout=timeout):
+        return None
+    profile_dir = get_profile_dir(profile_key)
+    os.makedirs(profile_dir, exist_ok=True)
+    return profile_dir
+
+def release_profile(profile_key: str):
+    """释放配置目录，记录最近使用时间并在后台检查磁盘上限"""
+    try:
+        with open(os.path.join(get_profile_dir(profile_key), LAST_USED_FILE), 'w') as f:
+            f.write(str(time.time()))
+    except OSError:
+        pass
+    finally:
+        lock = _get_lock(profile_key)
+        if lock.locked():
+            lock.release()
+    threading.Thread(target=enforce_disk_limit, name='ProfileCleanup', daemon=True).start()
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                continue
+    return total
+
+def _last_used(path: str) -> float:
+    try:
+        return os.path.getmtime(os.path.join(path, LAST_USED_FILE))
+    except OSError:
+        return os.path.getmtime(path)
+
+def list_profiles() -> List[Dict]:
+    """列出所有配置目录及其大小、最近使用时间和是否正在使用"""
+    if not os.path.isdir(BROWSER_PROFILES_DIR):
+        return []
+    profiles = []
+    with os.scandir(BROWSER_PROFILES_DIR) as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            profiles.append({
+                'key': entry.name,
+                'size': _dir_size(entry.path),
+                'last_used': _last_used(entry.path),
+                'in_use': _get_lock(entry.name).locked()
+            })
+    return profiles
+
+def enforce_disk_limit(max_bytes: int = BROWSER_PROFILES_MAX_BYTES) -> List[str]:
+    """
+    所有配置目录总大小超过上限时，按最近使用时间从旧到新删除未在使用的目录
+
+    返回值:
+        List[str]: 被删除的配置目录名称
+    """
+    removed = []
+    if not _cleanup_lock.acquire(blocking=False):
+        return removed  # 已有清理在进行
+    try:
+        profiles = list_profiles()
+        total = sum(profile['size'] for profile in profiles)
+        for profile in sorted(profiles, key=lambda item: item['last_used']):
+            if total <= max_bytes:
+                break
+            lock = _get_lock(profile['key'])
+            if not lock.acquire(blocking=False):
+                continue  # 正在使用，跳过
+            try:
+                shutil.rmtree(get_profile_dir(profile['key']), ignore_errors=True)
+                total -= profile['size']
+                removed.append(profile['key'])
+            finally:
+                lock.release()
+        if removed:
+            logger.info("浏览器配置目录超过磁盘上限，已删除", extra={'fields': {'removed': removed}})
+        return removed
+    finally:
+        _cleanup_lock.release()
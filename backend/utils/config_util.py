@@ -22,6 +22,30 @@ class ConfigUtil:
         'auto_retry_enabled': {
             'value': 'false',
             'description': '是否启用自动重试功能，只会重试因为网络问题导致的失败任务'
+        },
+        'resource_filter_enabled': {
+            'value': 'true',
+            'description': '是否拦截自动化页面中的图片、字体、媒体和统计请求'
+        },
+        'persistent_profile_enabled': {
+            'value': 'false',
+            'description': '是否为每个账号保留独立的浏览器配置目录（缓存和登录状态）'
+        },
+        'jimeng_http_engine_enabled': {
+            'value': 'false',
+            'description': '即梦文生图是否优先使用HTTP直连引擎，不支持时自动回退到浏览器'
+        },
+        'qingying_http_engine_enabled': {
+            'value': 'false',
+            'description': '清影图生视频是否优先使用HTTP直连引擎，不支持时自动回退到浏览器'
+        },
+        'jimeng_session_batching_enabled': {
+            'value': 'false',
+            'description': '即梦文生图是否按账号把排队任务分组，在一个浏览器会话中连续提交执行'
+        },
+        'cookie_health_enabled': {
+            'value': 'true',
+            'description': '是否在线程池空闲时提前验证并刷新即将过期的即梦账号登录态'
         }
     }
     
@@ -149,4 +173,52 @@ def get_auto_retry_enabled():
 
 def set_auto_retry_enabled(value):
     """设置是否启用自动重试"""
-    return ConfigUtil.set_config('auto_retry_enabled', value)
\ No newline at end of file
+    return ConfigUtil.set_config('auto_retry_enabled', value)
+
+def get_resource_filter_enabled():
+    """获取是否拦截自动化页面中的非必要资源"""
+    return ConfigUtil.get_config_bool('resource_filter_enabled', True)
+
+def set_resource_filter_enabled(value):
+    """设置是否拦截自动化页面中的非必要资源"""
+    return ConfigUtil.set_config('resource_filter_enabled', value)
+
+def get_persistent_profile_enabled():
+    """获取是否为每个账号保留独立的浏览器配置目录"""
+    return ConfigUtil.get_config_bool('persistent_profile_enabled', False)
+
+def set_persistent_profile_enabled(value):
+    """设置是否为每个账号保留独立的浏览器配置目录"""
+    return ConfigUtil.set_config('persistent_profile_enabled', value)
+
+def get_jimeng_http_engine_enabled():
+    """获取即梦文生图是否优先使用HTTP直连引擎"""
+    return ConfigUtil.get_config_bool('jimeng_http_engine_enabled', False)
+
+def set_jimeng_http_engine_enabled(value):
+    """设置即梦文生图是否优先使用HTTP直连引擎"""
+    return ConfigUtil.set_config('jimeng_http_engine_enabled', value)
+
+def get_qingying_http_engine_enabled():
+    """获取清影图生视频是否优先使用HTTP直连引擎"""
+    return ConfigUtil.get_config_bool('qingying_http_engine_enabled', False)
+
+def set_qingying_http_engine_enabled(value):
+    """设置清影图生视频是否优先使用HTTP直连引擎"""
+    return ConfigUtil.set_config('qingying_http_engine_enabled', value)
+
+def get_jimeng_session_batching_enabled():
+    """获取即梦文生图是否使用会话批量模式"""
+    return ConfigUtil.get_config_bool('jimeng_session_batching_enabled', False)
+
+def set_jimeng_session_batching_enabled(value):
+    """设置即梦文生图是否使用会话批量模式"""
+    return ConfigUtil.set_config('jimeng_session_batching_enabled', value)
+
+def get_cookie_health_enabled():
+    """获取是否在后台维护即梦账号登录态"""
+    return ConfigUtil.get_config_bool('cookie_health_enabled', True)
+
+def set_cookie_health_enabled(value):
+    """设置是否在后台维护即梦账号登录态"""
+    return ConfigUtil.set_config('cookie_health_enabled', value)
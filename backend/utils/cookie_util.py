@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Cookie 工具 - 账号 cookies 的结构化存储、加载和过期时间计算
+
+账号 cookies 以 JSON 列表保存浏览器上下文返回的 cookie（含 domain、path、expires 等），
+加载后直接传给 context.add_cookies，不再按 "name=value; " 字符串解析并统一设置域名。
+旧的 "name=value; name=value" 字符串仍可加载，域名使用平台默认域名。
+"""
+
+import json
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterable, List, Optional, Union
+
+from backend.config.settings import JIMENG_SESSION_COOKIE_NAMES, PLATFORM_COOKIE_DOMAINS
+
+# 保存的 cookie 字段，与 Playwright 的 add_cookies 参数一致
+COOKIE_FIELDS = ('name', 'value', 'domain', 'path', 'expires', 'httpOnly', 'secure', 'sameSite')
+
+CookieJar = List[Dict]
+
+def serialize_cookies(cookies: CookieJar) -> str:
+    """把浏览器上下文返回的 cookie 列表转换为保存用的 JSON 字符串"""
+    return json.dumps([{field: cookie[field] for field in COOKIE_FIELDS if field in cookie} for cookie in cookies],
+                      ensure_ascii=False, separators=(',', ':'))
+
+def load_cookies(cookies: Union[str, CookieJar, None], platform: str = 'jimeng') -> CookieJar:
+    """
+    加载账号保存的 cookies
+
+    参数:
+        cookies: 保存的 JSON 字符串、旧格式 "name=value; " 字符串或已加载的列表
+        platform: 旧格式 cookies 使用该平台的默认域名
+
+    返回值:
+        CookieJar: 可直接传给 context.add_cookies 的 cookie 列表
+    """
+    if isinstance(cookies, list):
+        return cookies
+    cookies = (cookies or '').strip()
+    if cookies.startswith('['):
+        try:
+            return json.loads(cookies)
+        except ValueError:
+            return []
+    domain = PLATFORM_COOKIE_DOMAINS.get(platform, PLATFORM_COOKIE_DOMAINS['jimeng'])
+    jar = []
+    for pair in cookies.split(';'):
+        if '=' in pair:
+            name, value = pair.split('=', 1)
+            jar.append({'name': name.strip(), 'value': value.strip(), 'domain': domain, 'path': '/'})
+    return jar
+
+def cookie_values(cookies: Union[str, CookieJar, None]) -> Dict[str, str]:
+    """{名称: 取值}，同名 cookie 以后出现的为准"""
+    return {cookie['name']: cookie['value'] for cookie in load_cookies(cookies)}
+
+def cookie_header(cookies: Union[str, CookieJar, None]) -> str:
+    """请求头 Cookie 的取值"""
+    return "; ".join(f"{name}={value}" for name, value in cookie_values(cookies).items())
+
+def merge_set_cookie(jar: CookieJar, morsel, default_domain: str):
+    """
+    把响应中的一个 Set-Cookie 合并到 cookie 列表
+
+    参数:
+        jar: 账号的 cookie 列表，原地更新
+        morsel: http.cookies.Morsel
+        default_domain: Set-Cookie 未指定域名且列表中没有同名 cookie 时使用的域名
+    """
+    existing = next((cookie for cookie in jar if cookie['name'] == morsel.key), None)
+    expires = -1
+    if morsel['max-age']:
+        try:
+            expires = time.time() + int(morsel['max-age'])
+        except ValueError:
+            pass
+    elif morsel['expires']:
+        try:
+            expires = parsedate_to_datetime(morsel['expires']).timestamp()
+        except (TypeError, ValueError):
+            pass
+    cookie = {
+        'name': morsel.key,
+        'value': morsel.value,
+        'domain': morsel['domain'] or (existing['domain'] if existing else default_domain),
+        'path': morsel['path'] or '/',
+        'expires': expires
+    }
+    if existing is not None:
+        existing.update(cookie)
+    else:
+        jar.append(cookie)
+
+def session_expiry(cookies: Union[str, CookieJar, None],
+                   session_names: Iterable[str] = JIMENG_SESSION_COOKIE_NAMES) -> Optional[datetime]:
+    """
+    计算登录态的过期时间
+
+    参数:
+        cookies: cookie 列表或保存的 cookies，expires 为秒级时间戳，会话 cookie 为 -1
+        session_names: 表示登录态的 cookie 名称
+
+    返回值:
+        Optional[datetime]: 登录态 cookie 中最早的过期时间；没有登录态 cookie、均为会话 cookie
+        或为旧格式字符串时返回 None
+    """
+    names = set(session_names)
+    expiries = [cookie['expires'] for cookie in load_cookies(cookies)
+                if cookie.get('name') in names and (cookie.get('expires') or -1) > 0]
+    if not expiries:
+        return None
+    return datetime.fromtimestamp(min(expiries))
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+"""
+请求重放工具 - HTTP 直连引擎共用的请求模板、cookies 处理和请求发送
+
+各平台网页端的接口参数和签名类请求头由页面脚本生成，HTTP 引擎不自行拼装：
+浏览器引擎成功提交任务时记录页面实际发出的请求作为模板，HTTP 引擎替换其中的提示词、
+上传文件ID等取值后，携带当前账号的 cookies 重放。
+"""
+
+import asyncio
+import json
+import re
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import aiohttp
+
+from backend.config.settings import PLATFORM_COOKIE_DOMAINS
+from backend.core.logger import get_logger
+from backend.utils.async_http_pool import http_pool
+from backend.utils.cookie_util import cookie_header, cookie_values, load_cookies, merge_set_cookie, serialize_cookies
+
+logger = get_logger(__name__)
+
+# 重放时不携带的请求头，cookies 按账号重新设置
+_SKIPPED_HEADERS = {'cookie', 'content-length', 'content-type', 'host', 'accept-encoding', 'connection'}
+
+# 取值至少这么长的 cookie 出现在请求头中时（如 Authorization: Bearer <token>），重放时换成当前账号的值
+_MIN_COOKIE_HEADER_VALUE = 8
+
+_UUID_RE = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.IGNORECASE)
+
+class HttpEngineUnsupported(Exception):
+    """HTTP 引擎无法处理当前请求，需要回退到浏览器引擎"""
+
+class HttpEngineAuthError(HttpEngineUnsupported):
+    """接口返回 401/403，账号登录已失效"""
+
+class HttpEngineSubmitUncertain(Exception):
+    """
+    提交任务的请求已发出，但没有得到远端任务ID（超时、连接中断、接口报错或响应结构不符）
+
+    远端可能已经创建了任务，不能回退到浏览器重新提交，由执行器按未获取到任务ID处理
+    """
+
+def parse_cookie_string(cookies: Optional[str]) -> Dict[str, str]:
+    """解析请求头 Cookie 形式（"name=value; name=value"）的 cookies"""
+    result = {}
+    for pair in (cookies or '').split('; '):
+        if '=' in pair:
+            name, value = pair.split('=', 1)
+            result[name.strip()] = value.strip()
+    return result
+
+def flatten_values(value, prefix: str = '') -> Dict[str, object]:
+    """把 JSON 展开为 {路径: 取值}，例如 {'result.source_id': 'abc'}"""
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        items = ((str(index), item) for index, item in enumerate(value))
+    else:
+        return {prefix: value}
+    flat = {}
+    for key, item in items:
+        flat.update(flatten_values(item, f"{prefix}.{key}" if prefix else key))
+    return flat
+
+def collect_values(value) -> set:
+    """收集请求体中所有叶子取值的字符串形式，包括嵌套在字符串中的 JSON"""
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, list):
+        values = set()
+        for item in value:
+            values |= collect_values(item)
+        return values
+    if isinstance(value, str) and value[:1] in ('{', '['):
+        try:
+            nested = json.loads(value)
+        except ValueError:
+            nested = None
+        if isinstance(nested, (dict, list)):
+            return collect_values(nested)
+    return {str(value)}
+
+def capture_request(url: str, method: str, headers: Dict, body=None, replace: Optional[Dict] = None) -> Dict:
+    """
+    把浏览器发出的请求整理成模板
+
+    参数:
+        url, method, headers: 请求地址、方法和完整请求头（包含 cookie）
+        body: 请求体；JSON 请求体会被解析，其他请求体不保存
+        replace: 重放时需要替换的取值，{用途: 原取值}，例如 {'prompt': '一只猫'}
+    """
+    cookies = parse_cookie_string(next((value for name, value in headers.items() if name.lower() == 'cookie'), ''))
+    template_headers, cookie_headers = {}, {}
+    for name, value in headers.items():
+        if name.lower() in _SKIPPED_HEADERS or name.startswith(':'):
+            continue
+        template_headers[name] = value
+        for cookie_name, cookie_value in cookies.items():
+            if len(cookie_value) >= _MIN_COOKIE_HEADER_VALUE and cookie_value in value:
+                cookie_headers[name] = (cookie_name, cookie_value)
+                break
+
+    payload = None
+    if isinstance(body, str) and body:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = None
+    return {
+        'url': url,
+        'method': method.upper(),
+        'headers': template_headers,
+        'cookie_headers': cookie_headers,
+        'payload': payload,
+        'replace': dict(replace or {})
+    }
+
+def _fill_payload(value, replacements: Dict[str, str], ids: Dict[str, str], counts: Dict[str, int]):
+    """
+    替换请求体中的取值，并为 UUID 形式的提交ID生成新值
+
+    网页端的请求体中常有嵌套在字符串中的 JSON，需要逐层解析后替换。
+    同一个 UUID 在请求体中多次出现时替换成同一个新值，保持引用关系。
+    """
+    if isinstance(value, dict):
+        return {key: _fill_payload(item, replacements, ids, counts) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_fill_payload(item, replacements, ids, counts) for item in value]
+    if not isinstance(value, str):
+        # 数字形式的ID（如上传文件ID）按字符串形式匹配
+        key = str(value) if isinstance(value, int) and not isinstance(value, bool) else None
+        if key in replacements:
+            counts[key] += 1
+            return replacements[key]
+        return value
+    if value in replacements:
+        counts[value] += 1
+        return replacements[value]
+    if _UUID_RE.match(value):
+        return ids.setdefault(value, str(uuid.uuid4()))
+    if value[:1] in ('{', '['):
+        try:
+            nested = json.loads(value)
+        except ValueError:
+            return value
+        if isinstance(nested, (dict, list)):
+            filled = _fill_payload(nested, replacements, ids, counts)
+            return json.dumps(filled, ensure_ascii=False, separators=(',', ':'))
+    return value
+
+def build_request_body(template: Dict, values: Optional[Dict[str, object]] = None) -> Optional[str]:
+    """
+    根据模板生成请求体
+
+    参数:
+        template: capture_request 生成的模板
+        values: {用途: 新取值}，用途需与模板 replace 中的一致
+
+    模板中找不到需要替换的原取值时抛出 HttpEngineUnsupported。
+    """
+    if template['payload'] is None:
+        return None
+    replacements = {}
+    for role, new_value in (values or {}).items():
+        old_value = template['replace'].get(role)
+        if old_value is None or str(old_value) == str(new_value):
+            continue
+        if str(old_value) == '':
+            raise HttpEngineUnsupported(f"请求模板中没有{role}，无法替换")
+        replacements[str(old_value)] = new_value
+
+    counts = {old_value: 0 for old_value in replacements}
+    payload = _fill_payload(template['payload'], replacements, {}, counts)
+    missing = [old_value for old_value, count in counts.items() if not count]
+    if missing:
+        raise HttpEngineUnsupported("请求模板中找不到需要替换的取值")
+    return json.dumps(payload, ensure_ascii=False)
+
+class RequestTemplateStore:
+    """按平台保存请求模板，模板被接口拒绝后在冷却期内不再使用该类型的模板"""
+
+    def __init__(self, platform: str, reject_cooldown: float):
+        self.platform = platform
+        self.reject_cooldown = reject_cooldown
+        self._templates: Dict[tuple, Dict] = {}
+        self._rejected_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def remember(self, kind: str, template: Dict, key: tuple = ()):
+        """保存模板，同一类型和参数组合只保留最新的一份"""
+        with self._lock:
+            self._templates[(kind,) + tuple(key)] = template
+        logger.debug("已记录请求模板", extra={'fields': {'platform': self.platform, 'kind': kind, 'key': key}})
+
+    def get(self, kind: str, key: tuple = ()) -> Optional[Dict]:
+        """获取模板；该类型的模板被拒绝后的冷却期内返回 None"""
+        with self._lock:
+            if self._rejected_until.get(kind, 0) > time.monotonic():
+                return None
+            return self._templates.get((kind,) + tuple(key))
+
+    def reject(self, kind: str, reason: str):
+        """接口拒绝了重放的请求，清除该类型的模板并进入冷却期"""
+        with self._lock:
+            for template_key in [template_key for template_key in self._templates if template_key[0] == kind]:
+                del self._templates[template_key]
+            self._rejected_until[kind] = time.monotonic() + self.reject_cooldown
+        logger.warning("请求模板被接口拒绝，暂停使用HTTP引擎",
+                       extra={'fields': {'platform': self.platform, 'kind': kind, 'reason': reason}})
+
+    def clear(self):
+        """清除所有模板和冷却状态"""
+        with self._lock:
+            self._templates.clear()
+            self._rejected_until.clear()
+
+class ReplayHttpClient:
+    """使用一个账号的 cookies 重放请求模板，响应中的 Set-Cookie 合并到账号 cookies"""
+
+    # 请求发往的域名，模板中的路径和查询参数保持不变；为空时按模板记录的地址发送
+    api_base = ''
+    # 平台标识，决定旧格式 cookies 和未指定域名的 Set-Cookie 使用的域名
+    platform = 'jimeng'
+
+    def __init__(self, cookies: str):
+        self._jar = [dict(cookie) for cookie in load_cookies(cookies, self.platform)]
+
+    @property
+    def cookies(self) -> str:
+        """合并了响应中 Set-Cookie 之后的 cookies，格式与账号保存的相同"""
+        return serialize_cookies(self._jar)
+
+    def rebase_url(self, url: str) -> str:
+        """保留路径和查询参数，域名换成 api_base"""
+        if not self.api_base:
+            return url
+        base = urlsplit(self.api_base)
+        parts = urlsplit(url)
+        return urlunsplit((base.scheme, base.netloc, parts.path, parts.query, ''))
+
+    def build_headers(self, template: Dict) -> Dict[str, str]:
+        """模板请求头加上当前账号的 cookies，由 cookie 派生的请求头换成当前账号的值"""
+        headers = dict(template['headers'])
+        values = cookie_values(self._jar)
+        for name, (cookie_name, old_value) in template.get('cookie_headers', {}).items():
+            if cookie_name not in values:
+                raise HttpEngineUnsupported(f"账号cookies中缺少 {cookie_name}")
+            headers[name] = headers[name].replace(old_value, values[cookie_name])
+        headers['Cookie'] = cookie_header(self._jar)
+        return headers
+
+    async def _send(self, session, method: str, url: str, headers: Dict, data) -> Dict:
+        async with session.request(method, url, data=data, headers=headers) as response:
+            if response.status in (401, 403):
+                raise HttpEngineAuthError(f"接口返回 {response.status}")
+            if response.status != 200:
+                raise HttpEngineUnsupported(f"接口返回 {response.status}")
+            for morsel in response.cookies.values():
+                merge_set_cookie(self._jar, morsel, PLATFORM_COOKIE_DOMAINS[self.platform])
+            try:
+                return await response.json(content_type=None)
+            except ValueError:
+                raise HttpEngineUnsupported("接口响应不是JSON")
+
+    async def replay(self, template: Dict, values: Optional[Dict[str, object]] = None,
+                     url: Optional[str] = None, data=None, submit: bool = False) -> Dict:
+        """
+        重放模板请求并返回 JSON 响应
+
+        参数:
+            template: 请求模板
+            values: 请求体中需要替换的取值，{用途: 新取值}
+            url: 覆盖模板中的请求地址
+            data: 覆盖请求体（如上传文件的表单）
+            submit: 是否为提交任务的请求，请求发出后的失败（401/403 除外）抛出 HttpEngineSubmitUncertain
+        """
+        headers = self.build_headers(template)
+        if data is None:
+            body = build_request_body(template, values)
+            if body is not None:
+                data = body.encode('utf-8')
+                headers['Content-Type'] = 'application/json'
+        try:
+            return await http_pool.run(self._send, template['method'], self.rebase_url(url or template['url']),
+                                       headers, data)
+        except HttpEngineAuthError:
+            raise
+        except (HttpEngineUnsupported, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if not submit:
+                raise
+            raise HttpEngineSubmitUncertain(str(e) or type(e).__name__) from e
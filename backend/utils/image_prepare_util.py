@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+上传图片预处理 - 上传前把图片缩放到平台可用的最大分辨率并转换为通用格式
+
+导入的图片常是 10–30 MB 的相机原图，直接上传耗时长且容易失败。预处理在线程池中执行
+（Pillow 缩放和编码时释放 GIL；不使用进程池，Windows 下子进程会重新导入 app.py 并再次启动任务管理器）：
+按内容摘要缓存结果（同一张图片只处理一次），尺寸和大小都已满足要求的图片直接使用原文件。
+缓存目录按使用时间和磁盘上限定期清理。
+任务排队时即可调用 prefetch 提前处理，执行器上传时通过 prepare_upload_image 取得结果，
+预处理失败时使用原文件。
+"""
+
+import asyncio
+import atexit
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from backend.config.settings import (UPLOAD_IMAGE_PROFILES, UPLOAD_PREPARE_DIR, UPLOAD_PREPARE_WORKERS,
+                                     UPLOAD_PREPARE_MAX_BYTES, UPLOAD_PREPARE_CACHE_MAX_BYTES,
+                                     UPLOAD_PREPARE_CACHE_MAX_AGE, UPLOAD_PREPARE_CACHE_CLEANUP_INTERVAL)
+from backend.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 可直接上传的图片格式
+_PASSTHROUGH_FORMATS = ('JPEG', 'PNG', 'WEBP')
+
+# 内存中记录的预处理结果数上限
+_MAX_TRACKED = 1000
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _prepare_file(path: str, platform: str, profile: Dict, cache_dir: str, max_bytes: int) -> str:
+    """
+    在工作线程中预处理一张图片
+
+    返回值:
+        str: 可直接上传的文件路径（预处理结果或原文件）
+    """
+    from PIL import Image, ImageOps
+
+    max_side = profile['max_side']
+    with Image.open(path) as image:
+        if (image.format in _PASSTHROUGH_FORMATS and max(image.size) <= max_side
+                and os.path.getsize(path) <= max_bytes):
+            return path
+
+        digest = _file_digest(path)
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        ext = 'png' if has_alpha else 'jpg'
+        target = os.path.join(cache_dir, f"{digest}_{platform}_{max_side}.{ext}")
+        if os.path.exists(target):
+            # 更新修改时间，清理缓存时按最近使用时间保留
+            os.utime(target)
+            return target
+
+        # 按 EXIF 方向旋转后缩放，缩放后不再需要 EXIF 方向信息
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        os.makedirs(cache_dir, exist_ok=True)
+        temp = f"{target}.{threading.get_ident()}.tmp"
+        if has_alpha:
+            image.convert('RGBA').save(temp, format='PNG', optimize=True)
+        else:
+            image.convert('RGB').save(temp, format='JPEG', quality=profile['quality'], optimize=True)
+        os.replace(temp, target)
+        return target
+
+def enforce_cache_limit(cache_dir: str = UPLOAD_PREPARE_DIR, max_bytes: int = UPLOAD_PREPARE_CACHE_MAX_BYTES,
+                        max_age: float = UPLOAD_PREPARE_CACHE_MAX_AGE) -> List[str]:
+    """
+    清理预处理结果目录：删除超过 max_age 未使用的文件，总大小仍超过上限时按最近使用时间从旧到新删除
+
+    返回值:
+        List[str]: 被删除的文件名
+    """
+    try:
+        entries = []
+        for entry in os.scandir(cache_dir):
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry))
+    except FileNotFoundError:
+        return []
+
+    now = time.time()
+    total = sum(size for _, size, _ in entries)
+    removed = []
+    for mtime, size, entry in sorted(entries, key=lambda item: item[0]):
+        if total <= max_bytes and now - mtime <= max_age:
+            break
+        try:
+            os.remove(entry.path)
+        except OSError:
+            continue
+        total -= size
+        removed.append(entry.name)
+    if removed:
+        logger.info("清理图片预处理缓存", extra={'fields': {'removed': len(removed), 'remaining_bytes': total}})
+    return removed
+
+class UploadImagePreparer:
+    """上传图片预处理器，按 (文件路径, 修改时间, 大小, 平台) 复用进行中或已完成的预处理"""
+
+    def __init__(self, workers: int = UPLOAD_PREPARE_WORKERS, cache_dir: str = UPLOAD_PREPARE_DIR):
+        self.workers = workers
+        self.cache_dir = cache_dir
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: Dict[Tuple, Future] = {}
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='upload-prepare')
+        return self._executor
+
+    def _reusable(self, future: Optional[Future]) -> bool:
+        """进行中，或已成功且结果文件未被清理"""
+        if future is None:
+            return False
+        if not future.done():
+            return True
+        return future.exception() is None and os.path.exists(future.result())
+
+    def _maybe_cleanup(self):
+        """距上次清理超过 UPLOAD_PREPARE_CACHE_CLEANUP_INTERVAL 时在线程池中清理缓存目录（需持有锁）"""
+        now = time.monotonic()
+        if now - self._last_cleanup < UPLOAD_PREPARE_CACHE_CLEANUP_INTERVAL:
+            return
+        self._last_cleanup = now
+        self._get_executor().submit(enforce_cache_limit, self.cache_dir)
+
+    def submit(self, path: str, platform: str) -> Optional[Future]:
+        """提交预处理，返回 Future；文件不存在或平台没有预处理配置时返回 None"""
+        profile = UPLOAD_IMAGE_PROFILES.get(platform)
+        if not path or profile is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = (os.path.abspath(path), stat.st_mtime, stat.st_size, platform)
+        with self._lock:
+            future = self._futures.get(key)
+            if self._reusable(future):
+                return future
+            try:
+                future = self._get_executor().submit(_prepare_file, path, platform, profile, self.cache_dir,
+                                                     UPLOAD_PREPARE_MAX_BYTES)
+                self._maybe_cleanup()
+            except RuntimeError as e:
+                # 线程池已关闭（服务退出中）
+                logger.debug(f"图片预处理未提交: {str(e)}")
+                return None
+            if len(self._futures) >= _MAX_TRACKED:
+                # 已完成的结果保存在缓存目录中，丢弃后再次提交时直接命中文件
+                self._futures = {k: f for k, f in self._futures.items() if not f.done()}
+            self._futures[key] = future
+        return future
+
+    def prefetch(self, paths: Iterable[str], platform: str):
+        """提前预处理排队中任务的图片，不等待结果"""
+        for path in paths:
+            self.submit(path, platform)
+
+    async def prepare(self, path: str, platform: str) -> str:
+        """
+        获取可直接上传的图片路径
+
+        返回值:
+            str: 预处理后的文件路径；无需处理或预处理失败时返回原路径
+        """
+        future = self.submit(path, platform)
+        if future is None:
+            return path
+        try:
+            prepared = await asyncio.wrap_future(future)
+        except Exception as e:
+            logger.warning(f"图片预处理失败，使用原图上传: {str(e)}", extra={'fields': {'path': path}})
+            return path
+        if prepared != path:
+            logger.info("使用预处理后的图片上传", extra={'fields': {
+                'path': path, 'prepared': prepared,
+                'size': os.path.getsize(path), 'prepared_size': os.path.getsize(prepared)
+            }})
+        return prepared
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+# 全局上传图片预处理器
+upload_image_preparer = UploadImagePreparer()
+atexit.register(upload_image_preparer.shutdown)
+
+async def prepare_upload_image(path: str, platform: str) -> str:
+    """获取可直接上传的图片路径，见 UploadImagePreparer.prepare"""
+    return await upload_image_preparer.prepare(path, platform)
+
+def prefetch_queued_images(model, platform: str, limit: int):
+    """
+    提前预处理排队中任务的上传图片
+
+    参数:
+        model: 任务模型，需提供 get_upload_images()
+        platform: 上传的平台，决定预处理配置
+        limit: 按调度顺序最多处理的排队任务数
+    """
+    try:
+        tasks = model.select_for_dispatch(model.select().where(model.status == 0), limit)
+        for task in tasks:
+            upload_image_preparer.prefetch(task.get_upload_images(), platform)
+    except Exception as e:
+        logger.warning(f"提前预处理排队任务图片失败: {str(e)}")
@@ -7,10 +7,15 @@ import asyncio
 import time
 from typing import Optional, List, Dict, Any
 from backend.utils.base_task_executor import BaseTaskExecutor, TaskResult, ErrorCode, TaskLogger
+from backend.utils.cookie_util import load_cookies
+from backend.utils.image_prepare_util import prepare_upload_image
+from backend.models.models import TASK_PHASE_LOGGED_IN, TASK_PHASE_SUBMITTED, TASK_PHASE_AWAITING_RESULT
 
 class JimengDigitalHumanExecutor(BaseTaskExecutor):
     """即梦数字人生成执行器"""
     
+    resource_platform = 'jimeng'
+    
     def __init__(self, headless: bool = False):
         super().__init__(headless)
         self.task_id = None
@@ -18,22 +23,9 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
         self.generation_completed = False
     
     async def handle_cookies(self, cookies: str):
-        """处理cookies字符串格式"""
+        """设置账号保存的cookies，旧格式字符串使用平台默认域名"""
         try:
-            # 将cookies字符串转换为字典列表格式
-            cookie_pairs = cookies.split('; ')
-            cookie_list = []
-            for pair in cookie_pairs:
-                if '=' in pair:
-                    name, value = pair.split('=', 1)
-                    cookie_list.append({
-                        'name': name.strip(),
-                        'value': value.strip(),
-                        'domain': '.capcut.com',
-                        'path': '/'
-                    })
-            
-            await self.context.add_cookies(cookie_list)
+            await self.context.add_cookies(load_cookies(cookies, self.resource_platform))
             self.logger.info("即梦平台cookies设置成功")
             
         except Exception as e:
@@ -259,6 +251,7 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
                     message="未找到头像上传控件"
                 )
             
+            image_path = await prepare_upload_image(image_path, self.resource_platform)
             await avatar_upload.set_input_files(image_path)
             await asyncio.sleep(2)
             self.logger.info("头像图片上传成功")
@@ -315,12 +308,15 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
         """设置响应监听器"""
         async def handle_response(response):
             if "aigc_draft/generate" in response.url:
+                if response.status in (401, 403):
+                    self.mark_auth_failed(f"生成接口返回 {response.status}")
                 try:
                     data = await response.json()
                     self.logger.info("监测到生成请求响应")
                     if data.get("ret") == "0" and "data" in data and "aigc_data" in data["data"]:
                         self.task_id = data["data"]["aigc_data"]["task"]["task_id"]
                         self.logger.info("获取到任务ID", task_id=self.task_id)
+                        await self.report_checkpoint(TASK_PHASE_SUBMITTED, task_id=self.task_id)
                 except:
                     pass
             
@@ -390,6 +386,7 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
                 
             # 等待数字人视频生成完成
             self.logger.info("已获取任务ID，等待数字人视频生成完成", task_id=self.task_id)
+            await self.report_checkpoint(TASK_PHASE_AWAITING_RESULT, task_id=self.task_id)
             start_time = time.time()
             
             while not self.generation_completed and time.time() - start_time < max_wait_time:
@@ -440,6 +437,7 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
         username = kwargs.get('username')
         password = kwargs.get('password')
         cookies = kwargs.get('cookies')
+        resume_task_id = kwargs.get('resume_task_id')  # 已提交的远端任务ID，存在时直接轮询结果
         
         self.logger.info("开始执行数字人生成任务", 
                         image_path=image_path, audio_path=audio_path)
@@ -472,7 +470,7 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
             if cookies:
                 await self.handle_cookies(cookies)
                 # 检查登录状态
-                login_status_result = await self.check_login_status()
+                login_status_result = await self.check_login_cached()
             
             # 如果没有cookies或cookies检查失败，需要登录
             if not cookies or login_status_result.code == 600:
@@ -487,6 +485,9 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
                 # 如果有cookies，直接设置
                 await self.handle_cookies(cookies)
             
+            # 登录完成，记录断点
+            await self.report_checkpoint(TASK_PHASE_LOGGED_IN)
+            
             # 跳转到数字人生成页面
             nav_result = await self.navigate_to_digital_human_page()
             if nav_result.code != ErrorCode.SUCCESS.value:
@@ -495,6 +496,15 @@ class JimengDigitalHumanExecutor(BaseTaskExecutor):
             # 设置响应监听器
             await self.setup_response_listener()
             
+            # 恢复已提交的任务：跳过提交，直接等待生成结果
+            if resume_task_id:
+                self.logger.info("恢复已提交的任务，直接轮询结果", task_id=resume_task_id)
+                self.task_id = resume_task_id
+                complete_result = await self.wait_for_generation_complete()
+                complete_result.cookies = await self.get_cookies()
+                complete_result.execution_time = time.time() - start_time
+                return complete_result
+            
             # 上传头像图片
             avatar_result = await self.upload_avatar_image(image_path)
             if avatar_result.code != ErrorCode.SUCCESS.value:
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+即梦 HTTP 直连引擎 - 不启动浏览器，直接调用生成接口提交任务并轮询资源列表获取结果
+
+浏览器引擎每次成功提交时记录页面实际发出的生成请求和资源列表请求作为模板（见 http_replay_util），
+HTTP 引擎替换提示词后携带账号 cookies 重放。没有匹配的模板、模板被接口拒绝或响应结构与预期不符时
+抛出 HttpEngineUnsupported，由执行器回退到浏览器引擎；生成请求已发出但没有得到任务ID时抛出
+HttpEngineSubmitUncertain，远端可能已创建任务，不再回退。
+"""
+
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+from backend.config.settings import (JIMENG_API_BASE, JIMENG_HTTP_POLL_INTERVALS, JIMENG_HTTP_MAX_WAIT,
+                                     JIMENG_HTTP_REJECT_COOLDOWN)
+from backend.core.logger import get_logger
+from backend.utils.http_replay_util import (HttpEngineUnsupported, HttpEngineSubmitUncertain, ReplayHttpClient,
+                                            RequestTemplateStore, capture_request)
+
+logger = get_logger(__name__)
+
+# 请求模板类型
+TEMPLATE_GENERATE = 'generate'
+TEMPLATE_ASSET_LIST = 'asset_list'
+
+request_templates = RequestTemplateStore('jimeng', JIMENG_HTTP_REJECT_COOLDOWN)
+
+def remember_request(kind: str, url: str, headers: Dict, body: Optional[str], prompt: str = None,
+                     model: str = None, aspect_ratio: str = None, quality: str = None):
+    """
+    记录浏览器实际发出的请求作为重放模板
+
+    参数:
+        kind: 模板类型，TEMPLATE_GENERATE 或 TEMPLATE_ASSET_LIST
+        url, headers, body: 请求地址、完整请求头和请求体
+        prompt: 生成请求中的提示词，重放时替换
+        model, aspect_ratio, quality: 生成参数，按参数组合分别保存生成请求模板
+    """
+    template = capture_request(url, 'POST', headers, body, replace={'prompt': prompt} if prompt is not None else None)
+    if template['payload'] is None:
+        return
+    key = (model, aspect_ratio, quality) if kind == TEMPLATE_GENERATE else ()
+    request_templates.remember(kind, template, key)
+
+def extract_task_images(data: Dict, task_id: str) -> Optional[List[str]]:
+    """
+    从资源列表响应中提取任务生成的图片地址
+
+    返回值:
+        Optional[List[str]]: 任务尚未完成（或不在列表中）时返回 None；已完成时返回图片地址列表，可能为空
+    """
+    for asset in data["data"]["asset_list"]:
+        if asset.get("id") != task_id:
+            continue
+        image = asset.get("image") or {}
+        if image.get("finish_time", 0) == 0:
+            return None
+        urls = []
+        for item in image.get("item_list") or []:
+            try:
+                urls.append(item["image"]["large_images"][0]["image_url"])
+            except (KeyError, IndexError, TypeError):
+                continue
+        return urls[:4]
+    return None
+
+class JimengHttpClient(ReplayHttpClient):
+    """使用一个账号的 cookies 调用即梦接口"""
+
+    api_base = JIMENG_API_BASE
+
+    async def submit_text2img(self, prompt: str, model: str, aspect_ratio: str, quality: str) -> str:
+        """提交文生图任务，返回远端任务ID"""
+        template = request_templates.get(TEMPLATE_GENERATE, (model, aspect_ratio, quality))
+        if template is None:
+            raise HttpEngineUnsupported("没有当前参数组合可用的生成请求模板")
+
+        data = await self.replay(template, {'prompt': prompt}, submit=True)
+        if data.get("ret") != "0":
+            reason = f"生成接口返回 ret={data.get('ret')} {data.get('errmsg', '')}".strip()
+            request_templates.reject(TEMPLATE_GENERATE, reason)
+            raise HttpEngineSubmitUncertain(reason)
+        try:
+            return data["data"]["aigc_data"]["task"]["task_id"]
+        except (KeyError, TypeError):
+            raise HttpEngineSubmitUncertain("生成接口响应中没有任务ID")
+
+    async def wait_for_images(self, task_id: str, max_wait_time: int = JIMENG_HTTP_MAX_WAIT) -> Optional[List[str]]:
+        """
+        轮询资源列表直到任务完成
+
+        返回值:
+            Optional[List[str]]: 图片地址列表（任务失败时为空列表），等待超时返回 None
+        """
+        template = request_templates.get(TEMPLATE_ASSET_LIST)
+        if template is None:
+            raise HttpEngineUnsupported("没有可用的资源列表请求模板")
+
+        start_time = time.monotonic()
+        attempt = 0
+        while time.monotonic() - start_time < max_wait_time:
+            data = await self.replay(template)
+            try:
+                images = extract_task_images(data, task_id)
+            except (KeyError, TypeError):
+                request_templates.reject(TEMPLATE_ASSET_LIST, "资源列表响应结构不符合预期")
+                raise HttpEngineUnsupported("资源列表响应结构不符合预期")
+            if images is not None:
+                return images
+
+            interval = JIMENG_HTTP_POLL_INTERVALS[min(attempt, len(JIMENG_HTTP_POLL_INTERVALS) - 1)]
+            attempt += 1
+            logger.debug("任务尚未完成，继续轮询", extra={'fields': {'task_id': task_id, 'interval': interval}})
+            await asyncio.sleep(interval)
+        return None
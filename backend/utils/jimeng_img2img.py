@@ -7,10 +7,15 @@ import asyncio
 import time
 from typing import Optional, List, Dict, Any
 from backend.utils.base_task_executor import BaseTaskExecutor, TaskResult, ErrorCode, TaskLogger
+from backend.utils.cookie_util import load_cookies
+from backend.utils.image_prepare_util import prepare_upload_image
+from backend.models.models import TASK_PHASE_LOGGED_IN, TASK_PHASE_SUBMITTED, TASK_PHASE_AWAITING_RESULT
 
 class JimengImg2ImgExecutor(BaseTaskExecutor):
     """即梦图生图执行器"""
     
+    resource_platform = 'jimeng'
+    
     def __init__(self, headless: bool = False):
         super().__init__(headless)
         self.task_id = None
@@ -18,22 +23,9 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
         self.generation_completed = False
     
     async def handle_cookies(self, cookies: str):
-        """处理cookies字符串格式"""
+        """设置账号保存的cookies，旧格式字符串使用平台默认域名"""
         try:
-            # 将cookies字符串转换为字典列表格式
-            cookie_pairs = cookies.split('; ')
-            cookie_list = []
-            for pair in cookie_pairs:
-                if '=' in pair:
-                    name, value = pair.split('=', 1)
-                    cookie_list.append({
-                        'name': name.strip(),
-                        'value': value.strip(),
-                        'domain': '.capcut.com',
-                        'path': '/'
-                    })
-            
-            await self.context.add_cookies(cookie_list)
+            await self.context.add_cookies(load_cookies(cookies, self.resource_platform))
             self.logger.info("即梦平台cookies设置成功")
             
         except Exception as e:
@@ -351,12 +343,15 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
         """设置响应监听器"""
         async def handle_response(response):
             if "aigc_draft/generate" in response.url:
+                if response.status in (401, 403):
+                    self.mark_auth_failed(f"生成接口返回 {response.status}")
                 try:
                     data = await response.json()
                     self.logger.info("监测到生成请求响应")
                     if data.get("ret") == "0" and "data" in data and "aigc_data" in data["data"]:
                         self.task_id = data["data"]["aigc_data"]["task"]["task_id"]
                         self.logger.info("获取到任务ID", task_id=self.task_id)
+                        await self.report_checkpoint(TASK_PHASE_SUBMITTED, task_id=self.task_id)
                 except:
                     pass
             
@@ -437,6 +432,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                 
             # 等待图片生成完成
             self.logger.info("已获取任务ID，等待图片生成完成", task_id=self.task_id)
+            await self.report_checkpoint(TASK_PHASE_AWAITING_RESULT, task_id=self.task_id)
             start_time = time.time()
             
             while not self.generation_completed and time.time() - start_time < max_wait_time:
@@ -483,6 +479,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
         """上传输入图片"""
         try:
             self.logger.info("开始上传输入图片", input_images=input_images, count=len(input_images))
+            input_images = [await prepare_upload_image(image, self.resource_platform) for image in input_images]
             
             # 根据图片数量选择不同的上传方式
             for i, input_image in enumerate(input_images):
@@ -540,6 +537,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
         model = kwargs.get('model', 'Nano Banana')
         aspect_ratio = kwargs.get('aspect_ratio', '1:1')
         cookies = kwargs.get('cookies')
+        resume_task_id = kwargs.get('resume_task_id')  # 已提交的远端任务ID，存在时直接轮询结果
         input_images = kwargs.get('input_images', [])
         
         self.logger.info("开始执行图生图任务", 
@@ -557,7 +555,7 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
             if cookies:
                 await self.handle_cookies(cookies)
                 # 检查登录状态
-                login_status_result = await self.check_login_status()
+                login_status_result = await self.check_login_cached()
             
             # 如果没有cookies或cookies检查失败，需要登录
             if not cookies or login_status_result.code == 600:
@@ -569,6 +567,9 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
                 if validate_result.code != ErrorCode.SUCCESS.value:
                     return validate_result
             
+            # 登录完成，记录断点
+            await self.report_checkpoint(TASK_PHASE_LOGGED_IN)
+            
             # 跳转到生成页面
             nav_result = await self.navigate_to_generation_page()
             if nav_result.code != ErrorCode.SUCCESS.value:
@@ -576,6 +577,15 @@ class JimengImg2ImgExecutor(BaseTaskExecutor):
             
             # 设置响应监听器
             await self.setup_response_listener()
+            
+            # 恢复已提交的任务：跳过提交，直接等待生成结果
+            if resume_task_id:
+                self.logger.info("恢复已提交的任务，直接轮询结果", task_id=resume_task_id)
+                self.task_id = resume_task_id
+                complete_result = await self.wait_for_generation_complete()
+                complete_result.cookies = await self.get_cookies()
+                complete_result.execution_time = time.time() - start_time
+                return complete_result
             # 输入提示词
             prompt_result = await self.input_prompt(prompt)
             if prompt_result.code != ErrorCode.SUCCESS.value:
@@ -5,9 +5,10 @@
 
 import asyncio
 import time
-from playwright.async_api import async_playwright
 from colorama import Fore, Style, init
 
+from backend.utils.cookie_util import load_cookies, serialize_cookies
+
 # 初始化colorama
 init()
 
@@ -55,27 +56,15 @@ async def login_and_wait(username, password, cookies=None):
         print(f"{Fore.YELLOW}正在启动浏览器...{Style.RESET_ALL}")
         config = get_browser_config()
         
+        # 启动浏览器时才导入 Playwright，避免拖慢服务启动
+        from playwright.async_api import async_playwright
         playwright = await async_playwright().start()
         browser = await playwright.chromium.launch(headless=False)  # 设置为False显示浏览器窗口
         context = await browser.new_context(**config)
         
         if cookies:
-            # 处理cookies字符串格式
-            # 将cookies字符串转换为字典列表格式
-            cookie_pairs = cookies.split('; ')
-            cookie_list = []
-            for pair in cookie_pairs:
-                if '=' in pair:
-                    name, value = pair.split('=', 1)
-                    cookie_list.append({
-                        'name': name.strip(),
-                        'value': value.strip(),
-                        'domain': '.capcut.com',
-                        'path': '/'
-                    })
-            cookies_dict = cookie_list
-            
-            await context.add_cookies(cookies_dict)
+            # 账号保存的cookies直接加载，旧格式字符串使用即梦默认域名
+            await context.add_cookies(load_cookies(cookies, 'jimeng'))
             page = await context.new_page()
             print(f"{Fore.GREEN}已加载cookies，正在验证登录状态...{Style.RESET_ALL}")
             
@@ -91,7 +80,7 @@ async def login_and_wait(username, password, cookies=None):
                 
                 # 获取更新后的cookies
                 new_cookies = await context.cookies()
-                cookie_string = "; ".join([f"{cookie['name']}={cookie['value']}" for cookie in new_cookies])
+                cookie_string = serialize_cookies(new_cookies)
                 
                 print(f"{Fore.GREEN}登录完成，浏览器将保持打开状态...{Style.RESET_ALL}")
                 print(f"{Fore.CYAN}Cookies已获取，长度: {len(cookie_string)} 字符{Style.RESET_ALL}")
@@ -210,7 +199,7 @@ async def login_and_wait(username, password, cookies=None):
             
             # 获取cookies
             new_cookies = await context.cookies()
-            cookie_string = "; ".join([f"{cookie['name']}={cookie['value']}" for cookie in new_cookies])
+            cookie_string = serialize_cookies(new_cookies)
             
             print(f"{Fore.GREEN}登录完成，浏览器将保持打开状态...{Style.RESET_ALL}")
             print(f"{Fore.CYAN}Cookies已获取，长度: {len(cookie_string)} 字符{Style.RESET_ALL}")
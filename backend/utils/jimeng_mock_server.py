@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+即梦接口模拟服务 - 按网页端接口的响应结构返回数据，用于本地联调 HTTP 直连引擎
+
+用法:
+    python -m backend.utils.jimeng_mock_server --port 8765
+    JIMENG_API_BASE=http://127.0.0.1:8765 启动后端，并开启配置 jimeng_http_engine_enabled
+
+模拟服务不校验请求体，提交后 finish_delay 秒任务完成，每个任务返回 4 张图片地址。
+没有真实浏览器记录的请求模板时，可调用 install_sample_templates() 注册示例模板。
+"""
+
+import argparse
+import json
+import time
+import uuid
+
+from aiohttp import web
+
+from backend.utils.jimeng_http_client import TEMPLATE_GENERATE, TEMPLATE_ASSET_LIST, remember_request
+
+GENERATE_PATH = '/mweb/v1/aigc_draft/generate'
+ASSET_LIST_PATH = '/mweb/v1/get_asset_list'
+
+# 示例模板中的提示词，重放时被替换
+SAMPLE_PROMPT = '__sample_prompt__'
+
+def create_app(finish_delay: float = 3, fail_prompts=()) -> web.Application:
+    """
+    创建模拟服务
+
+    参数:
+        finish_delay: 任务提交后多少秒完成
+        fail_prompts: 包含这些提示词的任务完成时不返回图片，模拟生成失败
+    """
+    tasks = {}
+
+    def require_cookie(request):
+        if 'sessionid' not in request.headers.get('Cookie', ''):
+            raise web.HTTPUnauthorized(text=json.dumps({'ret': '1014', 'errmsg': 'login required'}),
+                                       content_type='application/json')
+
+    async def generate(request):
+        require_cookie(request)
+        payload = await request.json()
+        draft = json.loads(payload.get('draft_content', '{}'))
+        prompt = draft.get('component_list', [{}])[0].get('prompt', '')
+        task_id = uuid.uuid4().hex
+        tasks[task_id] = {'created': time.time(), 'prompt': prompt}
+        response = web.json_response({
+            'ret': '0',
+            'errmsg': 'success',
+            'data': {'aigc_data': {'task': {'task_id': task_id, 'status': 20}}}
+        })
+        response.set_cookie('msToken', uuid.uuid4().hex)
+        return response
+
+    async def asset_list(request):
+        require_cookie(request)
+        now = time.time()
+        assets = []
+        for task_id, task in sorted(tasks.items(), key=lambda item: item[1]['created'], reverse=True):
+            finished = now - task['created'] >= finish_delay
+            failed = any(word in task['prompt'] for word in fail_prompts)
+            items = [] if failed or not finished else [
+                {'image': {'large_images': [{'image_url': f'https://mock.local/{task_id}/{i}.png'}]}}
+                for i in range(4)
+            ]
+            assets.append({
+                'id': task_id,
+                'image': {'finish_time': int(now) if finished else 0, 'item_list': items}
+            })
+        return web.json_response({'ret': '0', 'data': {'asset_list': assets, 'has_more': False}})
+
+    app = web.Application()
+    app.router.add_post(GENERATE_PATH, generate)
+    app.router.add_post(ASSET_LIST_PATH, asset_list)
+    return app
+
+def install_sample_templates(base_url: str, model: str = 'Image 3.1', aspect_ratio: str = '1:1', quality: str = '1K'):
+    """注册与网页端请求结构相同的示例模板，草稿内容是嵌套在字符串中的 JSON"""
+    component_id = str(uuid.uuid4())
+    draft = {
+        'type': 'draft',
+        'id': str(uuid.uuid4()),
+        'main_component_id': component_id,
+        'component_list': [{'id': component_id, 'prompt': SAMPLE_PROMPT, 'model': model,
+                            'ratio': aspect_ratio, 'quality': quality}]
+    }
+    generate_body = json.dumps({
+        'submit_id': str(uuid.uuid4()),
+        'draft_content': json.dumps(draft, ensure_ascii=False)
+    })
+    headers = {'content-type': 'application/json', 'appid': '513641'}
+    remember_request(TEMPLATE_GENERATE, base_url + GENERATE_PATH, headers, generate_body, prompt=SAMPLE_PROMPT,
+                     model=model, aspect_ratio=aspect_ratio, quality=quality)
+    remember_request(TEMPLATE_ASSET_LIST, base_url + ASSET_LIST_PATH, headers, json.dumps({'count': 20}))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='即梦接口模拟服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--finish-delay', type=float, default=3)
+    args = parser.parse_args()
+    web.run_app(create_app(args.finish_delay), host=args.host, port=args.port)
@@ -6,34 +6,45 @@ based on BaseTaskExecutor refactoring version
 import asyncio
 import time
 from typing import Optional, List, Dict, Any
+
+import aiohttp
+
 from backend.utils.base_task_executor import BaseTaskExecutor, TaskResult, ErrorCode, TaskLogger
+from backend.utils.cookie_util import load_cookies
+from backend.models.models import TASK_PHASE_LOGGED_IN, TASK_PHASE_SUBMITTED, TASK_PHASE_AWAITING_RESULT
+from backend.utils.config_util import get_jimeng_http_engine_enabled
+from backend.utils.http_replay_util import HttpEngineUnsupported, HttpEngineAuthError, HttpEngineSubmitUncertain
+from backend.utils.jimeng_http_client import (JimengHttpClient, TEMPLATE_GENERATE, TEMPLATE_ASSET_LIST,
+                                              remember_request, extract_task_images)
 
 class JimengText2ImageExecutor(BaseTaskExecutor):
     """即梦文本生成图片执行器"""
     
+    resource_platform = 'jimeng'
+    
     def __init__(self, headless: bool = False):
         super().__init__(headless)
         self.task_id = None
         self.image_urls = []
         self.generation_completed = False
+        self.generation_params = None  # 本次提交的生成参数，用于记录HTTP引擎的请求模板
+        self.asset_list_captured = False
+        self.inflight_task_ids = set()  # 批量执行中已提交、尚未完成的远端任务ID
+        self.finished_assets = {}  # 远端任务ID -> 图片地址列表，由响应监听器写入
+        self.submission = None  # 批量执行中正在提交的任务下标
+        self._generate_requests = {}  # 页面发出的生成请求 -> (任务下标, 断点回调, 生成参数)，响应按发出时的任务对应
+    
+    async def _remember_request(self, kind: str, request, **params):
+        """记录页面发出的请求，供HTTP直连引擎重放"""
+        try:
+            remember_request(kind, request.url, await request.all_headers(), request.post_data, **params)
+        except Exception as e:
+            self.logger.debug("记录请求模板失败", kind=kind, error=str(e))
     
     async def handle_cookies(self, cookies: str):
-        """处理cookies字符串格式"""
+        """设置账号保存的cookies，旧格式字符串使用平台默认域名"""
         try:
-            # 将cookies字符串转换为字典列表格式
-            cookie_pairs = cookies.split('; ')
-            cookie_list = []
-            for pair in cookie_pairs:
-                if '=' in pair:
-                    name, value = pair.split('=', 1)
-                    cookie_list.append({
-                        'name': name.strip(),
-                        'value': value.strip(),
-                        'domain': '.capcut.com',
-                        'path': '/'
-                    })
-            
-            await self.context.add_cookies(cookie_list)
+            await self.context.add_cookies(load_cookies(cookies, self.resource_platform))
             self.logger.info("即梦平台cookies设置成功")
             
         except Exception as e:
@@ -346,51 +357,65 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
     
     async def setup_response_listener(self):
         """设置响应监听器"""
+        def handle_request(request):
+            if "aigc_draft/generate" in request.url:
+                # 记录请求发出时正在提交的任务，响应晚于提交超时到达时不会归到下一个任务
+                self._generate_requests[request] = (self.submission, self.checkpoint_callback, self.generation_params)
+        
         async def handle_response(response):
             if "aigc_draft/generate" in response.url:
+                if response.status in (401, 403):
+                    self.mark_auth_failed(f"生成接口返回 {response.status}")
+                submission, checkpoint_callback, generation_params = self._generate_requests.pop(
+                    response.request, (self.submission, self.checkpoint_callback, self.generation_params))
                 try:
                     data = await response.json()
                     self.logger.info("监测到生成请求响应")
                     if data.get("ret") == "0" and "data" in data and "aigc_data" in data["data"]:
-                        self.task_id = data["data"]["aigc_data"]["task"]["task_id"]
-                        self.logger.info("获取到任务ID", task_id=self.task_id)
+                        task_id = data["data"]["aigc_data"]["task"]["task_id"]
+                        # 断点写入发出请求的任务，已结束的任务重试时可直接轮询结果
+                        await self.report_checkpoint(TASK_PHASE_SUBMITTED, callback=checkpoint_callback, task_id=task_id)
+                        if submission != self.submission:
+                            self.logger.warning("生成请求的响应在提交超时后到达，不计入当前任务",
+                                                task_id=task_id, index=submission, current=self.submission)
+                        else:
+                            self.task_id = task_id
+                            self.logger.info("获取到任务ID", task_id=self.task_id)
+                        if generation_params:
+                            await self._remember_request(TEMPLATE_GENERATE, response.request, **generation_params)
                 except:
                     pass
             
-            if "/v1/get_asset_list" in response.url and self.task_id:
+            if "/v1/get_asset_list" in response.url and (self.task_id or self.inflight_task_ids):
                 try:
                     data = await response.json()
                     if "data" in data and "asset_list" in data["data"]:
-                        asset_list = data["data"]["asset_list"]
-                        for asset in asset_list:
-                            if "id" in asset and asset.get("id") == self.task_id:
-                                if "image" in asset and asset["image"].get("finish_time", 0) != 0:
-                                    try:
-                                        self.image_urls = []
-                                        for i in range(4):
-                                            try:
-                                                url = asset["image"]["item_list"][i]["image"]["large_images"][0]["image_url"]
-                                                self.image_urls.append(url)
-                                            except (KeyError, IndexError):
-                                                self.logger.debug(f"无法获取第{i+1}张图片URL")
-                                        
-                                        if self.image_urls:
-                                            self.logger.info("图片生成完成", count=len(self.image_urls))
-                                            for i, url in enumerate(self.image_urls):
-                                                self.logger.info(f"图片{i+1} URL", url=url)
-                                            self.generation_completed = True
-                                        else:
-                                            self.logger.warning("图片已完成但无法获取任何URL")
-                                            self.generation_completed = True  # 标记为完成，即使没有URL
-                                    except (KeyError, IndexError):
-                                        self.logger.warning("图片已完成但无法获取URL")
-                                        self.generation_completed = True  # 标记为完成，即使没有URL
-                                else:
-                                    self.logger.debug("图片生成尚未完成，继续等待")
+                        if not self.asset_list_captured:
+                            self.asset_list_captured = True
+                            await self._remember_request(TEMPLATE_ASSET_LIST, response.request)
+                        # 批量执行时同一页面中有多个生成任务，按任务ID分别记录结果
+                        for task_id in list(self.inflight_task_ids):
+                            images = extract_task_images(data, task_id)
+                            if images is not None:
+                                self.finished_assets[task_id] = images
+                                self.inflight_task_ids.discard(task_id)
+                        images = extract_task_images(data, self.task_id)
+                        if images is None:
+                            self.logger.debug("图片生成尚未完成，继续等待")
+                        else:
+                            self.image_urls = images
+                            if self.image_urls:
+                                self.logger.info("图片生成完成", count=len(self.image_urls))
+                                for i, url in enumerate(self.image_urls):
+                                    self.logger.info(f"图片{i+1} URL", url=url)
+                            else:
+                                self.logger.warning("图片已完成但无法获取任何URL")
+                            self.generation_completed = True  # 标记为完成，即使没有URL
                 except:
                     pass
         
-        # 注册响应监听器
+        # 注册请求和响应监听器
+        self.page.on("request", handle_request)
         self.page.on("response", handle_response)
     
     async def start_generation(self) -> TaskResult:
@@ -411,20 +436,22 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 error_details={"error": str(e)}
             )
     
+    async def wait_for_task_id(self, wait_task_id_time: int = 30) -> Optional[str]:
+        """等待生成请求的响应中返回远端任务ID，超时返回 None"""
+        self.logger.info("等待获取任务ID")
+        task_id_start_time = time.time()
+        
+        while not self.task_id and time.time() - task_id_start_time < wait_task_id_time:
+            elapsed = time.time() - task_id_start_time
+            self.logger.debug(f"等待任务ID中，已等待 {elapsed:.1f} 秒")
+            await asyncio.sleep(1)
+        return self.task_id
+    
     async def wait_for_generation_complete(self, max_wait_time: int = 3600) -> TaskResult:
         """等待生成完成"""
         try:
             # 等待获取到任务ID
-            self.logger.info("等待获取任务ID")
-            wait_task_id_time = 30
-            task_id_start_time = time.time()
-            
-            while not self.task_id and time.time() - task_id_start_time < wait_task_id_time:
-                elapsed = time.time() - task_id_start_time
-                self.logger.debug(f"等待任务ID中，已等待 {elapsed:.1f} 秒")
-                await asyncio.sleep(1)
-            
-            if not self.task_id:
+            if not await self.wait_for_task_id():
                 self.logger.error("未能获取到任务ID，生成可能失败")
                 return TaskResult(
                     code=ErrorCode.TASK_ID_NOT_OBTAINED.value,
@@ -434,6 +461,7 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
                 
             # 等待图片生成完成
             self.logger.info("已获取任务ID，等待图片生成完成", task_id=self.task_id)
+            await self.report_checkpoint(TASK_PHASE_AWAITING_RESULT, task_id=self.task_id)
             start_time = time.time()
             
             while not self.generation_completed and time.time() - start_time < max_wait_time:
@@ -477,7 +505,184 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
             )
     
     async def execute(self, **kwargs) -> TaskResult:
-        """执行文本生成图片任务"""
+        """执行文本生成图片任务，开启HTTP直连引擎时优先使用，不支持时回退到浏览器"""
+        if kwargs.get('cookies') and get_jimeng_http_engine_enabled():
+            http_result = await self.execute_http(**kwargs)
+            if http_result is not None:
+                return http_result
+            if self.task_id:
+                # 已经提交成功，浏览器只需要轮询结果
+                kwargs['resume_task_id'] = self.task_id
+        return await self.execute_browser(**kwargs)
+    
+    async def execute_http(self, **kwargs) -> Optional[TaskResult]:
+        """
+        使用HTTP直连引擎执行任务
+        
+        返回值:
+            Optional[TaskResult]: 执行结果；HTTP引擎不支持当前请求时返回 None，由调用方回退到浏览器引擎
+        """
+        start_time = time.time()
+        prompt = kwargs.get('prompt')
+        model = kwargs.get('model', 'Image 3.1')
+        aspect_ratio = kwargs.get('aspect_ratio', '1:1')
+        quality = kwargs.get('quality', '1K')
+        resume_task_id = kwargs.get('resume_task_id')
+        client = JimengHttpClient(kwargs.get('cookies'))
+        
+        try:
+            if resume_task_id:
+                self.task_id = resume_task_id
+            else:
+                async with self.span('http_submit'):
+                    self.task_id = await client.submit_text2img(prompt, model, aspect_ratio, quality)
+                self.logger.info("HTTP引擎提交成功", task_id=self.task_id)
+                await self.report_checkpoint(TASK_PHASE_SUBMITTED, task_id=self.task_id)
+            
+            await self.report_checkpoint(TASK_PHASE_AWAITING_RESULT, task_id=self.task_id)
+            async with self.span('http_wait_for_result'):
+                images = await client.wait_for_images(self.task_id)
+        except HttpEngineAuthError as e:
+            self.mark_auth_failed(f"HTTP引擎{str(e)}")
+            return None
+        except HttpEngineSubmitUncertain as e:
+            # 生成请求可能已被接受，回退到浏览器会重复提交
+            self.logger.error("HTTP引擎提交后未获取到任务ID", error=str(e))
+            return TaskResult(
+                code=ErrorCode.TASK_ID_NOT_OBTAINED.value,
+                data=None,
+                message=f"HTTP引擎提交后未获取到任务ID: {str(e)}",
+                execution_time=time.time() - start_time,
+                cookies=client.cookies
+            )
+        except HttpEngineUnsupported as e:
+            self.logger.info("HTTP引擎不支持当前请求，回退到浏览器引擎", reason=str(e), task_id=self.task_id)
+            return None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.warning("HTTP引擎请求失败，回退到浏览器引擎", error=str(e) or type(e).__name__, task_id=self.task_id)
+            return None
+        
+        elapsed = time.time() - start_time
+        if images:
+            self.image_urls = images
+            self.generation_completed = True
+            self.logger.info("图片生成成功", engine="http", total_time=f"{elapsed:.1f}秒", count=len(images))
+            return TaskResult(
+                code=ErrorCode.SUCCESS.value,
+                data=images,
+                message="图片生成成功",
+                execution_time=elapsed,
+                cookies=client.cookies
+            )
+        if images is None:
+            self.logger.warning("等待超时，任务未完成", engine="http", task_id=self.task_id)
+        else:
+            self.logger.error("任务已完成但未获取到图片URL", engine="http", task_id=self.task_id)
+        return TaskResult(
+            code=ErrorCode.GENERATION_FAILED.value,
+            data=None,
+            message="当前任务生成失败，请手动生成",
+            execution_time=elapsed,
+            cookies=client.cookies
+        )
+    
+    async def _open_session(self, username: str, password: str, cookies: Optional[str]) -> TaskResult:
+        """启动浏览器、登录并进入生成页面，设置响应监听器"""
+        # 初始化浏览器
+        init_result = await self.init_browser(cookies)
+        if init_result.code != ErrorCode.SUCCESS.value:
+            return init_result
+        
+        # 如果有cookies，先设置cookies并检查登录状态
+        if cookies:
+            await self.handle_cookies(cookies)
+            # 检查登录状态
+            login_status_result = await self.check_login_cached()
+        
+        # 如果没有cookies或cookies检查失败，需要登录
+        if not cookies or login_status_result.code == 600:
+            login_result = await self.perform_login(username, password)
+            if login_result.code != ErrorCode.SUCCESS.value:
+                return login_result
+            
+            validate_result = await self.validate_login_success()
+            if validate_result.code != ErrorCode.SUCCESS.value:
+                return validate_result
+        
+        # 登录完成，记录断点
+        await self.report_checkpoint(TASK_PHASE_LOGGED_IN)
+        
+        # 跳转到生成页面
+        nav_result = await self.navigate_to_generation_page()
+        if nav_result.code != ErrorCode.SUCCESS.value:
+            return nav_result
+        
+        # 设置响应监听器
+        await self.setup_response_listener()
+        return TaskResult(code=ErrorCode.SUCCESS.value, data=None, message="会话已就绪")
+    
+    async def _submit_in_session(self, prompt: str, model: str, aspect_ratio: str, quality: str) -> TaskResult:
+        """在已进入生成页面的会话中输入提示词、选择参数并点击生成"""
+        # 输入提示词
+        self.generation_params = {'prompt': prompt, 'model': model, 'aspect_ratio': aspect_ratio, 'quality': quality}
+        prompt_result = await self.input_prompt(prompt)
+        if prompt_result.code != ErrorCode.SUCCESS.value:
+            return prompt_result
+        
+        # 选择模型
+        model_result = await self.select_model(model)
+        if model_result.code != ErrorCode.SUCCESS.value:
+            return model_result
+        
+        # 选择比例
+        ratio_result = await self.select_aspect_ratio(aspect_ratio)
+        if ratio_result.code != ErrorCode.SUCCESS.value:
+            return ratio_result
+        
+        # 开始生成
+        return await self.start_generation()
+    
+    async def _generate_in_session(self, prompt: str, model: str, aspect_ratio: str, quality: str) -> TaskResult:
+        """在已进入生成页面的会话中提交一个提示词并等待结果"""
+        gen_result = await self._submit_in_session(prompt, model, aspect_ratio, quality)
+        if gen_result.code != ErrorCode.SUCCESS.value:
+            return gen_result
+        
+        # 等待生成完成
+        return await self.wait_for_generation_complete()
+    
+    def _exception_result(self, e: Exception, start_time: float) -> TaskResult:
+        """把浏览器执行中的异常转换为执行结果"""
+        if isinstance(e, asyncio.TimeoutError):
+            self.logger.error("Playwright等待超时", error=str(e))
+            return TaskResult(
+                code=ErrorCode.WEB_INTERACTION_FAILED.value,
+                data=None,
+                message=f"Playwright等待超时: {str(e)}",
+                execution_time=time.time() - start_time
+            )
+        
+        error_msg = str(e)
+        self.logger.error("生成图片时出错", error=error_msg)
+        
+        # 根据错误信息判断错误类型
+        if "selector" in error_msg.lower() or "element" in error_msg.lower() or "not found" in error_msg.lower():
+            error_code = ErrorCode.WEB_INTERACTION_FAILED.value
+        elif "timeout" in error_msg.lower():
+            error_code = ErrorCode.WEB_INTERACTION_FAILED.value
+        else:
+            error_code = ErrorCode.OTHER_ERROR.value
+            
+        return TaskResult(
+            code=error_code,
+            data=None,
+            message=f"生成图片时出错: {error_msg}",
+            execution_time=time.time() - start_time,
+            error_details={"error": error_msg}
+        )
+    
+    async def execute_browser(self, **kwargs) -> TaskResult:
+        """使用浏览器执行文本生成图片任务"""
         start_time = time.time()
         
         # 提取参数
@@ -488,102 +693,185 @@ class JimengText2ImageExecutor(BaseTaskExecutor):
         aspect_ratio = kwargs.get('aspect_ratio', '1:1')
         quality = kwargs.get('quality', '1K')
         cookies = kwargs.get('cookies')
+        resume_task_id = kwargs.get('resume_task_id')  # 已提交的远端任务ID，存在时直接轮询结果
         
         self.logger.info("开始执行文本生成图片任务", 
                         prompt=prompt, model=model, 
                         aspect_ratio=aspect_ratio, quality=quality)
         
         try:
-            # 初始化浏览器
-            init_result = await self.init_browser(cookies)
-            if init_result.code != ErrorCode.SUCCESS.value:
-                return init_result
-            
-            # 如果有cookies，先设置cookies并检查登录状态
-            if cookies:
-                await self.handle_cookies(cookies)
-                # 检查登录状态
-                login_status_result = await self.check_login_status()
-            
-            # 如果没有cookies或cookies检查失败，需要登录
-            if not cookies or login_status_result.code == 600:
-                login_result = await self.perform_login(username, password)
-                if login_result.code != ErrorCode.SUCCESS.value:
-                    return login_result
-                
-                validate_result = await self.validate_login_success()
-                if validate_result.code != ErrorCode.SUCCESS.value:
-                    return validate_result
-            
-            # 跳转到生成页面
-            nav_result = await self.navigate_to_generation_page()
-            if nav_result.code != ErrorCode.SUCCESS.value:
-                return nav_result
-            
-            # 设置响应监听器
-            await self.setup_response_listener()
-            
-            # 输入提示词
-            prompt_result = await self.input_prompt(prompt)
-            if prompt_result.code != ErrorCode.SUCCESS.value:
-                return prompt_result
-            
-            # 选择模型
-            model_result = await self.select_model(model)
-            if model_result.code != ErrorCode.SUCCESS.value:
-                return model_result
-            
-            # 选择比例
-            ratio_result = await self.select_aspect_ratio(aspect_ratio)
-            if ratio_result.code != ErrorCode.SUCCESS.value:
-                return ratio_result
-            
-            # 开始生成
-            gen_result = await self.start_generation()
-            if gen_result.code != ErrorCode.SUCCESS.value:
-                return gen_result
-            
-            # 等待生成完成
-            complete_result = await self.wait_for_generation_complete()
+            session_result = await self._open_session(username, password, cookies)
+            if session_result.code != ErrorCode.SUCCESS.value:
+                return session_result
+            
+            # 恢复已提交的任务：跳过提交，直接等待生成结果
+            if resume_task_id:
+                self.logger.info("恢复已提交的任务，直接轮询结果", task_id=resume_task_id)
+                self.task_id = resume_task_id
+                complete_result = await self.wait_for_generation_complete()
+            else:
+                complete_result = await self._generate_in_session(prompt, model, aspect_ratio, quality)
             
             # 获取最新的cookies
-            final_cookies = await self.get_cookies()
-            complete_result.cookies = final_cookies
+            complete_result.cookies = await self.get_cookies()
             complete_result.execution_time = time.time() - start_time
-            
             return complete_result
             
-        except asyncio.TimeoutError as e:
-            self.logger.error("Playwright等待超时", error=str(e))
-            return TaskResult(
-                code=ErrorCode.WEB_INTERACTION_FAILED.value,
-                data=None,
-                message=f"Playwright等待超时: {str(e)}",
-                execution_time=time.time() - start_time
-            )
         except Exception as e:
-            error_msg = str(e)
-            self.logger.error("生成图片时出错", error=error_msg)
-            
-            # 根据错误信息判断错误类型
-            if "selector" in error_msg.lower() or "element" in error_msg.lower() or "not found" in error_msg.lower():
-                error_code = ErrorCode.WEB_INTERACTION_FAILED.value
-            elif "timeout" in error_msg.lower():
-                error_code = ErrorCode.WEB_INTERACTION_FAILED.value
-            else:
-                error_code = ErrorCode.OTHER_ERROR.value
+            return self._exception_result(e, start_time)
+        
+        finally:
+            await self.close_browser()
+    
+    async def execute_batch(self, items: List[Dict[str, Any]], username: str, password: str,
+                            cookies: Optional[str] = None, on_result=None, max_in_flight: int = 1,
+                            max_wait_time: int = 3600) -> List[TaskResult]:
+        """
+        在同一账号的一个登录会话中执行多个文生图任务
+        
+        只启动一次浏览器、检查一次登录并进入一次生成页面。每个任务输入提示词、选择参数、点击生成，
+        拿到远端任务ID后即可提交下一个，页面中最多同时有 max_in_flight 个生成任务；
+        资源列表中出现的结果按远端任务ID对应回各自的任务。max_in_flight 为 1 时依次执行。
+        
+        参数:
+            items: 任务参数列表，每项包含 prompt、model、aspect_ratio、quality，
+                可选 checkpoint_callback、timing_callback（同 set_checkpoint_callback/set_timing_callback）
+            username, password, cookies: 账号信息
+            on_result: 异步回调 on_result(index, TaskResult)，每个任务结束时立即调用
+            max_in_flight: 页面中同时进行的生成任务数上限
+            max_wait_time: 每个任务提交后等待结果的最长时间（秒）
+        
+        返回值:
+            List[TaskResult]: 与 items 一一对应的执行结果
+        """
+        results: List[Optional[TaskResult]] = [None] * len(items)
+        inflight: Dict[str, tuple] = {}  # 远端任务ID -> (任务下标, 提交时间)
+        runs: Dict[int, tuple] = {}  # 任务下标 -> (阶段耗时, 开始计时时间)，同时进行的任务各自计时
+        
+        def activate(index: int):
+            """之后记录的阶段耗时归入该任务，第一次调用时开始计时"""
+            if index not in runs:
+                runs[index] = ([], time.perf_counter())
+            self.spans, self._run_started = runs[index]
+        
+        async def finish(index: int, result: TaskResult):
+            if result.cookies is None and self.context:
+                result.cookies = await self.get_cookies()
+            activate(index)
+            self.timing_callback = items[index].get('timing_callback')
+            self.complete_run(result)
+            results[index] = result
+            if on_result:
+                await on_result(index, result)
+            # 不属于任何任务的阶段（如轮询结果）不记录；登录失效的状态保留到批量结束
+            self.spans = []
+            self.login_check_skipped = False
+        
+        async def submit(index: int) -> TaskResult:
+            """提交一个任务，成功时加入 inflight 并返回成功结果"""
+            item = items[index]
+            activate(index)
+            start_time = time.time()
+            self.checkpoint_callback = item.get('checkpoint_callback')
+            self.submission = index
+            self.task_id = None
+            try:
+                result = await self._submit_in_session(item['prompt'], item.get('model', 'Image 3.1'),
+                                                       item.get('aspect_ratio', '1:1'), item.get('quality', '1K'))
+                if result.code == ErrorCode.SUCCESS.value and not await self.wait_for_task_id():
+                    self.logger.error("未能获取到任务ID，生成可能失败", index=index)
+                    result = TaskResult(code=ErrorCode.TASK_ID_NOT_OBTAINED.value, data=None, message="任务ID等待超时")
+            except Exception as e:
+                result = self._exception_result(e, start_time)
+            if result.code == ErrorCode.SUCCESS.value:
+                inflight[self.task_id] = (index, time.time())
+                self.inflight_task_ids.add(self.task_id)
+                await self.report_checkpoint(TASK_PHASE_AWAITING_RESULT, task_id=self.task_id)
+                self.logger.info("任务已提交", index=index, task_id=self.task_id, in_flight=len(inflight))
+            result.execution_time = time.time() - start_time
+            return result
+        
+        async def collect():
+            """刷新页面触发资源列表请求，结束已完成或等待超时的任务"""
+            await self.page.reload()
+            await asyncio.sleep(5)
+            now = time.time()
+            for task_id, (index, submitted_at) in list(inflight.items()):
+                images = self.finished_assets.pop(task_id, None)
+                if images is None and now - submitted_at < max_wait_time:
+                    continue
+                del inflight[task_id]
+                self.inflight_task_ids.discard(task_id)
+                if images:
+                    self.logger.info("图片生成成功", task_id=task_id, count=len(images))
+                    result = TaskResult(code=ErrorCode.SUCCESS.value, data=images, message="图片生成成功")
+                else:
+                    self.logger.error("任务未完成或未获取到图片URL", task_id=task_id, timeout=images is None)
+                    result = TaskResult(code=ErrorCode.GENERATION_FAILED.value, data=None,
+                                        message="当前任务生成失败，请手动生成")
+                result.execution_time = now - submitted_at
+                await finish(index, result)
+        
+        self.begin_run()
+        if items:
+            # 建立会话的耗时计入第一个任务
+            runs[0] = (self.spans, self._run_started)
+        self.inflight_task_ids = set()
+        self.finished_assets = {}
+        self.logger.info("开始批量执行文本生成图片任务", count=len(items), username=username, max_in_flight=max_in_flight)
+        
+        try:
+            start_time = time.time()
+            self.checkpoint_callback = items[0].get('checkpoint_callback') if items else None
+            try:
+                session_result = await self._open_session(username, password, cookies)
+            except Exception as e:
+                session_result = self._exception_result(e, start_time)
+            
+            next_index = 0
+            while next_index < len(items) or inflight:
+                if session_result.code != ErrorCode.SUCCESS.value:
+                    # 会话建立失败或页面已不可用：未提交的任务使用同一结果；
+                    # 已提交的任务保留断点（远端任务ID），返回页面交互失败由管理器重试时恢复轮询
+                    failed = list(range(next_index, len(items))) + [index for index, _ in inflight.values()]
+                    inflight.clear()
+                    next_index = len(items)
+                    for index in sorted(failed):
+                        await finish(index, TaskResult(code=session_result.code, data=None,
+                                                       message=session_result.message,
+                                                       error_details=session_result.error_details))
+                    break
                 
-            return TaskResult(
-                code=error_code,
-                data=None,
-                message=f"生成图片时出错: {error_msg}",
-                execution_time=time.time() - start_time,
-                error_details={"error": error_msg}
-            )
+                if next_index < len(items) and len(inflight) < max_in_flight:
+                    index = next_index
+                    next_index += 1
+                    result = await submit(index)
+                    if self.auth_failed:
+                        # 登录已失效，剩余任务不再提交
+                        session_result = TaskResult(code=ErrorCode.WEB_INTERACTION_FAILED.value, data=None,
+                                                    message="批量执行中账号登录失效")
+                    elif result.code == ErrorCode.WEB_INTERACTION_FAILED.value:
+                        # 页面交互失败时页面状态未知，重新进入生成页面后继续
+                        try:
+                            session_result = await self.navigate_to_generation_page()
+                        except Exception as e:
+                            session_result = self._exception_result(e, time.time())
+                    if result.code != ErrorCode.SUCCESS.value:
+                        await finish(index, result)
+                    continue
+                
+                try:
+                    await collect()
+                except Exception as e:
+                    session_result = self._exception_result(e, time.time())
+            
+            return results
         
         finally:
+            self.inflight_task_ids = set()
+            self.submission = None
             await self.close_browser()
-
+    
     async def run(self, **kwargs) -> TaskResult:
         """运行任务的入口方法"""
         return await self.execute(**kwargs)
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+登录状态缓存 - 记录每个账号的 cookies 最近一次被证明有效的时间
+
+在有效期内的账号跳过 check_login_status（打开首页、等待网络空闲再检查登录按钮），
+执行中发现登录失效时立即作废，下一次任务重新检查。
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+
+from backend.config.settings import LOGIN_STATE_FRESH_SECONDS
+
+_validated_at: Dict[str, float] = {}
+_lock = threading.Lock()
+
+def mark_login_valid(account_key: str):
+    """记录账号登录状态刚被证明有效"""
+    with _lock:
+        _validated_at[account_key] = time.monotonic()
+
+def invalidate_login(account_key: str):
+    """作废账号的登录状态缓存"""
+    with _lock:
+        _validated_at.pop(account_key, None)
+
+def is_login_fresh(account_key: str, fresh_seconds: Optional[float] = None) -> bool:
+    """账号登录状态是否仍在有效期内"""
+    if fresh_seconds is None:
+        fresh_seconds = LOGIN_STATE_FRESH_SECONDS
+    if fresh_seconds <= 0:
+        return False
+    with _lock:
+        validated_at = _validated_at.get(account_key)
+    return validated_at is not None and time.monotonic() - validated_at < fresh_seconds
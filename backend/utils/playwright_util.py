@@ -6,42 +6,235 @@ Playwright工具模块
 
 import os
 import sys
+import json
 import subprocess
 import importlib.util
+from datetime import datetime
 from pathlib import Path
 
+from backend.config.settings import PLAYWRIGHT_STAMP_FILE
 
-def is_playwright_installed():
-    """检查Playwright是否已安装"""
+
+# 需要检查的浏览器（browsers.json 中的名称）
+REQUIRED_BROWSERS = ('chromium', 'chromium-headless-shell')
+
+# Playwright 下载完成后在浏览器目录中写入的标记文件
+INSTALLATION_MARKER = 'INSTALLATION_COMPLETE'
+
+# 进程内缓存的检查结果 (安装指纹, 是否可用)
+_verified_cache = None
+
+
+def _get_package_dir():
+    """获取playwright包目录，未安装时返回None"""
+    spec = importlib.util.find_spec("playwright")
+    if spec is None or not spec.origin:
+        return None
+    return Path(spec.origin).parent
+
+
+def _get_package_version():
+    """获取playwright包版本"""
     try:
-        # 检查playwright包是否已安装
-        spec = importlib.util.find_spec("playwright")
-        if spec is None:
+        from importlib.metadata import version
+        return version("playwright")
+    except Exception:
+        return None
+
+
+def _get_browsers_path(package_dir):
+    """获取浏览器安装目录，规则与Playwright一致"""
+    env_path = os.environ.get('PLAYWRIGHT_BROWSERS_PATH')
+    if env_path == '0':
+        return package_dir / 'driver' / 'package' / '.local-browsers'
+    if env_path:
+        return Path(env_path)
+    
+    if sys.platform == 'win32':
+        return Path(os.environ.get('LOCALAPPDATA', Path.home() / 'AppData' / 'Local')) / 'ms-playwright'
+    if sys.platform == 'darwin':
+        return Path.home() / 'Library' / 'Caches' / 'ms-playwright'
+    return Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache')) / 'ms-playwright'
+
+
+def _find_chromium_executable(browser_dir):
+    """在浏览器目录中查找Chromium可执行文件"""
+    candidates = [
+        'chrome-linux/chrome',
+        'chrome-linux64/chrome',
+        'chrome-win/chrome.exe',
+        'chrome-win64/chrome.exe',
+        'chrome-mac/Chromium.app/Contents/MacOS/Chromium',
+        'chrome-mac-arm64/Google Chrome for Testing.app/Contents/MacOS/Google Chrome for Testing',
+        'chrome-mac-x64/Google Chrome for Testing.app/Contents/MacOS/Google Chrome for Testing',
+    ]
+    for candidate in candidates:
+        executable = browser_dir / candidate
+        if executable.exists():
+            return executable
+    return None
+
+
+def probe_playwright_installation():
+    """
+    检查磁盘上的Playwright安装情况，不启动浏览器
+
+    返回值:
+        dict: 包含包版本、驱动版本、浏览器目录及各浏览器是否下载完成
+    """
+    probe = {
+        "package_installed": False,
+        "version": None,
+        "driver_version": None,
+        "driver_path": None,
+        "browsers_path": None,
+        "browsers": {},
+        "browser_path": None,
+        "complete": False
+    }
+    
+    package_dir = _get_package_dir()
+    if package_dir is None:
+        return probe
+    
+    probe["package_installed"] = True
+    probe["version"] = _get_package_version()
+    
+    driver_package = package_dir / 'driver' / 'package'
+    try:
+        with open(driver_package / 'package.json', 'r', encoding='utf-8') as f:
+            probe["driver_version"] = json.load(f).get('version')
+    except Exception:
+        pass
+    
+    driver_dir = package_dir / 'driver'
+    for driver_name in ('node.exe', 'node'):
+        if (driver_dir / driver_name).exists():
+            probe["driver_path"] = str(driver_dir / driver_name)
+            break
+    
+    try:
+        with open(driver_package / 'browsers.json', 'r', encoding='utf-8') as f:
+            browsers = {item['name']: item for item in json.load(f).get('browsers', [])}
+    except Exception as e:
+        print(f"读取Playwright浏览器清单失败: {e}")
+        return probe
+    
+    browsers_path = _get_browsers_path(package_dir)
+    probe["browsers_path"] = str(browsers_path)
+    
+    complete = True
+    for name in REQUIRED_BROWSERS:
+        if name not in browsers:
+            continue
+        revision = browsers[name]['revision']
+        browser_dir = browsers_path / f"{name.replace('-', '_')}-{revision}"
+        installed = (browser_dir / INSTALLATION_MARKER).exists()
+        probe["browsers"][name] = {
+            "revision": revision,
+            "path": str(browser_dir),
+            "installed": installed
+        }
+        complete = complete and installed
+        
+        if name == 'chromium' and installed:
+            executable = _find_chromium_executable(browser_dir)
+            probe["browser_path"] = str(executable) if executable else None
+    
+    probe["complete"] = complete and bool(probe["browsers"])
+    return probe
+
+
+def _get_fingerprint(probe):
+    """安装指纹：包版本、驱动版本和浏览器版本，任一变化都视为升级"""
+    return {
+        "version": probe["version"],
+        "driver_version": probe["driver_version"],
+        "browsers_path": probe["browsers_path"],
+        "revisions": {name: item["revision"] for name, item in probe["browsers"].items()}
+    }
+
+
+def _read_stamp():
+    """读取上次启动验证通过时的安装指纹"""
+    try:
+        with open(PLAYWRIGHT_STAMP_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f).get('fingerprint')
+    except Exception:
+        return None
+
+
+def _write_stamp(fingerprint):
+    """记录启动验证通过的安装指纹"""
+    try:
+        os.makedirs(os.path.dirname(PLAYWRIGHT_STAMP_FILE), exist_ok=True)
+        with open(PLAYWRIGHT_STAMP_FILE, 'w', encoding='utf-8') as f:
+            json.dump({
+                'fingerprint': fingerprint,
+                'verified_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            }, f, ensure_ascii=False, indent=2)
+    except Exception as e:
+        print(f"写入Playwright检查记录失败: {e}")
+
+
+def _launch_test():
+    """启动并关闭一次浏览器，验证安装可用"""
+    try:
+        from playwright.sync_api import sync_playwright
+        with sync_playwright() as p:
+            # 尝试启动浏览器，如果成功则说明已安装
+            browser = p.chromium.launch(headless=True)
+            browser.close()
+            print("Playwright已正确安装并可以启动浏览器")
+            return True
+    except Exception as e:
+        # 如果启动失败，可能是浏览器未安装
+        error_msg = str(e).lower()
+        if "executable doesn't exist" in error_msg or "browser executable" in error_msg:
+            print("Playwright浏览器未安装")
+        else:
+            print(f"检查Playwright时出错: {e}")
+        return False
+
+
+def is_playwright_installed(force_launch=False):
+    """
+    检查Playwright是否已安装
+
+    先检查磁盘上的包和浏览器文件；安装指纹与上次验证通过时一致则直接返回，
+    只有首次检查或升级后才启动浏览器验证。
+
+    参数:
+        force_launch: 是否忽略缓存，强制启动浏览器验证
+    """
+    global _verified_cache
+    
+    try:
+        probe = probe_playwright_installation()
+        if not probe["package_installed"]:
             print("Playwright包未安装")
             return False
         
-        # 简单检查：尝试启动一个浏览器实例
-        try:
-            from playwright.sync_api import sync_playwright
-            with sync_playwright() as p:
-                # 尝试启动浏览器，如果成功则说明已安装
-                browser = p.chromium.launch(headless=True)
-                browser.close()
-                print("Playwright已正确安装并可以启动浏览器")
+        if not probe["complete"]:
+            missing = [name for name, item in probe["browsers"].items() if not item["installed"]]
+            print(f"Playwright浏览器未安装: {', '.join(missing) or '未知'}")
+            return False
+        
+        fingerprint = _get_fingerprint(probe)
+        if not force_launch:
+            if _verified_cache and _verified_cache[0] == fingerprint:
+                return _verified_cache[1]
+            if _read_stamp() == fingerprint:
+                _verified_cache = (fingerprint, True)
                 return True
-        except Exception as e:
-            # 如果启动失败，可能是浏览器未安装
-            error_msg = str(e).lower()
-            if "executable doesn't exist" in error_msg or "browser executable" in error_msg:
-                print("Playwright浏览器未安装")
-                return False
-            else:
-                print(f"检查Playwright时出错: {e}")
-                return False
+        
+        # 首次检查或升级后，启动一次浏览器验证
+        verified = _launch_test()
+        _verified_cache = (fingerprint, verified)
+        if verified:
+            _write_stamp(fingerprint)
+        return verified
             
-    except ImportError:
-        print("Playwright包未安装")
-        return False
     except Exception as e:
         print(f"检查Playwright安装状态时出错: {e}")
         return False
@@ -106,7 +299,7 @@ def ensure_playwright_installed():
             print(f"第 {attempt + 1} 次尝试安装Playwright...")
         
         if install_playwright():
-            # 安装成功后再次检查
+            # 安装成功后再次检查，浏览器版本变化会触发启动验证
             if is_playwright_installed():
                 print("Playwright安装并验证成功!")
                 return True
@@ -127,35 +320,21 @@ def get_playwright_info():
     info = {
         "installed": False,
         "version": None,
+        "driver_version": None,
         "browser_path": None,
         "driver_path": None
     }
     
     try:
-        # 获取版本信息
-        import playwright
-        info["version"] = playwright.__version__
+        # 版本和路径信息都从磁盘读取，不启动浏览器
+        probe = probe_playwright_installation()
+        info["version"] = probe["version"]
+        info["driver_version"] = probe["driver_version"]
+        info["driver_path"] = probe["driver_path"]
+        info["browser_path"] = probe["browser_path"]
         
         # 检查是否已安装
         info["installed"] = is_playwright_installed()
-        
-        # 如果已安装，尝试获取更多信息
-        if info["installed"]:
-            try:
-                from playwright._impl._driver import compute_driver_executable
-                info["driver_path"] = str(compute_driver_executable())
-            except:
-                pass
-            
-            try:
-                from playwright.sync_api import sync_playwright
-                with sync_playwright() as p:
-                    # 安全地获取浏览器路径
-                    browser_path = getattr(p.chromium, 'executable_path', None)
-                    if browser_path:
-                        info["browser_path"] = str(browser_path)
-            except:
-                pass
                 
     except Exception as e:
         print(f"获取Playwright信息时出错: {e}")
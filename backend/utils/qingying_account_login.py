@@ -5,9 +5,10 @@
 
 import asyncio
 import time
-from playwright.async_api import async_playwright
 from colorama import Fore, Style, init
 
+from backend.utils.cookie_util import serialize_cookies
+
 # 初始化colorama
 init()
 
@@ -36,6 +37,8 @@ async def login_and_get_cookie(headless=True):
         # 初始化浏览器
         print(f"{Fore.YELLOW}正在启动浏览器...{Style.RESET_ALL}")
         
+        # 启动浏览器时才导入 Playwright，避免拖慢服务启动
+        from playwright.async_api import async_playwright
         playwright = await async_playwright().start()
         browser = await playwright.chromium.launch(headless=headless)
         context = await browser.new_context()
@@ -110,8 +113,8 @@ async def login_and_get_cookie(headless=True):
         cookies = await context.cookies()
         
         if cookies:
-            # 将Cookie转换为字符串格式
-            cookie_string = "; ".join([f"{cookie['name']}={cookie['value']}" for cookie in cookies])
+            # 保存完整的cookie信息（域名、路径、过期时间）
+            cookie_string = serialize_cookies(cookies)
             print(f"{Fore.GREEN}Cookie获取成功！共获取到 {len(cookies)} 个Cookie{Style.RESET_ALL}")
             return {
                 "code": 200,
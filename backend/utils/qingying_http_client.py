@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+清影 HTTP 直连引擎 - 不启动浏览器，直接上传图片、创建生成对话并轮询生成状态
+
+浏览器引擎成功提交时记录页面实际发出的上传、生成（video-api/v1/chat）和状态查询
+（video-api/v1/chat/status/{chat_id}）请求作为模板（见 http_replay_util）。生成请求中引用的
+上传结果（如图片ID、地址）按其在上传响应中的位置记录，重放时换成新上传图片对应位置的取值。
+没有匹配的模板、模板被接口拒绝或响应结构与预期不符时抛出 HttpEngineUnsupported，
+由执行器回退到浏览器引擎；生成请求已发出但没有得到 chat_id 时抛出 HttpEngineSubmitUncertain，
+远端可能已创建对话，不再回退。
+"""
+
+import asyncio
+import mimetypes
+import os
+import re
+import time
+from typing import Dict, Optional
+
+import aiohttp
+
+from backend.config.settings import (QINGYING_API_BASE, QINGYING_HTTP_POLL_MIN, QINGYING_HTTP_POLL_MAX,
+                                     QINGYING_HTTP_POLL_BACKOFF, QINGYING_HTTP_MAX_WAIT,
+                                     QINGYING_HTTP_REJECT_COOLDOWN)
+from backend.core.logger import get_logger
+from backend.utils.http_replay_util import (HttpEngineUnsupported, HttpEngineSubmitUncertain, ReplayHttpClient,
+                                            RequestTemplateStore, capture_request, collect_values, flatten_values)
+
+logger = get_logger(__name__)
+
+# 请求模板类型
+TEMPLATE_UPLOAD = 'upload'
+TEMPLATE_CHAT = 'chat'
+TEMPLATE_STATUS = 'status'
+
+# 生成请求中引用上传结果的替换用途前缀，后接上传响应中的路径
+UPLOAD_ROLE_PREFIX = 'upload:'
+
+# 上传响应中短于该长度的取值不视为上传结果的引用（如状态码 0、"png"）
+_MIN_UPLOAD_VALUE_LENGTH = 6
+
+# 生成状态为以下取值时结束轮询
+FINAL_STATUSES = ('finished', 'failed', 'error')
+
+_FILE_FIELD_RE = re.compile(rb'name="([^"]+)"; filename=')
+
+request_templates = RequestTemplateStore('qingying', QINGYING_HTTP_REJECT_COOLDOWN)
+
+def remember_upload(url: str, headers: Dict, body: Optional[bytes]):
+    """记录上传图片的请求，表单中文件字段的名称从 multipart 请求体中解析"""
+    match = _FILE_FIELD_RE.search(body or b'')
+    if not match:
+        return
+    template = capture_request(url, 'POST', headers)
+    template['file_field'] = match.group(1).decode('utf-8', 'ignore')
+    request_templates.remember(TEMPLATE_UPLOAD, template)
+
+def remember_chat(url: str, headers: Dict, body: Optional[str], prompt: str, params_key: tuple,
+                  upload_values: Optional[Dict[str, object]] = None):
+    """
+    记录生成请求
+
+    参数:
+        url, headers, body: 请求地址、完整请求头和请求体
+        prompt: 提示词，重放时替换
+        params_key: 生成参数组合（模式、帧率、分辨率、时长、AI音效），按组合分别保存模板
+        upload_values: 本次上传响应展开后的 {路径: 取值}，在请求体中出现的取值重放时替换
+    """
+    template = capture_request(url, 'POST', headers, body, replace={'prompt': prompt})
+    if template['payload'] is None:
+        return
+    payload_values = collect_values(template['payload'])
+    for path, value in (upload_values or {}).items():
+        if isinstance(value, bool) or not isinstance(value, (str, int)):
+            continue
+        if len(str(value)) < _MIN_UPLOAD_VALUE_LENGTH:
+            continue
+        if str(value) in payload_values:
+            template['replace'][UPLOAD_ROLE_PREFIX + path] = value
+    request_templates.remember(TEMPLATE_CHAT, template, params_key)
+
+def remember_status(url: str, headers: Dict, chat_id: str):
+    """记录状态查询请求，地址中的 chat_id 重放时替换"""
+    if chat_id not in url:
+        return
+    template = capture_request(url.replace(chat_id, '{chat_id}'), 'GET', headers)
+    request_templates.remember(TEMPLATE_STATUS, template)
+
+class QingyingHttpClient(ReplayHttpClient):
+    """使用一个账号的 cookies 调用清影接口"""
+
+    api_base = QINGYING_API_BASE
+    platform = 'qingying'
+
+    def _check_status(self, kind: str, data: Dict, action: str) -> Dict:
+        """接口约定 status 为 0 表示成功，否则拒绝该类型的模板"""
+        if data.get('status') != 0 or 'result' not in data:
+            reason = f"{action}接口返回 status={data.get('status')} {data.get('message', '')}".strip()
+            request_templates.reject(kind, reason)
+            raise HttpEngineUnsupported(reason)
+        return data['result']
+
+    async def upload_image(self, image_path: str) -> Dict[str, object]:
+        """上传图片，返回展开后的上传响应 {路径: 取值}"""
+        template = request_templates.get(TEMPLATE_UPLOAD)
+        if template is None:
+            raise HttpEngineUnsupported("没有可用的上传请求模板")
+
+        content = await asyncio.to_thread(_read_file, image_path)
+        form = aiohttp.FormData()
+        form.add_field(template['file_field'], content, filename=os.path.basename(image_path),
+                       content_type=mimetypes.guess_type(image_path)[0] or 'application/octet-stream')
+        data = await self.replay(template, data=form)
+        self._check_status(TEMPLATE_UPLOAD, data, "上传")
+        return flatten_values(data)
+
+    async def create_chat(self, upload_values: Dict[str, object], prompt: str, params_key: tuple) -> str:
+        """提交生成请求，返回 chat_id"""
+        template = request_templates.get(TEMPLATE_CHAT, params_key)
+        if template is None:
+            raise HttpEngineUnsupported("没有当前参数组合可用的生成请求模板")
+
+        values = {'prompt': prompt}
+        for role in template['replace']:
+            if not role.startswith(UPLOAD_ROLE_PREFIX):
+                continue
+            path = role[len(UPLOAD_ROLE_PREFIX):]
+            if path not in upload_values:
+                raise HttpEngineUnsupported("上传响应结构与模板不一致")
+            values[role] = upload_values[path]
+
+        data = await self.replay(template, values, submit=True)
+        try:
+            result = self._check_status(TEMPLATE_CHAT, data, "生成")
+        except HttpEngineUnsupported as e:
+            raise HttpEngineSubmitUncertain(str(e)) from e
+        chat_id = result.get('chat_id')
+        if not chat_id:
+            raise HttpEngineSubmitUncertain("生成接口响应中没有chat_id")
+        return chat_id
+
+    async def wait_for_video(self, chat_id: str, max_wait_time: int = QINGYING_HTTP_MAX_WAIT) -> Optional[Dict]:
+        """
+        轮询生成状态直到结束
+
+        状态或进度变化后按最短间隔查询，长时间没有变化时间隔逐步加长到上限。
+
+        返回值:
+            Optional[Dict]: 状态为结束（finished/failed/error）时的 result，等待超时返回 None
+        """
+        template = request_templates.get(TEMPLATE_STATUS)
+        if template is None:
+            raise HttpEngineUnsupported("没有可用的状态查询请求模板")
+
+        url = template['url'].replace('{chat_id}', chat_id)
+        start_time = time.monotonic()
+        interval = QINGYING_HTTP_POLL_MIN
+        last_state = None
+        while time.monotonic() - start_time < max_wait_time:
+            data = await self.replay(template, url=url)
+            result = self._check_status(TEMPLATE_STATUS, data, "状态查询")
+            if result.get('status') in FINAL_STATUSES:
+                return result
+
+            state = (result.get('status'), result.get('plan'))
+            if state != last_state:
+                interval = QINGYING_HTTP_POLL_MIN
+                last_state = state
+            else:
+                interval = min(QINGYING_HTTP_POLL_MAX, interval * QINGYING_HTTP_POLL_BACKOFF)
+            logger.debug("视频尚未生成完成，继续轮询",
+                         extra={'fields': {'chat_id': chat_id, 'status': state[0], 'plan': state[1],
+                                           'interval': round(interval, 1)}})
+            await asyncio.sleep(interval)
+        return None
+
+def _read_file(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
@@ -7,33 +7,35 @@ import asyncio
 import time
 import json
 from typing import Optional, Dict, Any
+
+import aiohttp
+
 from backend.utils.base_task_executor import BaseTaskExecutor, TaskResult, ErrorCode, TaskLogger
+from backend.utils.cookie_util import load_cookies
+from backend.utils.image_prepare_util import prepare_upload_image
+from backend.models.models import TASK_PHASE_LOGGED_IN, TASK_PHASE_SUBMITTED, TASK_PHASE_AWAITING_RESULT
+from backend.utils.config_util import get_qingying_http_engine_enabled
+from backend.utils.http_replay_util import (HttpEngineUnsupported, HttpEngineAuthError, HttpEngineSubmitUncertain,
+                                            flatten_values)
+from backend.utils.qingying_http_client import QingyingHttpClient, remember_upload, remember_chat, remember_status
 
 class QingyingImage2VideoExecutor(BaseTaskExecutor):
     """清影图生视频执行器"""
     
+    resource_platform = 'qingying'
+    
     def __init__(self, headless: bool = True):
         super().__init__(headless)
         self.chat_id = None
         self.video_result = None
+        self.generation_params = None  # 本次提交的提示词和参数组合，用于记录HTTP引擎的请求模板
+        self.upload_values = None
+        self.status_captured = False
     
     async def handle_cookies(self, cookies: str):
-        """处理cookies字符串格式"""
+        """设置账号保存的cookies，旧格式字符串使用平台默认域名"""
         try:
-            # 将cookies字符串转换为字典列表格式
-            cookie_pairs = cookies.split('; ')
-            cookie_list = []
-            for pair in cookie_pairs:
-                if '=' in pair:
-                    name, value = pair.split('=', 1)
-                    cookie_list.append({
-                        'name': name.strip(),
-                        'value': value.strip(),
-                        'domain': '.chatglm.cn',
-                        'path': '/'
-                    })
-            
-            await self.context.add_cookies(cookie_list)
+            await self.context.add_cookies(load_cookies(cookies, self.resource_platform))
             self.logger.info("清影平台cookies设置成功")
             
         except Exception as e:
@@ -106,6 +108,7 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
         """上传图片"""
         try:
             self.logger.info("正在上传图片", image_path=image_path)
+            image_path = await prepare_upload_image(image_path, self.resource_platform)
             
             # 等待页面加载完成
             await asyncio.sleep(3)
@@ -526,6 +529,7 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
                     if response_data.get('status') == 0 and 'result' in response_data:
                         self.chat_id = response_data['result'].get('chat_id')
                         self.logger.info("获取到chat_id", chat_id=self.chat_id)
+                        await self.report_checkpoint(TASK_PHASE_SUBMITTED, task_id=self.chat_id)
                 
                 # 监听状态更新请求
                 if self.chat_id and f'video-api/v1/chat/status/{self.chat_id}' in response.url:
@@ -540,37 +544,9 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
                         
                         self.logger.debug("生成状态", status=status, plan=plan, msg=msg)
                         
-                        if status == 'finished':
-                            video_url = result.get('video_url', '')
-                            if video_url:
-                                self.logger.info("视频生成成功", video_url=video_url)
-                                self.video_result = TaskResult(
-                                    code=ErrorCode.SUCCESS.value,
-                                    data={
-                                        "video_url": video_url,
-                                        "cover_url": result.get('cover_url', ''),
-                                        "chat_id": self.chat_id,
-                                        "duration": result.get('video_duration', ''),
-                                        "resolution": result.get('video_resolution', ''),
-                                        "fps": result.get('video_fps', ''),
-                                        "containing_audio_url": result.get('containing_audio_url', '')
-                                    },
-                                    message="视频生成成功"
-                                )
-                            else:
-                                self.logger.error("生成完成但未获取到视频URL")
-                                self.video_result = TaskResult(
-                                    code=ErrorCode.GENERATION_FAILED.value,
-                                    data=None,
-                                    message="当前任务生成失败，请手动生成"
-                                )
-                        elif status == 'failed' or status == 'error':
-                            self.logger.error("视频生成失败", msg=msg)
-                            self.video_result = TaskResult(
-                                code=ErrorCode.GENERATION_FAILED.value,
-                                data=None,
-                                message="当前任务生成失败，请手动生成"
-                            )
+                        final_result = self._status_result(result)
+                        if final_result is not None:
+                            self.video_result = final_result
                             
             except Exception as e:
                 self.logger.error("解析响应时出错", error=str(e))
@@ -579,6 +555,66 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
         self.context.on('request', handle_request)
         self.context.on('response', handle_response)
     
+    def _status_result(self, result: Dict[str, Any]) -> Optional[TaskResult]:
+        """把状态查询结果转换为任务结果，尚未结束时返回 None"""
+        status = result.get('status')
+        if status == 'finished':
+            video_url = result.get('video_url', '')
+            if video_url:
+                self.logger.info("视频生成成功", video_url=video_url)
+                return TaskResult(
+                    code=ErrorCode.SUCCESS.value,
+                    data={
+                        "video_url": video_url,
+                        "cover_url": result.get('cover_url', ''),
+                        "chat_id": self.chat_id,
+                        "duration": result.get('video_duration', ''),
+                        "resolution": result.get('video_resolution', ''),
+                        "fps": result.get('video_fps', ''),
+                        "containing_audio_url": result.get('containing_audio_url', '')
+                    },
+                    message="视频生成成功"
+                )
+            self.logger.error("生成完成但未获取到视频URL")
+            return TaskResult(
+                code=ErrorCode.GENERATION_FAILED.value,
+                data=None,
+                message="当前任务生成失败，请手动生成"
+            )
+        if status == 'failed' or status == 'error':
+            self.logger.error("视频生成失败", msg=result.get('msg', ''))
+            return TaskResult(
+                code=ErrorCode.GENERATION_FAILED.value,
+                data=None,
+                message="当前任务生成失败，请手动生成"
+            )
+        return None
+    
+    async def _capture_request_templates(self, response):
+        """记录页面发出的上传、生成和状态查询请求，供HTTP直连引擎重放"""
+        try:
+            request = response.request
+            if response.status != 200 or 'chatglm.cn' not in request.url:
+                return
+            content_type = request.headers.get('content-type', '')
+            if request.method == 'POST' and content_type.startswith('multipart/form-data'):
+                data = await response.json()
+                if data.get('status') == 0:
+                    self.upload_values = flatten_values(data)
+                    remember_upload(request.url, await request.all_headers(), request.post_data_buffer)
+            elif 'video-api/v1/chat/status/' in request.url:
+                if self.chat_id and not self.status_captured:
+                    self.status_captured = True
+                    remember_status(request.url, await request.all_headers(), self.chat_id)
+            elif 'video-api/v1/chat' in request.url and request.method == 'POST' and self.generation_params:
+                data = await response.json()
+                if data.get('status') == 0:
+                    remember_chat(request.url, await request.all_headers(), request.post_data,
+                                  self.generation_params['prompt'], self.generation_params['key'],
+                                  self.upload_values)
+        except Exception as e:
+            self.logger.debug("记录请求模板失败", error=str(e))
+    
     async def start_generation(self) -> TaskResult:
         """开始生成视频"""
         try:
@@ -656,15 +692,22 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
                 message=f"点击生成按钮失败: {str(e)}"
             )
     
-    async def wait_for_completion(self, max_wait_time: int = 3600) -> TaskResult:
-        """等待生成完成"""
+    async def wait_for_completion(self, max_wait_time: int = 3600, refresh_interval: Optional[int] = None) -> TaskResult:
+        """等待生成完成，refresh_interval 不为空时定期刷新页面以触发状态查询"""
         try:
             start_time = time.time()
+            last_refresh_time = start_time
+            await self.report_checkpoint(TASK_PHASE_AWAITING_RESULT, task_id=self.chat_id)
             
             while time.time() - start_time < max_wait_time:
                 if self.video_result is not None:
                     return self.video_result
                 
+                if refresh_interval and time.time() - last_refresh_time >= refresh_interval:
+                    self.logger.debug("刷新页面，检查视频生成状态", chat_id=self.chat_id)
+                    await self.page.reload()
+                    last_refresh_time = time.time()
+                
                 await asyncio.sleep(1)
             
             # 超时
@@ -685,8 +728,87 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
     async def execute(self, image_path: str, prompt: str = "", cookies: str = "", 
                       generation_mode: str = "fast", frame_rate: str = "30", 
                       resolution: str = "720p", duration: str = "5s", 
-                      ai_audio: bool = False) -> TaskResult:
-        """执行清影图生视频任务"""
+                      ai_audio: bool = False, resume_chat_id: Optional[str] = None) -> TaskResult:
+        """执行清影图生视频任务，开启HTTP直连引擎时优先使用，不支持时回退到浏览器"""
+        params = dict(image_path=image_path, prompt=prompt, cookies=cookies, generation_mode=generation_mode,
+                      frame_rate=frame_rate, resolution=resolution, duration=duration, ai_audio=ai_audio,
+                      resume_chat_id=resume_chat_id)
+        if cookies and get_qingying_http_engine_enabled():
+            http_result = await self.execute_http(**params)
+            if http_result is not None:
+                return http_result
+            if self.chat_id:
+                # 已经提交成功，浏览器只需要轮询结果
+                params['resume_chat_id'] = self.chat_id
+        return await self.execute_browser(**params)
+    
+    async def execute_http(self, image_path: str, prompt: str = "", cookies: str = "", 
+                           generation_mode: str = "fast", frame_rate: str = "30", 
+                           resolution: str = "720p", duration: str = "5s", 
+                           ai_audio: bool = False, resume_chat_id: Optional[str] = None) -> Optional[TaskResult]:
+        """
+        使用HTTP直连引擎执行任务
+        
+        返回值:
+            Optional[TaskResult]: 执行结果；HTTP引擎不支持当前请求时返回 None，由调用方回退到浏览器引擎
+        """
+        start_time = time.time()
+        client = QingyingHttpClient(cookies)
+        
+        try:
+            if resume_chat_id:
+                self.chat_id = resume_chat_id
+            else:
+                async with self.span('http_upload_image'):
+                    upload_path = await prepare_upload_image(image_path, self.resource_platform)
+                    upload_values = await client.upload_image(upload_path)
+                async with self.span('http_submit'):
+                    params_key = (generation_mode, frame_rate, resolution, duration, bool(ai_audio))
+                    self.chat_id = await client.create_chat(upload_values, prompt, params_key)
+                self.logger.info("HTTP引擎提交成功", chat_id=self.chat_id)
+                await self.report_checkpoint(TASK_PHASE_SUBMITTED, task_id=self.chat_id)
+            
+            await self.report_checkpoint(TASK_PHASE_AWAITING_RESULT, task_id=self.chat_id)
+            async with self.span('http_wait_for_result'):
+                status_result = await client.wait_for_video(self.chat_id)
+        except HttpEngineAuthError as e:
+            self.mark_auth_failed(f"HTTP引擎{str(e)}")
+            return None
+        except HttpEngineSubmitUncertain as e:
+            # 生成请求可能已被接受，回退到浏览器会创建第二个对话
+            self.logger.error("HTTP引擎提交后未获取到chat_id", error=str(e))
+            return TaskResult(
+                code=ErrorCode.TASK_ID_NOT_OBTAINED.value,
+                data=None,
+                message=f"HTTP引擎提交后未获取到chat_id: {str(e)}",
+                execution_time=time.time() - start_time,
+                cookies=client.cookies
+            )
+        except HttpEngineUnsupported as e:
+            self.logger.info("HTTP引擎不支持当前请求，回退到浏览器引擎", reason=str(e), chat_id=self.chat_id)
+            return None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.warning("HTTP引擎请求失败，回退到浏览器引擎", error=str(e) or type(e).__name__, chat_id=self.chat_id)
+            return None
+        
+        if status_result is None:
+            self.logger.error("视频生成超时", engine="http", chat_id=self.chat_id)
+            final_result = TaskResult(
+                code=ErrorCode.OTHER_ERROR.value,
+                data=None,
+                message="视频生成超时"
+            )
+        else:
+            final_result = self._status_result(status_result)
+        final_result.execution_time = time.time() - start_time
+        final_result.cookies = client.cookies
+        return final_result
+    
+    async def execute_browser(self, image_path: str, prompt: str = "", cookies: str = "", 
+                              generation_mode: str = "fast", frame_rate: str = "30", 
+                              resolution: str = "720p", duration: str = "5s", 
+                              ai_audio: bool = False, resume_chat_id: Optional[str] = None) -> TaskResult:
+        """使用浏览器执行清影图生视频任务，resume_chat_id 不为空时跳过提交直接等待生成结果"""
         start_time = time.time()
         
         try:
@@ -711,7 +833,27 @@ class QingyingImage2VideoExecutor(BaseTaskExecutor):
             if popup_result.code != ErrorCode.SUCCESS.value:
                 return popup_result
             
+            await self.report_checkpoint(TASK_PHASE_LOGGED_IN)
+            
+            # 记录页面请求，供HTTP直连引擎重放
+            self.context.on('response', self._capture_request_templates)
+            
+            # 恢复已提交的任务：监听该chat_id的状态查询，定期刷新页面
+            if resume_chat_id:
+                self.logger.info("恢复已提交的任务，直接轮询结果", chat_id=resume_chat_id)
+                await self.setup_response_listener()
+                self.chat_id = resume_chat_id
+                await self.page.reload()
+                final_result = await self.wait_for_completion(refresh_interval=30)
+                final_result.execution_time = time.time() - start_time
+                final_result.cookies = await self.get_cookies()
+                return final_result
+            
             # 上传图片
+            self.generation_params = {
+                'prompt': prompt,
+                'key': (generation_mode, frame_rate, resolution, duration, bool(ai_audio))
+            }
             upload_result = await self.upload_image(image_path)
             if upload_result.code != ErrorCode.SUCCESS.value:
                 return upload_result
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+清影接口模拟服务 - 按网页端接口的响应结构返回数据，用于本地联调 HTTP 直连引擎
+
+用法:
+    python -m backend.utils.qingying_mock_server --port 8766
+    QINGYING_API_BASE=http://127.0.0.1:8766 启动后端，并开启配置 qingying_http_engine_enabled
+
+请求头 Authorization 需为 "Bearer <cookie 中的 chatglm_token>"。生成请求需引用已上传的图片ID，
+提交后状态依次为 init、processing，finish_delay 秒后完成。
+没有真实浏览器记录的请求模板时，可调用 install_sample_templates() 注册示例模板。
+"""
+
+import argparse
+import json
+import time
+import uuid
+
+from aiohttp import web
+
+from backend.utils.http_replay_util import parse_cookie_string
+from backend.utils.qingying_http_client import remember_upload, remember_chat, remember_status
+
+UPLOAD_PATH = '/chatglm/video-api/v1/static/upload'
+CHAT_PATH = '/chatglm/video-api/v1/chat'
+STATUS_PATH = '/chatglm/video-api/v1/chat/status/{chat_id}'
+
+# 示例模板使用的取值，重放时被替换
+SAMPLE_PROMPT = '__sample_prompt__'
+SAMPLE_TOKEN = 'sample-chatglm-token'
+SAMPLE_SOURCE_ID = 'sample-source-0001'
+
+def _error(status: int, message: str):
+    return web.json_response({'status': status, 'message': message})
+
+def create_app(finish_delay: float = 5, fail_prompts=()) -> web.Application:
+    """
+    创建模拟服务
+
+    参数:
+        finish_delay: 生成请求提交后多少秒完成
+        fail_prompts: 包含这些提示词的任务以 failed 状态结束，模拟生成失败
+    """
+    sources, chats = {}, {}
+
+    def require_auth(request):
+        token = parse_cookie_string(request.headers.get('Cookie')).get('chatglm_token')
+        if not token or request.headers.get('Authorization') != f'Bearer {token}':
+            raise web.HTTPUnauthorized()
+
+    async def upload(request):
+        require_auth(request)
+        form = await request.post()
+        file = form.get('file')
+        if file is None or not getattr(file, 'filename', None):
+            return _error(1001, 'file required')
+        source_id = uuid.uuid4().hex
+        sources[source_id] = file.filename
+        return web.json_response({'status': 0, 'message': 'success', 'result': {
+            'source_id': source_id,
+            'source_url': f'https://mock.local/sources/{source_id}.png'
+        }})
+
+    async def chat(request):
+        require_auth(request)
+        payload = await request.json()
+        source_ids = payload.get('source_list') or []
+        if not source_ids or any(source_id not in sources for source_id in source_ids):
+            return _error(1002, 'source not found')
+        chat_id = uuid.uuid4().hex
+        chats[chat_id] = {'created': time.time(), 'prompt': payload.get('prompt', '')}
+        return web.json_response({'status': 0, 'message': 'success', 'result': {'chat_id': chat_id}})
+
+    async def status(request):
+        require_auth(request)
+        chat_id = request.match_info['chat_id']
+        if chat_id not in chats:
+            return _error(1003, 'chat not found')
+        elapsed = time.time() - chats[chat_id]['created']
+        if elapsed < finish_delay / 2:
+            result = {'status': 'init', 'plan': '排队中', 'msg': ''}
+        elif elapsed < finish_delay:
+            result = {'status': 'processing', 'plan': '生成中', 'msg': ''}
+        elif any(word in chats[chat_id]['prompt'] for word in fail_prompts):
+            result = {'status': 'failed', 'plan': '', 'msg': '生成失败'}
+        else:
+            result = {
+                'status': 'finished',
+                'plan': '',
+                'msg': '',
+                'video_url': f'https://mock.local/videos/{chat_id}.mp4',
+                'cover_url': f'https://mock.local/videos/{chat_id}.jpg',
+                'video_duration': '5s',
+                'video_resolution': '1280x720',
+                'video_fps': '30',
+                'containing_audio_url': ''
+            }
+        response = web.json_response({'status': 0, 'message': 'success', 'result': result})
+        response.set_cookie('acw_tc', uuid.uuid4().hex)
+        return response
+
+    app = web.Application()
+    app.router.add_post(UPLOAD_PATH, upload)
+    app.router.add_post(CHAT_PATH, chat)
+    app.router.add_get(STATUS_PATH, status)
+    return app
+
+def install_sample_templates(base_url: str, generation_mode: str = 'fast', frame_rate: str = '30',
+                             resolution: str = '720p', duration: str = '5s', ai_audio: bool = False):
+    """注册与网页端请求结构相同的示例模板"""
+    headers = {
+        'cookie': f'chatglm_token={SAMPLE_TOKEN}',
+        'authorization': f'Bearer {SAMPLE_TOKEN}',
+        'content-type': 'application/json'
+    }
+    upload_body = b'--x\r\nContent-Disposition: form-data; name="file"; filename="sample.png"\r\n\r\n\r\n--x--\r\n'
+    remember_upload(base_url + UPLOAD_PATH, headers, upload_body)
+
+    sample_chat_id = 'sample-chat-0001'
+    chat_body = json.dumps({
+        'prompt': SAMPLE_PROMPT,
+        'conversation_id': '',
+        'source_list': [SAMPLE_SOURCE_ID],
+        'base_parameter_extra': {'generation_pattern': 1, 'resolution': 0, 'fps': 0, 'duration': 1},
+        'advanced_parameter_extra': {'video_style': '', 'emotional_atmosphere': '', 'mirror_mode': ''}
+    }, ensure_ascii=False)
+    upload_values = {'status': 0, 'result.source_id': SAMPLE_SOURCE_ID,
+                     'result.source_url': f'https://mock.local/sources/{SAMPLE_SOURCE_ID}.png'}
+    remember_chat(base_url + CHAT_PATH, headers, chat_body, SAMPLE_PROMPT,
+                  (generation_mode, frame_rate, resolution, duration, bool(ai_audio)), upload_values)
+    remember_status(base_url + STATUS_PATH.format(chat_id=sample_chat_id), headers, sample_chat_id)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='清影接口模拟服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--finish-delay', type=float, default=5)
+    args = parser.parse_args()
+    web.run_app(create_app(args.finish_delay), host=args.host, port=args.port)
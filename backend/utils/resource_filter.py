@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+资源拦截工具 - 决定自动化页面中哪些请求需要中止
+
+自动化只依赖页面结构、脚本和接口响应，图片、字体、媒体和统计请求都可以直接中止，
+以减少每个浏览器的带宽、CPU 和内存占用。
+"""
+
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+from backend.config.settings import (RESOURCE_FILTER_BLOCK_TYPES, RESOURCE_FILTER_BLOCK_HOSTS,
+                                     RESOURCE_FILTER_OVERRIDES)
+
+class ResourceFilter:
+    """请求拦截规则"""
+
+    def __init__(self, block_types: Iterable[str] = (), block_hosts: Iterable[str] = (),
+                 allow_url_patterns: Iterable[str] = ()):
+        self.block_types = frozenset(block_types)
+        self.block_hosts = tuple(block_hosts)
+        self.allow_url_patterns = tuple(allow_url_patterns)
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        """判断请求是否需要中止，页面文档始终放行"""
+        if resource_type == 'document':
+            return False
+        if any(pattern in url for pattern in self.allow_url_patterns):
+            return False
+        if resource_type in self.block_types:
+            return True
+        host = urlsplit(url).hostname or ''
+        return any(blocked in host for blocked in self.block_hosts)
+
+_filters: Dict[Optional[str], ResourceFilter] = {}
+
+def get_resource_filter(platform: Optional[str] = None) -> ResourceFilter:
+    """获取平台的拦截规则，平台覆盖配置中的键替换默认值"""
+    resource_filter = _filters.get(platform)
+    if resource_filter is None:
+        overrides = RESOURCE_FILTER_OVERRIDES.get(platform, {}) if platform else {}
+        resource_filter = ResourceFilter(
+            block_types=overrides.get('block_types', RESOURCE_FILTER_BLOCK_TYPES),
+            block_hosts=overrides.get('block_hosts', RESOURCE_FILTER_BLOCK_HOSTS),
+            allow_url_patterns=overrides.get('allow_url_patterns', ())
+        )
+        _filters[platform] = resource_filter
+    return resource_filter
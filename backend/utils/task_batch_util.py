@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+任务批量操作工具 - 以集合方式执行批量更新/删除，每次操作只占用一个事务
+"""
+
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from peewee import chunked
+
+# SQLite 单条语句的参数个数有限制，IN 列表按此大小分块
+ID_CHUNK_SIZE = 500
+
+def _with_update_time(model, fields: Dict) -> Dict:
+    """为有 update_at 字段的模型补充更新时间"""
+    fields = dict(fields)
+    if 'update_at' in model._meta.fields and 'update_at' not in fields:
+        fields['update_at'] = datetime.now()
+    return fields
+
+def _normalize_ids(task_ids) -> List[int]:
+    """去重并转换任务ID"""
+    return list({int(task_id) for task_id in task_ids})
+
+def reset_processing_tasks(models) -> Dict[str, int]:
+    """
+    将所有生成中的任务重置为排队状态
+
+    参数:
+        models: 任务模型列表
+
+    返回值:
+        Dict: 表名 -> 重置数量
+    """
+    reset_counts = {}
+    database = models[0]._meta.database
+    with database.atomic():
+        for model in models:
+            fields = _with_update_time(model, {'status': 0})
+            reset_counts[model._meta.table_name] = model.update(**fields).where(
+                model.status == 1  # 生成中
+            ).execute()
+    return reset_counts
+
+def batch_retry_tasks(model, task_ids: Optional[list] = None, only_failed: bool = True,
+                      extra_fields: Optional[Dict] = None) -> int:
+    """
+    批量将任务重新加入队列
+
+    参数:
+        model: 任务模型
+        task_ids: 任务ID列表，为空时作用于所有失败任务
+        only_failed: 是否只重试失败的任务
+        extra_fields: 需要一并重置的字段
+
+    返回值:
+        int: 实际重新排队的任务数量
+    """
+    fields = _with_update_time(model, {'status': 0, **(extra_fields or {})})
+
+    conditions = []
+    if only_failed or not task_ids:
+        conditions.append(model.status == 3)  # 失败
+
+    retry_count = 0
+    with model._meta.database.atomic():
+        if not task_ids:
+            retry_count = model.update(**fields).where(*conditions).execute()
+        else:
+            for id_chunk in chunked(_normalize_ids(task_ids), ID_CHUNK_SIZE):
+                retry_count += model.update(**fields).where(
+                    model.id.in_(id_chunk), *conditions
+                ).execute()
+    return retry_count
+
+def batch_delete_tasks(model, task_ids: list, file_fields: Tuple[str, ...] = ()) -> Tuple[int, int]:
+    """
+    批量删除任务，并删除任务关联的本地文件
+
+    参数:
+        model: 任务模型
+        task_ids: 任务ID列表
+        file_fields: 存放本地文件路径的字段名
+
+    返回值:
+        (删除的任务数量, 删除的文件数量)
+    """
+    file_paths = []
+    deleted_count = 0
+    columns = [getattr(model, field_name) for field_name in file_fields]
+
+    with model._meta.database.atomic():
+        for id_chunk in chunked(_normalize_ids(task_ids), ID_CHUNK_SIZE):
+            if columns:
+                for row in model.select(*columns).where(model.id.in_(id_chunk)).tuples():
+                    file_paths.extend(path for path in row if path)
+            deleted_count += model.delete().where(model.id.in_(id_chunk)).execute()
+
+    # 文件删除放在事务之外，避免长时间持有数据库写锁
+    removed_files = 0
+    for file_path in file_paths:
+        try:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+                removed_files += 1
+        except Exception as e:
+            print(f"删除任务文件失败: {file_path}, 错误: {e}")
+
+    return deleted_count, removed_files
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+任务批量导入工具 - 扫描文件夹、并行校验图片并分块批量写入任务，导入进度通过导入任务ID查询
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from peewee import chunked
+
+# 支持的图片格式
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'}
+
+# SQLite 单条语句的参数个数上限（按旧版本的 999 保守计算）
+SQLITE_MAX_VARIABLES = 999
+
+# 并行校验的线程数
+VALIDATE_WORKERS = 8
+
+# 最多保留的导入任务记录数
+MAX_IMPORT_JOBS = 100
+
+class ImportJob:
+    """导入任务进度"""
+
+    def __init__(self, source: str):
+        self.job_id = uuid.uuid4().hex
+        self.source = source
+        self.status = 'pending'  # pending/scanning/validating/inserting/completed/failed
+        self.total = 0
+        self.validated = 0
+        self.created = 0
+        self.failed = 0
+        self.errors: List[str] = []
+        self.created_task_ids: List[int] = []
+        self.message = ''
+        self.start_time = time.time()
+        self.end_time = None
+        self._lock = threading.Lock()
+
+    def update(self, **fields):
+        """更新进度字段"""
+        with self._lock:
+            for key, value in fields.items():
+                setattr(self, key, value)
+
+    def add_validated(self, count: int = 1):
+        with self._lock:
+            self.validated += count
+
+    def add_error(self, error: str):
+        with self._lock:
+            self.failed += 1
+            self.errors.append(error)
+
+    def add_created(self, task_ids: List[int]):
+        with self._lock:
+            self.created += len(task_ids)
+            self.created_task_ids.extend(task_ids)
+
+    def finish(self, status: str = 'completed', message: str = ''):
+        """结束导入任务"""
+        with self._lock:
+            self.status = status
+            self.message = message
+            self.end_time = time.time()
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                'job_id': self.job_id,
+                'source': self.source,
+                'status': self.status,
+                'total': self.total,
+                'validated': self.validated,
+                'created': self.created,
+                'failed': self.failed,
+                'errors': list(self.errors[-50:]),  # 只返回最近的错误
+                'message': self.message,
+                'elapsed': round((self.end_time or time.time()) - self.start_time, 2),
+                'finished': self.end_time is not None
+            }
+
+_import_jobs: Dict[str, ImportJob] = {}
+_import_jobs_lock = threading.Lock()
+
+def create_import_job(source: str) -> ImportJob:
+    """创建导入任务，超过上限时清理最早结束的记录"""
+    job = ImportJob(source)
+    with _import_jobs_lock:
+        if len(_import_jobs) >= MAX_IMPORT_JOBS:
+            finished = sorted(
+                (j for j in _import_jobs.values() if j.end_time is not None),
+                key=lambda j: j.end_time
+            )
+            for old_job in finished[:len(_import_jobs) - MAX_IMPORT_JOBS + 1]:
+                _import_jobs.pop(old_job.job_id, None)
+        _import_jobs[job.job_id] = job
+    return job
+
+def get_import_job(job_id: str) -> Optional[ImportJob]:
+    """获取导入任务"""
+    with _import_jobs_lock:
+        return _import_jobs.get(job_id)
+
+def scan_image_files(folder_path: str, extensions=IMAGE_EXTENSIONS) -> List[str]:
+    """
+    扫描文件夹中的图片文件（不递归）
+
+    参数:
+        folder_path: 文件夹路径
+        extensions: 允许的扩展名集合
+
+    返回值:
+        List[str]: 图片路径列表，按文件名排序
+    """
+    image_files = []
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if os.path.splitext(entry.name)[1].lower() in extensions and entry.is_file():
+                image_files.append(entry.path)
+    image_files.sort()
+    return image_files
+
+def parallel_map(func: Callable, items: list, job: Optional[ImportJob] = None,
+                 max_workers: int = VALIDATE_WORKERS) -> list:
+    """
+    并行处理列表并保持原有顺序，单项异常作为结果返回
+
+    参数:
+        func: 处理函数
+        items: 待处理列表
+        job: 导入任务，用于记录校验进度
+        max_workers: 线程数
+
+    返回值:
+        list: 与 items 一一对应的结果或异常
+    """
+    def run(item):
+        try:
+            return func(item)
+        except Exception as e:
+            return e
+        finally:
+            if job:
+                job.add_validated()
+
+    if len(items) <= 1:
+        return [run(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(run, items))
+
+def bulk_insert_tasks(model, rows: List[Dict], job: Optional[ImportJob] = None) -> List[int]:
+    """
+    分块批量插入任务，每块一个事务，块之间释放写锁让任务线程继续工作
+
+    参数:
+        model: 任务模型
+        rows: 任务字段字典列表，所有字典需包含相同的字段
+        job: 导入任务，用于记录写入进度
+
+    返回值:
+        List[int]: 新建任务ID列表
+    """
+    if not rows:
+        return []
+
+    # 每行参数个数 = 显式字段 + 模型默认值字段
+    default_fields = {field.name for field in model._meta.defaults}
+    params_per_row = len(set(rows[0]) | default_fields) or 1
+    rows_per_chunk = max(1, SQLITE_MAX_VARIABLES // params_per_row)
+
+    task_ids = []
+    database = model._meta.database
+    for row_chunk in chunked(rows, rows_per_chunk):
+        with database.atomic():
+            last_id = model.insert_many(row_chunk).execute()
+        # 单条 INSERT 语句在事务内分配的 rowid 是连续的
+        chunk_ids = list(range(last_id - len(row_chunk) + 1, last_id + 1))
+        task_ids.extend(chunk_ids)
+        if job:
+            job.add_created(chunk_ids)
+    return task_ids
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+任务优先级工具 - 解析创建任务请求中的优先级和截止时间
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from backend.config.settings import (TASK_PRIORITY_LANES, TASK_PRIORITY_RANGE, TASK_PRIORITY_DEFAULT,
+                                     TASK_PRIORITY_BATCH_DEFAULT, TASK_PRIORITY_URGENT, TASK_DEADLINE_LEAD_SECONDS)
+
+def parse_priority(value, default: int = TASK_PRIORITY_DEFAULT) -> int:
+    """
+    解析优先级
+
+    参数:
+        value: 整数、数字字符串或 TASK_PRIORITY_LANES 中的名称（interactive/normal/bulk），为空时使用默认值
+        default: 默认优先级
+
+    返回值:
+        int: 限制在 TASK_PRIORITY_RANGE 内的优先级
+
+    异常:
+        ValueError: 无法识别的优先级
+    """
+    if value is None or value == '':
+        return default
+    if isinstance(value, str) and value.strip().lower() in TASK_PRIORITY_LANES:
+        return TASK_PRIORITY_LANES[value.strip().lower()]
+    try:
+        priority = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"无效的优先级: {value}，可使用整数或 {'/'.join(TASK_PRIORITY_LANES)}")
+    low, high = TASK_PRIORITY_RANGE
+    return max(low, min(high, priority))
+
+def parse_deadline(value) -> Optional[datetime]:
+    """
+    解析截止时间
+
+    参数:
+        value: ISO 格式的本地时间字符串，如 "2025-01-01 12:00:00" 或 "2025-01-01T12:00"，为空时返回 None
+
+    异常:
+        ValueError: 时间格式错误
+    """
+    if value is None or value == '':
+        return None
+    try:
+        return datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        raise ValueError(f"无效的截止时间: {value}，格式应为 YYYY-MM-DD HH:MM:SS")
+
+def priority_fields(data, batch: bool = False, fallback=None) -> Dict:
+    """
+    从请求参数中取出任务的调度字段
+
+    参数:
+        data: 请求 JSON 或表单，读取 priority 和 deadline
+        batch: 是否为批量创建，批量创建的默认优先级为 TASK_PRIORITY_BATCH_DEFAULT
+        fallback: data 中未指定时读取的参数，如批量创建时每个任务未指定则使用整个请求的值
+
+    返回值:
+        Dict: {'priority': ..., 'deadline': ...}，可直接传给 create 或合并到批量插入的行中
+    """
+    def value(key):
+        result = data.get(key)
+        if result in (None, '') and fallback is not None:
+            result = fallback.get(key)
+        return result
+
+    default = TASK_PRIORITY_BATCH_DEFAULT if batch else TASK_PRIORITY_DEFAULT
+    return {
+        'priority': parse_priority(value('priority'), default),
+        'deadline': parse_deadline(value('deadline'))
+    }
+
+def is_urgent(tasks, now: Optional[datetime] = None) -> bool:
+    """
+    按调度顺序取出的排队任务中，队首任务是否需要优先分配线程
+
+    只看任务本身的优先级和截止时间，不计排队时长加成，排队久的普通任务不会被当作紧急任务
+    """
+    if not tasks:
+        return False
+    task = tasks[0]
+    now = now or datetime.now()
+    if task.deadline and task.deadline <= now + timedelta(seconds=TASK_DEADLINE_LEAD_SECONDS):
+        return True
+    return (task.priority or 0) >= TASK_PRIORITY_URGENT
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+任务列表查询工具 - 基于 (create_at, id) 的游标分页、列投影查询和按表变更版本缓存的任务总数
+"""
+
+import base64
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from backend.core.change_version import get_version
+
+# 任务状态文字描述，与各任务模型的 get_status_text 保持一致
+STATUS_TEXT = {
+    0: '排队中',
+    1: '生成中',
+    2: '已完成',
+    3: '失败'
+}
+
+_count_cache: Dict[tuple, Tuple[int, int]] = {}
+_count_cache_lock = threading.Lock()
+
+def get_status_text(status) -> str:
+    """获取状态文字描述"""
+    return STATUS_TEXT.get(status, '未知状态')
+
+def format_datetime(value, fmt: str = '%Y-%m-%d %H:%M:%S') -> Optional[str]:
+    """格式化时间，为空时返回 None"""
+    return value.strftime(fmt) if value else None
+
+def collect_paths(row: Dict, field_names) -> List[str]:
+    """按字段顺序收集非空的路径，等价于模型的 get_images/get_input_images"""
+    return [row[name] for name in field_names if row.get(name)]
+
+def encode_cursor(create_at: datetime, task_id: int) -> str:
+    """将 (create_at, id) 编码为游标字符串"""
+    raw = f"{create_at.isoformat(sep=' ')}|{task_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """解析游标字符串，格式错误时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        create_at, task_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(create_at), int(task_id)
+    except Exception:
+        raise ValueError(f'无效的分页游标: {cursor}')
+
+def query_task_page(model, columns, conditions=None, page: int = 1, page_size: int = 10,
+                    cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+    """
+    按创建时间倒序查询一页任务，只读取需要的列
+
+    提供 cursor 时使用 (create_at, id) 游标定位，耗时与页大小相关而与历史数据量无关；
+    未提供时按 page 使用 OFFSET 分页，兼容旧的页码参数。
+
+    参数:
+        model: 任务模型
+        columns: 需要查询的字段列表
+        conditions: 额外的过滤条件列表
+        page: 页码（未提供游标时使用）
+        page_size: 每页数量
+        cursor: 上一页返回的 next_cursor
+
+    返回值:
+        (任务字典列表, 下一页游标；没有更多数据时为 None)
+    """
+    selected = list(columns)
+    for required in (model.id, model.create_at):
+        # 字段对象的 == 会生成表达式，这里按对象判断是否已包含
+        if not any(column is required for column in selected):
+            selected.append(required)
+
+    query = model.select(*selected)
+    where = list(conditions or [])
+    if cursor:
+        cursor_create_at, cursor_id = decode_cursor(cursor)
+        where.append(
+            (model.create_at < cursor_create_at) |
+            ((model.create_at == cursor_create_at) & (model.id < cursor_id))
+        )
+    if where:
+        query = query.where(*where)
+
+    query = query.order_by(model.create_at.desc(), model.id.desc()).limit(page_size + 1)
+    if not cursor and page > 1:
+        query = query.offset((page - 1) * page_size)
+
+    rows = list(query.dicts())
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last_row = rows[-1]
+        next_cursor = encode_cursor(last_row['create_at'], last_row['id'])
+    return rows, next_cursor
+
+def count_tasks(model, conditions=None, cache_key=None) -> int:
+    """
+    统计任务数量，表没有变更时直接使用缓存的结果，避免每次刷新都全表计数
+
+    参数:
+        model: 任务模型
+        conditions: 过滤条件列表
+        cache_key: 过滤条件对应的缓存键，为空时不使用缓存
+
+    返回值:
+        int: 任务数量
+    """
+    key = (model._meta.table_name, cache_key)
+    # 在计数前读取版本号，计数期间的写操作会让下次请求重新计数
+    version = get_version(model._meta.table_name)
+    if cache_key is not None:
+        with _count_cache_lock:
+            cached = _count_cache.get(key)
+        if cached and cached[0] == version:
+            return cached[1]
+
+    query = model.select()
+    if conditions:
+        query = query.where(*conditions)
+    total = query.count()
+
+    if cache_key is not None:
+        with _count_cache_lock:
+            _count_cache[key] = (version, total)
+    return total
+
+def parse_bool_arg(value, default: bool = True) -> bool:
+    """解析布尔类型的查询参数"""
+    if value is None:
+        return default
+    return str(value).lower() not in ('0', 'false', 'no')
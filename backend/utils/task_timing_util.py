@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+任务阶段耗时工具 - 保存执行器上报的各阶段耗时，并按平台和阶段统计分位数
+"""
+
+import math
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from backend.models.models import TaskPhaseTiming
+
+# 默认统计的分位数
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+def save_task_spans(task, spans: List[Dict]) -> int:
+    """
+    保存一次执行的各阶段耗时
+
+    参数:
+        task: 任务模型实例，平台取其表名
+        spans: 执行器上报的阶段耗时列表
+
+    返回值:
+        int: 保存的记录数
+    """
+    if not spans:
+        return 0
+    now = datetime.now()
+    rows = [{
+        'platform': task._meta.table_name,
+        'task_id': task.id,
+        'phase': span['phase'],
+        'start_offset': span['start'],
+        'duration': span['duration'],
+        'success': span['ok'],
+        'created_at': now
+    } for span in spans]
+    with TaskPhaseTiming._meta.database.atomic():
+        TaskPhaseTiming.insert_many(rows).execute()
+    return len(rows)
+
+def get_task_spans(platform: str, task_id: int) -> List[Dict]:
+    """获取任务每次执行的各阶段耗时，按执行时间和开始时间排序"""
+    query = (TaskPhaseTiming
+             .select(TaskPhaseTiming.phase, TaskPhaseTiming.start_offset, TaskPhaseTiming.duration,
+                     TaskPhaseTiming.success, TaskPhaseTiming.created_at)
+             .where((TaskPhaseTiming.platform == platform) & (TaskPhaseTiming.task_id == task_id))
+             .order_by(TaskPhaseTiming.created_at, TaskPhaseTiming.start_offset, TaskPhaseTiming.id)
+             .dicts())
+    runs = {}
+    for row in query:
+        run = runs.setdefault(row['created_at'], [])
+        run.append({
+            'phase': row['phase'],
+            'start': row['start_offset'],
+            'duration': row['duration'],
+            'ok': row['success']
+        })
+    return [
+        {'finished_at': finished_at.strftime('%Y-%m-%d %H:%M:%S'), 'spans': spans}
+        for finished_at, spans in runs.items()
+    ]
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    """最近秩法计算分位数，sorted_values 需已升序排列"""
+    rank = max(1, math.ceil(percentile / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def get_phase_percentiles(platform: Optional[str] = None, days: Optional[int] = 7,
+                          percentiles=DEFAULT_PERCENTILES) -> List[Dict]:
+    """
+    按平台和阶段统计耗时分位数
+
+    参数:
+        platform: 平台（任务表名），为空时统计全部平台
+        days: 统计最近多少天，为空时统计全部记录
+        percentiles: 需要计算的分位数
+
+    返回值:
+        List[Dict]: 每个平台和阶段一条，包含次数、失败次数、平均值、分位数和最大值（秒）
+    """
+    query = TaskPhaseTiming.select(TaskPhaseTiming.platform, TaskPhaseTiming.phase,
+                                   TaskPhaseTiming.duration, TaskPhaseTiming.success)
+    if platform:
+        query = query.where(TaskPhaseTiming.platform == platform)
+    if days:
+        query = query.where(TaskPhaseTiming.created_at >= datetime.now() - timedelta(days=days))
+
+    groups = {}
+    for row_platform, phase, duration, success in query.tuples():
+        group = groups.setdefault((row_platform, phase), {'durations': [], 'failed': 0})
+        group['durations'].append(duration)
+        if not success:
+            group['failed'] += 1
+
+    stats = []
+    for (row_platform, phase), group in sorted(groups.items()):
+        durations = sorted(group['durations'])
+        item = {
+            'platform': row_platform,
+            'phase': phase,
+            'count': len(durations),
+            'failed': group['failed'],
+            'avg': round(sum(durations) / len(durations), 3),
+            'max': durations[-1]
+        }
+        for percentile in percentiles:
+            item[f'p{percentile}'] = _percentile(durations, percentile)
+        stats.append(item)
+    return stats
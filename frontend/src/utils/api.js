@@ -64,7 +64,16 @@ export const accountAPI = {
   
   // 获取未设置Cookie账号的Cookie
   getUncookiedAccountsCookie: () => api.post('/jimeng/accounts/get-uncookied-accounts-cookie'),
-  
+
+  // 获取Cookie刷新作业列表
+  getCookieJobs: () => api.get('/jimeng/accounts/cookie-jobs'),
+
+  // 获取Cookie刷新作业进度和每个账号的结果
+  getCookieJob: (jobId) => api.get(`/jimeng/accounts/cookie-jobs/${jobId}`),
+
+  // 取消Cookie刷新作业
+  cancelCookieJob: (jobId) => api.post(`/jimeng/accounts/cookie-jobs/${jobId}/cancel`),
+
   // 健康检查
   healthCheck: () => api.get('/health')
 }